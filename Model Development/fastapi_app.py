@@ -1,94 +1,212 @@
-from fastapi import FastAPI, Query
-import pickle
-import joblib
-import pandas as pd
-from pathlib import Path
+from fastapi import FastAPI, HTTPException, Query
+from pydantic import BaseModel, Field
+from typing import List, Optional, Tuple
+import numpy as np
 from sklearn.metrics.pairwise import cosine_similarity
-from src.hybrid import hybrid_recommend   # hybrid still uses CB + CF
+from src.hybrid import hybrid_recommend, hybrid_stage_latency   # staged CB + CF + popularity pipeline
+from src.recommend_cf import get_cf_recommendations_for_title
+from src.cf_similar import similar_items
+from src.registry import registry as models
+from src.topk import top_k, top_k_rows
+from src.candidates import cf_candidates, cf_stage_latency
+from src.cache import create_cache, create_store, make_key
+from src.executor import BoundedExecutor, ExecutorFull
+from src.singleflight import SingleFlight
+from src.fold_in import apply_user_ratings, rescale_ratings
+from src.cb_incremental import CBIndexUpdater
+from src.crosswalk import movielens_id
+import time
 
-# ---------------- Paths ----------------
-MODEL_DIR = Path(__file__).resolve().parents[0] / "models"
-DATA_DIR = Path(__file__).resolve().parents[0] / "data"
+# ---------------- Models ----------------
+# Every artifact (CB/CF models, movie map, ratings index) is owned by one shared
+# registry, loaded once per process and injected into the CB, CF and hybrid paths.
 
-# ---------------- Load Models ----------------
-# Collaborative Filtering model
-with open(MODEL_DIR / "cf_svd_model.pkl", "rb") as f:
-    model_cf = pickle.load(f)
+# ---------------- Result Cache ----------------
+# Keys include the model version, so a retrain invalidates old entries automatically
+result_cache = create_cache()
 
-# Content-Based model
-with open(MODEL_DIR / "cb_model.pkl", "rb") as f:
-    model_cb = pickle.load(f)
+# ---------------- Scoring Executor ----------------
+# Model scoring runs on a dedicated, bounded pool; when it is full requests get a 503
+scoring_executor = BoundedExecutor()
 
-# MovieId -> Title mapping
-movie_map = joblib.load(MODEL_DIR / "movieid_to_title.joblib")
+async def run_scoring(fn, *args, **kwargs):
+    try:
+        return await scoring_executor.run(fn, *args, **kwargs)
+    except ExecutorFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+# ---------------- Request Coalescing ----------------
+# Concurrent identical requests share one computation
+coalescer = SingleFlight()
+
+async def run_coalesced(key, fn, *args):
+    return await coalescer.do(key, lambda: run_scoring(fn, *args))
+
+# ---------------- Catalog Updates ----------------
+# New / changed movies are folded into the CB index without a TF-IDF refit
+cb_updater = CBIndexUpdater(models)
+
+# ---------------- User Preferences ----------------
+# favorite_genres pushed by the backend (UserPreference); feeds the hybrid genre generator.
+# Shared by all workers with USER_STATE_BACKEND=redis (in-process otherwise: single worker only)
+user_genres = create_store("user_genres")
 
-# Ratings (for CF)
-ratings = pd.read_parquet(DATA_DIR / "ratings_cleaned.parquet")
+def parse_genres(genres):
+    """ "Action, Comedy" -> ("action", "comedy") """
+    return tuple(g.strip().lower() for g in (genres or "").split(",") if g.strip())
 
 # ---------------- FastAPI App ----------------
 app = FastAPI()
 
+@app.on_event("startup")
+def warm_up_models():
+    models.warm_up()
+
+@app.on_event("shutdown")
+def stop_scoring_executor():
+    scoring_executor.shutdown()
+
 @app.get("/ping")
 async def ping():
     return {"message": "pong"}
 
+@app.get("/models/stats")
+def model_stats():
+    """
+    Load timings and memory sizes of the serving artifacts,
+    plus the hybrid CF stage latency against its p99 budget, per-stage hybrid pipeline
+    latencies and the CB <-> CF crosswalk coverage
+    """
+    return {**models.stats(), "cf_stage": cf_stage_latency.summary(), "cb_updates": cb_updater.stats(),
+            "hybrid_stages": {stage: t.summary() for stage, t in hybrid_stage_latency.items()},
+            "crosswalk": models.crosswalk.stats()}
+
+@app.get("/cache/stats")
+def cache_stats():
+    """
+    Hit / miss / eviction counters of the result cache
+    """
+    return {"model_version": models.model_version, **result_cache.stats()}
+
+@app.get("/executor/stats")
+async def executor_stats():
+    """
+    Scoring pool size, in-flight requests, rejections (503s) and coalesced requests
+    """
+    return {**scoring_executor.stats(), "coalescing": coalescer.stats()}
+
 # ---------------- CF Endpoint ----------------
 @app.get("/recommend/cf/{user_id}")
-def recommend_cf(user_id: int, n: int = 5):
+async def recommend_cf(user_id: int, n: int = 5, exact: bool = False):
     """
     Collaborative Filtering Recommendations
+    (uses the MIPS index when built; exact=True asks for brute-force scoring, which
+    falls back to the index while the CF stage's p99 is over CF_P99_BUDGET_MS)
     """
-    seen_movies = ratings.loc[ratings["userId"] == user_id, "movieId"].tolist()
-    all_movies = list(movie_map.keys())
+    return await run_coalesced(("cf", user_id, n, exact), recommend_cf_sync, user_id, n, exact)
 
-    predictions = []
-    for movie_id in all_movies:
-        if movie_id not in seen_movies:
-            pred = model_cf.predict(user_id, movie_id)
-            predictions.append((movie_id, pred.est))
+def recommend_cf_sync(user_id: int, n: int = 5, exact: bool = False):
+    movie_map = models.movie_map
+    top_idx, _ = cf_candidates(models, user_id, n, exact=exact)
+    top_ids = models.cf_scorer.catalog_ids[top_idx].tolist()
 
-    predictions.sort(key=lambda x: x[1], reverse=True)
-    top_n = predictions[:n]
-
-    recommendations = [{"movieId": mid, "title": movie_map[mid]} for mid, _ in top_n]
+    recommendations = [{"movieId": mid, "title": movie_map[mid]} for mid in top_ids]
     return {"user_id": user_id, "recommendations": recommendations}
 
+@app.get("/recommend/cf/similar/{movie_id}")
+async def recommend_cf_similar(movie_id: int, n: int = 10):
+    """
+    Movies most similar to movie_id in SVD item-factor space
+    (one memory-mapped row of the precomputed item neighbour table)
+    """
+    return await run_scoring(recommend_cf_similar_sync, movie_id, n)
+
+def recommend_cf_similar_sync(movie_id: int, n: int = 10):
+    positions, scores = similar_items(models, movie_id, n)
+    if len(positions) == 0:
+        return {"error": f"Movie {movie_id} not found in the CF model."}
+    movie_map = models.movie_map
+    top_ids = models.cf_scorer.catalog_ids[positions].tolist()
+    return {
+        "movie_id": movie_id,
+        "recommendations": [
+            {"movieId": mid, "title": movie_map[mid], "similarity": round(float(s), 4)}
+            for mid, s in zip(top_ids, scores.tolist())
+        ],
+    }
+
+@app.get("/recommend/cf/title/{movie_title}")
+async def recommend_cf_for_title(movie_title: str, n: int = 5):
+    """
+    "People who liked this also liked": movies closest to the title in SVD item-factor space
+    """
+    key = ("cf_title", movie_title.lower().strip(), n)
+    result = await run_coalesced(key, recommend_cf_for_title_sync, movie_title, n)
+    return {**result, "movie_title": movie_title} if "movie_title" in result else result
+
+def recommend_cf_for_title_sync(movie_title: str, n: int = 5):
+    key = make_key("cf_title", models.model_version, title=movie_title.lower().strip(), n=n)
+    recs = result_cache.get(key)
+    if recs is None:
+        recs = get_cf_recommendations_for_title(movie_title, top_n=n, models=models)
+        if recs:
+            result_cache.set(key, recs)
+    if not recs:
+        return {"error": f"Movie '{movie_title}' not found in dataset."}
+    return {"movie_title": movie_title, "recommendations": recs}
+
 # ---------------- CB Logic (from saved pickle) ----------------
-def recommend_cb_logic(movie_title: str, n: int = 5):
+def recommend_cb_logic(movie_title: str, n: int = 5, use_ann: bool = False):
     """
     Recommend movies using saved cb_model.pkl
+    (use_ann=True searches the LSH index instead of the whole catalog, if it was built)
     """
-    indices = model_cb["indices"]
-    df = model_cb["df"]
-    tfidf_matrix = model_cb["tfidf_matrix"]
+    cb = models.cb   # one catalog version for the whole request (catalog updates publish a new one)
+    df = cb.model["df"]
+    tfidf_matrix = cb.model["tfidf_matrix"]
+    cb_neighbours = cb.neighbours
+    cb_ann_index = cb.ann_index
 
-    movie_title = movie_title.lower().strip()
-
-    if movie_title not in indices:
+    idx = cb.titles.resolve(movie_title)
+    if idx is None:
         return []
 
-    idx = indices[movie_title]
+    # Precomputed neighbour table: O(1) row lookup, no sparse math
+    if cb_neighbours is not None and n <= cb_neighbours.width:
+        movie_indices, _ = cb_neighbours.lookup(idx, n)
+        return df['title'].iloc[movie_indices].tolist()
+
+    if use_ann and cb_ann_index is not None:
+        movie_indices, _ = cb_ann_index.query(tfidf_matrix, idx, n, exclude=[idx])
+        return df['title'].iloc[movie_indices].tolist()
 
     # Compute similarity between this movie and all others
     cosine_sim = cosine_similarity(tfidf_matrix[idx], tfidf_matrix).flatten()
 
-    sim_scores = list(enumerate(cosine_sim))
-    sim_scores = sorted(sim_scores, key=lambda x: x[1], reverse=True)
-
     # Skip itself, take top-N
-    sim_scores = sim_scores[1:n+1]
-    movie_indices = [i[0] for i in sim_scores]
+    movie_indices = top_k(cosine_sim, n, exclude=[idx])
 
     return df['title'].iloc[movie_indices].tolist()
 
 # ---------------- CB Endpoint ----------------
 @app.get("/recommend/cb/{movie_title}")
-def recommend_cb(movie_title: str, n: int = 5):
+async def recommend_cb(movie_title: str, n: int = 5, ann: bool = False):
     """
     Content-Based Recommendations (using cb_model.pkl only)
     """
+    key = ("cb", movie_title.lower().strip(), n, ann)
+    result = await run_coalesced(key, recommend_cb_sync, movie_title, n, ann)
+    # A coalesced result may come from a request spelling the title differently
+    return {**result, "movie_title": movie_title} if "movie_title" in result else result
+
+def recommend_cb_sync(movie_title: str, n: int = 5, ann: bool = False):
     try:
-        recs = recommend_cb_logic(movie_title, n=n)
+        key = make_key("cb", models.model_version, title=movie_title.lower().strip(), n=n, ann=ann)
+        recs = result_cache.get(key)
+        if recs is None:
+            recs = recommend_cb_logic(movie_title, n=n, use_ann=ann)
+            if recs:
+                result_cache.set(key, recs)
         if not recs:
             return {"error": f"Movie '{movie_title}' not found in dataset."}
         return {"movie_title": movie_title, "recommendations": recs}
@@ -97,32 +215,55 @@ def recommend_cb(movie_title: str, n: int = 5):
 
 # ---------------- Hybrid Endpoint ----------------
 @app.get("/recommend/hybrid/{user_id}/{title}")
-def recommend_hybrid(
+async def recommend_hybrid(
     title: str,
     user_id: int,
     top_n: int = Query(5, ge=1, le=20),
     weight_cb: float = Query(0.6, ge=0.0, le=1.0),
-    weight_cf: float = Query(0.4, ge=0.0, le=1.0)
+    weight_cf: float = Query(0.4, ge=0.0, le=1.0),
+    ann: bool = False,
+    genres: Optional[str] = None,
+    exact: bool = False
 ):
+    """
+    genres: comma-separated favourite genres; defaults to the ones pushed for the user
+    exact: score the full catalog in the CF stage (as /recommend/cf; subject to the same p99 budget)
+    """
+    favorite_genres = parse_genres(genres) if genres is not None else tuple(user_genres.get(user_id, ()))
+    key = ("hybrid", user_id, title.lower().strip(), top_n, weight_cb, weight_cf, ann, favorite_genres, exact)
+    result = await run_coalesced(key, recommend_hybrid_sync, title, user_id, top_n, weight_cb, weight_cf, ann,
+                                 favorite_genres, exact)
+    return {**result, "movie_title": title} if "movie_title" in result else result
+
+def recommend_hybrid_sync(title, user_id, top_n=5, weight_cb=0.6, weight_cf=0.4, ann=False, favorite_genres=(),
+                          exact=False):
     try:
-        user_history = ratings[ratings["userId"] == user_id]
-        if user_history.empty:
-            recs = recommend_cb_logic(title, n=top_n)
-            if not recs:
-                return {"error": f"Movie '{title}' not found in dataset."}
-            return {
-                "movie_title": title,
-                "user_id": user_id,
-                "recommendations": recs
-            }
-        
+        key = make_key("hybrid", models.model_version, user_id=user_id, title=title.lower().strip(),
+                       top_n=top_n, weight_cb=weight_cb, weight_cf=weight_cf, ann=ann, exact=exact,
+                       genres=",".join(favorite_genres), rev=models.user_overlay.revision(user_id))
+        cached = result_cache.get(key)
+        if cached is not None:
+            return {"movie_title": title, "user_id": user_id, "recommendations": cached}
+
+        # Users without ratings (e.g. fresh signups) still get the CB, popularity and
+        # favourite-genre candidates; only the CF stage is skipped
+        if not models.user_history.has_history(user_id):
+            weight_cf = 0.0
+
         recommendations = hybrid_recommend(
             title,
             user_id=user_id,
             top_n=top_n,
             weight_cb=weight_cb,
-            weight_cf=weight_cf
+            weight_cf=weight_cf,
+            use_ann=ann,
+            models=models,
+            favorite_genres=favorite_genres,
+            exact_cf=exact
         )
+        if not recommendations:
+            return {"error": f"Movie '{title}' not found in dataset."}
+        result_cache.set(key, recommendations)
         return {
             "movie_title": title,
             "user_id": user_id,
@@ -130,3 +271,175 @@ def recommend_hybrid(
         }
     except Exception as e:
         return {"error": str(e)}
+
+# ---------------- Online User Updates ----------------
+# Pushed users must not be users of the training data: their trained factors would be
+# overwritten. The backend sends its users offset by RECOMMENDER_USER_ID_OFFSET.
+def reject_training_user(user_id: int):
+    if user_id in models.cf_scorer.user_index or len(models.user_history.seen_items(user_id)):
+        raise HTTPException(
+            status_code=409,
+            detail=f"User {user_id} belongs to the training data; push application users in their own id range",
+        )
+
+class RatingIn(BaseModel):
+    # Either a MovieLens movieId, or the title (and release year) resolved against the catalog;
+    # the backend's own movies.id has no meaning here
+    movie_id: Optional[int] = None
+    title: Optional[str] = None
+    year: Optional[int] = None
+    rating: float = Field(..., gt=0)
+
+class UserRatingsUpdate(BaseModel):
+    ratings: List[RatingIn] = Field(..., max_length=100000)
+    # (low, high) of the scale the ratings were given on, e.g. [0.5, 10] from the backend;
+    # rescaled to the CF model's scale (MovieLens 0.5-5) before folding in. Default: the model's scale
+    rating_scale: Optional[Tuple[float, float]] = None
+
+@app.put("/users/{user_id}/ratings")
+async def update_user_ratings(user_id: int, payload: UserRatingsUpdate):
+    """
+    Fold a user's current ratings into the CF model without retraining
+    (solves the user's factors against the fixed item factors; an empty list drops the override)
+    """
+    reject_training_user(user_id)
+    if payload.rating_scale is not None:
+        low, high = payload.rating_scale
+        if not low < high or any(not low <= r.rating <= high for r in payload.ratings):
+            raise HTTPException(status_code=422, detail=f"Ratings must lie within rating_scale {[low, high]}.")
+    return await run_scoring(update_user_ratings_sync, user_id, payload)
+
+def update_user_ratings_sync(user_id: int, payload: UserRatingsUpdate):
+    start = time.perf_counter()
+    movie_ids, ratings = [], []
+    for r in payload.ratings:
+        movie_id = r.movie_id if r.movie_id is not None else movielens_id(models, r.title, r.year)
+        if movie_id is not None:
+            movie_ids.append(movie_id)
+            ratings.append(r.rating)
+    if payload.rating_scale is not None:
+        ratings = rescale_ratings(ratings, payload.rating_scale, models.cf_scorer.rating_scale)
+    revision = apply_user_ratings(models.cf_scorer, models.user_overlay, user_id, movie_ids, ratings)
+    return {
+        "user_id": user_id,
+        "ratings": len(payload.ratings),
+        "unmatched": len(payload.ratings) - len(movie_ids),
+        "revision": revision,
+        "fold_in_ms": round((time.perf_counter() - start) * 1000, 3),
+    }
+
+class UserPreferencesUpdate(BaseModel):
+    favorite_genres: str = ""   # e.g. "Action, Comedy"
+
+@app.put("/users/{user_id}/preferences")
+def update_user_preferences(user_id: int, payload: UserPreferencesUpdate):
+    """
+    The user's favourite genres, used by the hybrid genre candidate generator
+    """
+    reject_training_user(user_id)
+    favorite_genres = parse_genres(payload.favorite_genres)
+    if favorite_genres:
+        user_genres.set(user_id, list(favorite_genres))
+    else:
+        user_genres.pop(user_id)
+    return {"user_id": user_id, "favorite_genres": list(favorite_genres)}
+
+# ---------------- Catalog Updates ----------------
+class MovieUpsert(BaseModel):
+    title: str = Field(..., min_length=1)
+    year: Optional[int] = None    # release year; movies are matched on (title, year)
+    genre: str = ""
+    director: str = ""
+
+@app.put("/catalog/movies")
+async def upsert_catalog_movie(payload: MovieUpsert):
+    """
+    Add a movie to the content-based index, or refresh it if the title exists
+    (uses the fitted TF-IDF vocabulary; requests a full refit when vocabulary drift gets too high).
+    Applied in this worker only: use a single worker when the backend pushes catalog updates.
+    """
+    return await run_scoring(cb_updater.upsert, payload.title, payload.genre, payload.director, payload.year)
+
+# ---------------- Batch Endpoints ----------------
+# Users / seed titles are scored in chunks so the dense score block stays bounded
+BATCH_CHUNK_SIZE = 256
+
+class CFBatchRequest(BaseModel):
+    user_ids: List[int] = Field(..., min_length=1, max_length=10000)
+    n: int = 5
+
+class CBBatchRequest(BaseModel):
+    titles: List[str] = Field(..., min_length=1, max_length=10000)
+    n: int = 5
+
+@app.post("/recommend/cf/batch")
+async def recommend_cf_batch(payload: CFBatchRequest):
+    """
+    Collaborative Filtering Recommendations for many users at once
+    (one matrix-matrix product per chunk; same results as /recommend/cf/{user_id}?exact=true)
+    """
+    return await run_scoring(recommend_cf_batch_sync, payload)
+
+def recommend_cf_batch_sync(payload: CFBatchRequest):
+    cf_scorer = models.cf_scorer
+    movie_map = models.movie_map
+    history = models.user_history
+
+    results = []
+    for start in range(0, len(payload.user_ids), BATCH_CHUNK_SIZE):
+        chunk = payload.user_ids[start:start + BATCH_CHUNK_SIZE]
+        scores = cf_scorer.score_users(chunk)
+        seen_mask = np.zeros(scores.shape, dtype=bool)
+        for row, user_id in enumerate(chunk):
+            seen_mask[row, history.seen_positions(user_id)] = True
+
+        for user_id, top_idx in zip(chunk, top_k_rows(scores, payload.n, exclude=seen_mask)):
+            top_ids = cf_scorer.catalog_ids[top_idx].tolist()
+            results.append({
+                "user_id": user_id,
+                "recommendations": [{"movieId": mid, "title": movie_map[mid]} for mid in top_ids]
+            })
+    return {"results": results}
+
+@app.post("/recommend/cb/batch")
+async def recommend_cb_batch(payload: CBBatchRequest):
+    """
+    Content-Based Recommendations for many seed titles at once
+    (neighbour table rows, or one sparse product per chunk; same results as /recommend/cb/{movie_title})
+    """
+    return await run_scoring(recommend_cb_batch_sync, payload)
+
+def recommend_cb_batch_sync(payload: CBBatchRequest):
+    cb = models.cb
+    titles = cb.titles
+    df = cb.model["df"]
+    tfidf_matrix = cb.model["tfidf_matrix"]
+    cb_neighbours = cb.neighbours
+
+    found, results = [], [None] * len(payload.titles)
+    for pos, title in enumerate(payload.titles):
+        idx = titles.resolve(title)
+        if idx is not None:
+            found.append((pos, idx))
+        else:
+            results[pos] = {"movie_title": title, "error": f"Movie '{title}' not found in dataset."}
+
+    for start in range(0, len(found), BATCH_CHUNK_SIZE):
+        chunk = found[start:start + BATCH_CHUNK_SIZE]
+        rows = np.array([idx for _, idx in chunk])
+
+        if cb_neighbours is not None and payload.n <= cb_neighbours.width:
+            top_rows = np.asarray(cb_neighbours.indices[rows, :payload.n])
+        else:
+            sims = cosine_similarity(tfidf_matrix[rows], tfidf_matrix)
+            self_mask = np.zeros(sims.shape, dtype=bool)
+            self_mask[np.arange(len(rows)), rows] = True
+            top_rows = top_k_rows(sims, payload.n, exclude=self_mask)
+
+        for (pos, _), movie_indices in zip(chunk, top_rows):
+            results[pos] = {
+                "movie_title": payload.titles[pos],
+                "recommendations": df['title'].iloc[movie_indices].tolist()
+            }
+    return {"results": results}
+
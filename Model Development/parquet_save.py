@@ -1,16 +1,15 @@
-import pandas as pd
 from pathlib import Path
+from src.ingest_ratings import csv_to_parquet
 
 # Define paths
-data_dir = Path(r"D:\cinesuggest\Model Development\data")
-csv_path = data_dir / "ratings_cleaned.csv"
+# (python -m src.preprocess_cf already does this; the raw MovieLens ratings.csv
+# is the input, no intermediate ratings_cleaned.csv is written any more)
+data_dir = Path(__file__).resolve().parents[0] / "data"
+csv_path = data_dir / "ratings.csv"
 parquet_path = data_dir / "ratings_cleaned.parquet"
 
-# Load CSV
-print("⏳ Loading CSV file...")
-ratings = pd.read_csv(csv_path)
+# Stream CSV -> Parquet in bounded-memory chunks (int32 ids, float32 ratings)
+print("⏳ Converting CSV file...")
+n_rows = csv_to_parquet(csv_path, parquet_path)
 
-# Save as Parquet
-ratings.to_parquet(parquet_path, index=False)
-
-print(f"✅ Parquet file saved at: {parquet_path}")
+print(f"✅ Parquet file saved at: {parquet_path} ({n_rows:,} rows)")
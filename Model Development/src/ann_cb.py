@@ -0,0 +1,128 @@
+# --- src/ann_cb.py
+"""
+Approximate nearest-neighbour index for the content-based model.
+
+Random-projection LSH over the L2-normalised TF-IDF rows: each of n_tables
+hash tables signs the projection of a row on n_bits random hyperplanes, so
+rows with a small angle between them tend to share a bucket. A query only
+computes exact cosine similarity against the rows found in its buckets instead
+of against the whole catalog. Buckets are stored as sorted code arrays (no
+Python dicts), so the index saves to a single .npz next to cb_model.pkl.
+"""
+
+import time
+import numpy as np
+from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.preprocessing import normalize
+
+from src.topk import top_k
+
+
+def _hash_rows(rows, planes, n_bits):
+    """Bucket codes of the given rows, shape (n_tables, n_rows)."""
+    n_tables = planes.shape[1] // n_bits
+    proj = np.asarray(normalize(rows) @ planes).reshape(-1, n_tables, n_bits)
+    powers = np.left_shift(1, np.arange(n_bits, dtype=np.int64))
+    return ((proj > 0).astype(np.int64) @ powers).T
+
+
+class LSHIndex:
+    """
+    planes: (n_features, n_tables * n_bits) random hyperplanes
+    codes:  (n_tables, n_rows) bucket code of every row in every table
+    """
+
+    def __init__(self, planes, codes, n_bits):
+        self.planes = np.asarray(planes, dtype=np.float32)
+        self.codes = np.asarray(codes, dtype=np.int64)
+        self.n_bits = int(n_bits)
+        self.n_tables = self.codes.shape[0]
+
+        # Per table: rows ordered by bucket code, so a bucket is one searchsorted slice
+        self.order = np.argsort(self.codes, axis=1, kind="stable")
+        self.sorted_codes = np.take_along_axis(self.codes, self.order, axis=1)
+
+    @classmethod
+    def build(cls, matrix, n_tables=8, n_bits=12, seed=42):
+        """Hash every row of the (sparse) TF-IDF matrix."""
+        rng = np.random.default_rng(seed)
+        planes = rng.standard_normal((matrix.shape[1], n_tables * n_bits)).astype(np.float32)
+        return cls(planes, _hash_rows(matrix, planes, n_bits), n_bits)
+
+    def candidates(self, idx):
+        """Union of the rows sharing a bucket with row idx in any table."""
+        found = []
+        for t in range(self.n_tables):
+            code = self.codes[t, idx]
+            lo = np.searchsorted(self.sorted_codes[t], code, side="left")
+            hi = np.searchsorted(self.sorted_codes[t], code, side="right")
+            found.append(self.order[t, lo:hi])
+        return np.unique(np.concatenate(found))
+
+    def query(self, matrix, idx, k, exclude=None):
+        """
+        Approximate top-k rows most similar to row idx.
+        Returns (positions, cosine scores), best first. Falls back to an exact
+        scan when the buckets hold fewer than k eligible rows.
+        """
+        cands = self.candidates(idx)
+        excluded = np.isin(cands, exclude) if exclude is not None else None
+        n_eligible = len(cands) - (int(excluded.sum()) if excluded is not None else 0)
+
+        if n_eligible < k:
+            sims = cosine_similarity(matrix[idx], matrix).ravel()
+            top = top_k(sims, k, exclude=exclude)
+            return top, sims[top]
+
+        sims = cosine_similarity(matrix[idx], matrix[cands]).ravel()
+        top = top_k(sims, k, exclude=excluded)
+        return cands[top], sims[top]
+
+    def with_row(self, row_vector, pos):
+        """Index with row pos hashed from row_vector (appended if pos == number of rows)."""
+        code = _hash_rows(row_vector, self.planes, self.n_bits)
+        codes = np.array(self.codes)
+        if pos >= codes.shape[1]:
+            codes = np.hstack([codes, code])
+        else:
+            codes[:, pos] = code[:, 0]
+        return LSHIndex(self.planes, codes, self.n_bits)
+
+    def save(self, path):
+        np.savez(path, planes=self.planes, codes=self.codes, n_bits=self.n_bits)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        return cls(data["planes"], data["codes"], int(data["n_bits"]))
+
+
+def recall_at_k(index, matrix, k=10, n_queries=200, seed=0):
+    """
+    Compare the LSH index against exact cosine search on random query rows.
+    Returns mean recall@k, mean candidate count and per-query timings (ms).
+    """
+    rng = np.random.default_rng(seed)
+    queries = rng.choice(matrix.shape[0], size=min(n_queries, matrix.shape[0]), replace=False)
+
+    recalls, n_cands, exact_ms, ann_ms = [], [], [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        exact = top_k(cosine_similarity(matrix[q], matrix).ravel(), k, exclude=[q])
+        t1 = time.perf_counter()
+        approx, _ = index.query(matrix, q, k, exclude=[q])
+        t2 = time.perf_counter()
+
+        recalls.append(len(np.intersect1d(exact, approx)) / max(len(exact), 1))
+        n_cands.append(len(index.candidates(q)))
+        exact_ms.append((t1 - t0) * 1000)
+        ann_ms.append((t2 - t1) * 1000)
+
+    return {
+        "k": k,
+        "queries": len(queries),
+        "recall": float(np.mean(recalls)),
+        "mean_candidates": float(np.mean(n_cands)),
+        "exact_ms": float(np.mean(exact_ms)),
+        "ann_ms": float(np.mean(ann_ms)),
+    }
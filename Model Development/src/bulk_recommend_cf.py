@@ -0,0 +1,155 @@
+# ---src/bulk_recommend_cf.py
+"""
+Offline bulk CF recommendations for every user (e.g. the nightly email campaign).
+
+Streams the users of ratings_cleaned.parquet in chunks, scores each chunk with
+one matrix-matrix product against the SVD item factors in a process pool,
+masks already-rated movies through the user history index and writes one
+Parquet part per chunk:
+
+    data/cf_bulk_recs/part-00000.parquet   (userId, rank, movieId, score)
+
+Parts are written to a temporary file and renamed, so an interrupted run can be
+resumed with --resume: chunks whose part already exists are skipped. The run's
+settings (chunk_size, top_n, model_version, n_users) are recorded in
+manifest.json; resuming with different settings, or after a retrain, is
+refused, because part numbers would then cover different users or models.
+A run without --resume clears the old parts.
+
+Usage:  python -m src.bulk_recommend_cf --top-n 20 --workers 4
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.registry import registry, DATA_DIR
+from src.topk import top_k_rows
+
+OUT_DIR = DATA_DIR / "cf_bulk_recs"
+
+
+def _part_path(out_dir, chunk_id):
+    return Path(out_dir) / f"part-{chunk_id:05d}.parquet"
+
+
+def _check_manifest(out_dir, manifest, resume):
+    """Refuse to resume a run made with other settings; start a fresh run from an empty directory."""
+    path = Path(out_dir) / "manifest.json"
+    parts = sorted(Path(out_dir).glob("part-*.parquet"))
+    if resume and parts:
+        previous = json.loads(path.read_text()) if path.exists() else None
+        if previous != manifest:
+            raise ValueError(
+                f"Cannot resume in {out_dir}: existing parts were written with {previous}, "
+                f"this run is {manifest}. Re-run without --resume."
+            )
+        return
+    for part in parts:
+        part.unlink()
+    path.write_text(json.dumps(manifest, indent=2))
+
+
+def _score_chunk(chunk_id, user_ids, seen_positions, top_n, out_dir):
+    """
+    Worker: score one chunk of users and write its Parquet part.
+    The scorer comes from the process-wide registry (memory-mapped when the
+    model bundle exists, so workers share the factor pages).
+    """
+    scorer = registry.cf_scorer
+    scores = scorer.score_users(user_ids)
+    seen_mask = np.zeros(scores.shape, dtype=bool)
+    for row, positions in enumerate(seen_positions):
+        seen_mask[row, positions] = True
+
+    user_col, rank_col, movie_col, score_col = [], [], [], []
+    for row, (user_id, top_idx) in enumerate(zip(user_ids, top_k_rows(scores, top_n, exclude=seen_mask))):
+        user_col.append(np.full(len(top_idx), user_id, dtype=np.int32))
+        rank_col.append(np.arange(1, len(top_idx) + 1, dtype=np.int16))
+        movie_col.append(scorer.catalog_ids[top_idx].astype(np.int32))
+        score_col.append(scores[row, top_idx].astype(np.float32))
+
+    part = pd.DataFrame({
+        "userId": np.concatenate(user_col),
+        "rank": np.concatenate(rank_col),
+        "movieId": np.concatenate(movie_col),
+        "score": np.concatenate(score_col),
+    })
+    path = _part_path(out_dir, chunk_id)
+    tmp_path = path.with_suffix(".tmp")
+    part.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+    return len(user_ids)
+
+
+def run(top_n=20, chunk_size=512, workers=None, out_dir=OUT_DIR, resume=False):
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    print("Loading user history index...")
+    history = registry.user_history
+    users = history.users
+    n_chunks = (len(users) + chunk_size - 1) // chunk_size
+    print(f"Users: {len(users)} in {n_chunks} chunks of {chunk_size}")
+
+    _check_manifest(out_dir, {
+        "chunk_size": chunk_size,
+        "top_n": top_n,
+        "model_version": registry.model_version,
+        "n_users": int(len(users)),
+    }, resume)
+    todo = [c for c in range(n_chunks) if not (resume and _part_path(out_dir, c).exists())]
+    if len(todo) < n_chunks:
+        print(f"Resuming: {n_chunks - len(todo)} chunks already done")
+
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    done_users = done_chunks = 0
+
+    def _collect(finished):
+        nonlocal done_users, done_chunks
+        for future in finished:
+            done_users += future.result()
+            done_chunks += 1
+        elapsed = time.perf_counter() - start
+        print(f"[{done_chunks}/{len(todo)}] {done_users} users, {done_users / elapsed:.0f} users/s")
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Keep at most 2 chunks per worker in flight so memory stays bounded
+        pending = set()
+        for c in todo:
+            chunk = users[c * chunk_size:(c + 1) * chunk_size].tolist()
+            seen = [history.seen_positions(u) for u in chunk]
+            pending.add(pool.submit(_score_chunk, c, chunk, seen, top_n, out_dir))
+            if len(pending) >= 2 * workers:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                _collect(finished)
+        while pending:
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            _collect(finished)
+
+    elapsed = time.perf_counter() - start
+    print(f"Done: {done_users} users in {elapsed:.1f}s "
+          f"({done_users / max(elapsed, 1e-9):.0f} users/s). Output: {out_dir}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute top-N CF recommendations for every user.")
+    parser.add_argument("--top-n", type=int, default=20)
+    parser.add_argument("--chunk-size", type=int, default=512)
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: CPU count)")
+    parser.add_argument("--out", type=Path, default=OUT_DIR)
+    parser.add_argument("--resume", action="store_true", help="skip chunks whose part file exists")
+    args = parser.parse_args()
+    run(top_n=args.top_n, chunk_size=args.chunk_size, workers=args.workers,
+        out_dir=args.out, resume=args.resume)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+# --- src/cache.py
+"""
+Pluggable result cache for the recommendation endpoints.
+
+CB results are fully deterministic for a given model, and hybrid results are
+deterministic per (user, title, weights, top_n) until the model changes, so
+responses are cached under a key that includes the model version: a retrain
+produces a new version and old entries are simply never read again.
+
+Backends:
+    LRUTTLCache  in-process OrderedDict with LRU eviction and per-entry TTL (default)
+    RedisCache   shared cache for several workers; takes any client exposing
+                 get / setex (redis.Redis, or a local stand-in such as fakeredis)
+
+Select with CACHE_BACKEND=memory|redis (REDIS_URL, CACHE_TTL_SECONDS, CACHE_MAXSIZE).
+
+Per-user state pushed at runtime (folded-in factors, favourite genres) must be
+seen by every worker, not only the one that received the PUT. It follows
+USER_STATE_BACKEND (defaults to CACHE_BACKEND): "memory" keeps it in the
+process and is only correct with a single worker; "redis" shares it
+(create_store here, src.fold_in.create_user_overlay for the factors).
+"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "3600"))
+CACHE_MAXSIZE = int(os.getenv("CACHE_MAXSIZE", "10000"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+USER_STATE_BACKEND = os.getenv("USER_STATE_BACKEND", CACHE_BACKEND)
+
+_MISSING = object()
+
+
+class LRUTTLCache:
+    """Thread-safe in-process LRU cache whose entries also expire after ttl seconds."""
+
+    def __init__(self, maxsize=CACHE_MAXSIZE, ttl=CACHE_TTL_SECONDS):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()   # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        return {
+            "backend": "memory",
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class RedisCache:
+    """
+    Shared cache backed by a Redis-like client (values stored as JSON).
+    Eviction is Redis' own (TTL + maxmemory policy); counters are per process.
+    """
+
+    def __init__(self, client=None, ttl=CACHE_TTL_SECONDS, prefix="cinesuggest:"):
+        self.client = client if client is not None else redis_client()
+        self.ttl = ttl
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, key, default=None):
+        raw = self.client.get(self.prefix + key)
+        with self._lock:
+            if raw is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+        return json.loads(raw)
+
+    def set(self, key, value):
+        self.client.setex(self.prefix + key, int(self.ttl), json.dumps(value))
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + "*"):
+            self.client.delete(key)
+
+    def stats(self):
+        return {
+            "backend": "redis",
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": None,
+            "expirations": None,
+        }
+
+
+def redis_client():
+    import redis   # optional dependency, only needed for the redis backends
+    return redis.Redis.from_url(REDIS_URL)
+
+
+class MemoryStore:
+    """Thread-safe in-process key -> JSON-compatible value store (single worker only)."""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        return self._data.get(key, default)
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+
+class RedisStore:
+    """Same interface as MemoryStore, shared by every worker (values stored as JSON, no expiry)."""
+
+    def __init__(self, name, client=None, prefix="cinesuggest:"):
+        self.client = client if client is not None else redis_client()
+        self.prefix = f"{prefix}{name}:"
+
+    def get(self, key, default=None):
+        raw = self.client.get(f"{self.prefix}{key}")
+        return default if raw is None else json.loads(raw)
+
+    def set(self, key, value):
+        self.client.set(f"{self.prefix}{key}", json.dumps(value))
+
+    def pop(self, key):
+        self.client.delete(f"{self.prefix}{key}")
+
+
+def create_store(name, backend=USER_STATE_BACKEND):
+    """Store for per-user state pushed at runtime (e.g. favourite genres)."""
+    if backend == "redis":
+        return RedisStore(name)
+    if backend == "memory":
+        return MemoryStore()
+    raise ValueError(f"Unknown USER_STATE_BACKEND '{backend}' (expected 'memory' or 'redis')")
+
+
+def make_key(endpoint, model_version, **params):
+    """Stable cache key: endpoint, model version and sorted request parameters."""
+    parts = [endpoint, str(model_version)] + [f"{k}={params[k]}" for k in sorted(params)]
+    return "|".join(parts)
+
+
+def create_cache(backend=CACHE_BACKEND):
+    if backend == "redis":
+        return RedisCache()
+    if backend == "memory":
+        return LRUTTLCache()
+    raise ValueError(f"Unknown CACHE_BACKEND '{backend}' (expected 'memory' or 'redis')")
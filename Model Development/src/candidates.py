@@ -0,0 +1,125 @@
+# --- src/candidates.py
+"""
+Candidate generation stage for the hybrid recommender.
+
+The CF half of hybrid_recommend used to score only the first 5000 movieIds of
+movie_map "to avoid slowness", which silently biased results towards whatever
+came first in the dict. With the vectorised SVDScorer the whole catalog is one
+matrix-vector product, so the CF stage now always covers every movie. Its
+latency is tracked over a rolling window and compared with a configurable p99
+budget (CF_P99_BUDGET_MS, milliseconds). The stage searches the MIPS index
+when one was built; while the p99 is over budget, requests for an exact scan
+(/recommend/cf?exact=true and the hybrid's exact_cf, both routed through
+cf_candidates) are served from the index too. Without a MIPS index there is no cheaper path
+and the budget is monitor-only (reported by /models/stats).
+
+The popularity leaderboard backs two more cheap generators: overall popular
+movies and popular movies of a user's favourite genres.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from src.topk import top_k
+
+CF_P99_BUDGET_MS = float(os.getenv("CF_P99_BUDGET_MS", "50"))
+
+
+class LatencyTracker:
+    """Rolling window of stage latencies (ms) with percentile summaries."""
+
+    def __init__(self, budget_ms=None, window=1000):
+        self.budget_ms = budget_ms
+        self.samples = deque(maxlen=window)
+        # Scoring threads record while /models/stats reads
+        self._lock = threading.Lock()
+
+    def record(self, ms):
+        with self._lock:
+            self.samples.append(ms)
+
+    def _snapshot(self):
+        with self._lock:
+            return np.array(self.samples, dtype=np.float64)
+
+    def percentile(self, q, samples=None):
+        samples = self._snapshot() if samples is None else samples
+        if len(samples) == 0:
+            return 0.0
+        return float(np.percentile(samples, q))
+
+    def within_budget(self, samples=None):
+        return self.budget_ms is None or self.percentile(99, samples) <= self.budget_ms
+
+    def summary(self):
+        samples = self._snapshot()
+        return {
+            "count": len(samples),
+            "p50_ms": round(self.percentile(50, samples), 3),
+            "p99_ms": round(self.percentile(99, samples), 3),
+            "budget_ms": self.budget_ms,
+            "within_budget": self.within_budget(samples),
+        }
+
+
+cf_stage_latency = LatencyTracker(budget_ms=CF_P99_BUDGET_MS)
+
+
+def cf_candidates(models, user_id, k, exact=False):
+    """
+    Top-k unseen movies for user_id, from the MIPS index when it was built
+    (exact=True, or no index, scores the full catalog; exact is overridden
+    while the stage's p99 is over CF_P99_BUDGET_MS).
+    Returns (catalog positions, predicted ratings), best first.
+    """
+    start = time.perf_counter()
+    scorer = models.cf_scorer
+    seen_mask = models.user_history.seen_mask(user_id)
+    if models.cf_mips_index is not None and (not exact or not cf_stage_latency.within_budget()):
+        positions, scores = models.cf_mips_index.search(scorer, user_id, k, exclude=seen_mask)
+    else:
+        scores = scorer.score_user(user_id)
+        positions = top_k(scores, k, exclude=seen_mask)
+        scores = scores[positions]
+    cf_stage_latency.record((time.perf_counter() - start) * 1000)
+    return positions, scores
+
+
+def popular_candidates(models, k, exclude_ids=None, genre=None):
+    """
+    Top-k movies of the popularity leaderboard (optionally within genre),
+    skipping the movieIds in exclude_ids.
+    Returns (catalog positions, Bayesian-average scores), best first.
+    """
+    table = models.cf_popularity
+    if table is None:
+        return np.empty(0, dtype=np.int64), np.empty(0)
+    rows = table.top(k, genre=genre, exclude=exclude_ids)
+    catalog_pos = models.cf_scorer.catalog_pos
+    positions = np.array([catalog_pos.get(mid, -1) for mid in table.movie_ids[rows].tolist()], dtype=np.int64)
+    known = positions >= 0
+    return positions[known], table.scores[rows][known].astype(np.float64)
+
+
+def genre_candidates(models, genres, k, exclude_ids=None):
+    """
+    Popular movies of the given genres (e.g. a user's favorite_genres), k per
+    genre, matched case-insensitively against the leaderboard's genres.
+    Returns (catalog positions, Bayesian-average scores), best first, each movie once.
+    """
+    table = models.cf_popularity
+    known = {g.lower(): g for g in table.genres} if table is not None else {}
+    parts = [popular_candidates(models, k, exclude_ids, genre=known[g.strip().lower()])
+             for g in (genres or ()) if g.strip().lower() in known]
+    if not parts:
+        return np.empty(0, dtype=np.int64), np.empty(0)
+    positions = np.concatenate([p for p, _ in parts])
+    scores = np.concatenate([s for _, s in parts])
+    order = np.argsort(-scores, kind="stable")
+    _, first = np.unique(positions[order], return_index=True)
+    keep = order[np.sort(first)]
+    return positions[keep], scores[keep]
@@ -0,0 +1,268 @@
+# --- src/cb_incremental.py
+"""
+Incremental content-based index.
+
+A movie added through the backend used to become recommendable only after
+train_cb.py refitted TF-IDF over the whole CSV. CBIndexUpdater instead
+transforms the new (or changed) movie with the already fitted vocabulary and
+IDF, appends / replaces its row in the TF-IDF matrix, patches the neighbour
+table and the LSH index, and publishes the new artifacts in the registry, so
+the movie is served within seconds.
+
+Every upsert publishes new copies of the matrix, dataframe, title resolver,
+neighbour table and LSH codes (the first one also moves the memory-mapped
+bundle arrays into memory), so it costs O(catalog) and suits a trickle of
+backend additions, not bulk loads (refit with train_cb.py for those). The
+update is applied in the worker that received it only: run the API with a
+single worker when live catalog updates are used, or other workers keep
+serving the old catalog until they restart after the next train_cb run.
+
+Reusing a fitted vocabulary loses the words it has never seen, and the IDF
+weights grow stale as the catalog grows. Both are tracked: once the share of
+out-of-vocabulary tokens in updated movies passes CB_DRIFT_THRESHOLD, or the
+catalog has grown by more than CB_MAX_ADDED_FRACTION, a full refit is requested
+by writing models/cb_refit_requested.json (train_cb.py removes it). Every
+update is also appended to data/cb_catalog_additions.jsonl, which train_cb.py
+folds into the next fit, so nothing is lost on restart.
+
+A movie is identified by its (title, year), like the de-duplication of
+movies.csv: pushing "Heat" (2024) adds a row next to "Heat" (1995) instead of
+replacing it, both live and at the next fit.
+"""
+
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix, vstack
+from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.preprocessing import normalize
+
+from src.neighbours import update_neighbour_table
+from src.title_index import parse_year
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+ADDITIONS_PATH = BASE_DIR / "data" / "cb_catalog_additions.jsonl"
+REFIT_MARKER = BASE_DIR / "models" / "cb_refit_requested.json"
+
+CB_DRIFT_THRESHOLD = float(os.getenv("CB_DRIFT_THRESHOLD", "0.2"))
+CB_MAX_ADDED_FRACTION = float(os.getenv("CB_MAX_ADDED_FRACTION", "0.05"))
+CB_DRIFT_MIN_MOVIES = int(os.getenv("CB_DRIFT_MIN_MOVIES", "10"))
+
+
+def combine_features(title, genre, director=""):
+    """The text train_cb.py vectorises: title, genre three times, director."""
+    return f"{title} " + f"{genre} " * 3 + f"{director} "
+
+
+class TfidfTransform:
+    """
+    A fitted vocabulary and IDF applied without refitting; same output as
+    TfidfVectorizer.transform with the default settings train_cb.py uses.
+    """
+
+    def __init__(self, vocabulary, idf, stop_words="english"):
+        self.vocabulary = vocabulary
+        self.idf = np.asarray(idf, dtype=np.float64)
+        self._counter = CountVectorizer(vocabulary=vocabulary, stop_words=stop_words)
+        self._analyzer = self._counter.build_analyzer()
+
+    @classmethod
+    def from_vectorizer(cls, tfidf):
+        return cls(tfidf.vocabulary_, tfidf.idf_, tfidf.stop_words)
+
+    def transform(self, texts):
+        counts = self._counter.transform(texts).astype(np.float64)
+        return normalize(csr_matrix(counts.multiply(self.idf)), norm="l2")
+
+    def token_counts(self, text):
+        """(tokens, out-of-vocabulary tokens) of one document."""
+        tokens = self._analyzer(text)
+        return len(tokens), sum(token not in self.vocabulary for token in tokens)
+
+
+def load_catalog_additions(path=ADDITIONS_PATH):
+    """Movies added through the API, latest version per (title, year), as train_cb.py columns."""
+    path = Path(path)
+    if not path.exists():
+        return pd.DataFrame(columns=["title", "year", "genre", "director", "stars"])
+    with open(path) as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    additions = pd.DataFrame(rows)
+    # Lines logged before years were sent carry none
+    years = additions["year"] if "year" in additions else pd.Series([None] * len(additions))
+    additions["year"] = ["" if parse_year(y) is None else str(parse_year(y)) for y in years]
+    additions = additions.drop_duplicates(subset=["title", "year"], keep="last")
+    return pd.DataFrame({
+        "title": additions["title"],
+        "year": additions["year"],
+        "genre": additions["genre"],
+        "director": [str([d]) if d else "[]" for d in additions["director"]],
+        "stars": "[]",
+    }).reset_index(drop=True)
+
+
+def load_cb_movies(path, additions_path=ADDITIONS_PATH):
+    """
+    The CB catalog in TF-IDF row order, cleaned the way train_cb.py fits it:
+    complete rows only, de-duplicated on (title, year), API additions last.
+    """
+    df = pd.read_csv(path)
+    df = df.dropna(subset=['title', 'genre', 'director', 'stars'])
+    df = df.fillna('')
+    df = df.drop_duplicates(subset=['title', 'year'])
+
+    additions = load_catalog_additions(additions_path)
+    if len(additions):
+        # An addition replaces the base row of the same movie only, not every movie sharing its title
+        added = set(movie_keys(additions))
+        replaced = [key in added for key in movie_keys(df)]
+        df = pd.concat([df[~pd.Series(replaced, index=df.index)], additions], ignore_index=True).fillna('')
+    return df.reset_index(drop=True), len(additions)
+
+
+def movie_keys(df):
+    """(title, year) of every row; the year parsed so "1995", 1995.0 and blank / None compare correctly."""
+    years = df["year"].tolist() if "year" in df else [None] * len(df)
+    return list(zip(df["title"].astype(str).tolist(), [parse_year(y) for y in years]))
+
+
+def find_movie_row(df, title, year=None):
+    """Row of the movie (title, year) in df, or None (rows of the same title but another year don't match)."""
+    rows = np.flatnonzero(df["title"].astype(str).to_numpy() == str(title))
+    if "year" not in df:
+        return int(rows[0]) if len(rows) else None
+    year = parse_year(year)
+    for row in rows:
+        if parse_year(df["year"].iat[row]) == year:
+            return int(row)
+    return None
+
+
+def _replace_row(matrix, pos, row):
+    return vstack([matrix[:pos], row, matrix[pos + 1:]], format="csr")
+
+
+class CBIndexUpdater:
+    """Applies catalog additions / changes to the registry's CB artifacts."""
+
+    def __init__(self, models, drift_threshold=CB_DRIFT_THRESHOLD,
+                 max_added_fraction=CB_MAX_ADDED_FRACTION, min_movies=CB_DRIFT_MIN_MOVIES,
+                 additions_path=ADDITIONS_PATH, refit_marker=REFIT_MARKER):
+        self.models = models
+        self.drift_threshold = drift_threshold
+        self.max_added_fraction = max_added_fraction
+        self.min_movies = min_movies
+        self.additions_path = Path(additions_path)
+        self.refit_marker = Path(refit_marker)
+        self._lock = threading.Lock()
+        self.base_rows = None
+        self.added = self.updated = 0
+        self.tokens = self.oov_tokens = 0
+
+    def upsert(self, title, genre="", director="", year=None):
+        """
+        Add the movie, or refresh its row if the (title, year) is already indexed.
+        Returns a summary of the update and the current drift.
+        """
+        start = time.perf_counter()
+        with self._lock:
+            cb = self.models.cb
+            cb_model = cb.model
+            transform = self.models.cb_vectorizer
+            matrix = cb_model["tfidf_matrix"].tocsr()
+            df, titles = cb_model["df"], cb.titles
+            if self.base_rows is None:
+                self.base_rows = matrix.shape[0]
+
+            text = combine_features(title, genre, director)
+            row = transform.transform([text])
+            pos = find_movie_row(df, title, year)
+            is_new = pos is None
+
+            if not is_new:
+                matrix = _replace_row(matrix, pos, row)
+                df = df.copy()
+                df.iloc[pos, df.columns.get_loc("title")] = title
+                df.iloc[pos, df.columns.get_loc("genre")] = genre
+                self.updated += 1
+            else:
+                pos = matrix.shape[0]
+                matrix = vstack([matrix, row], format="csr")
+                new_row = {"title": title, "genre": genre}
+                if "year" in df:
+                    new_row["year"] = year if year is not None else -1
+                df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
+                titles = titles.with_title(title, year, pos)
+                self.added += 1
+
+            n_tokens, n_oov = transform.token_counts(text)
+            self.tokens += n_tokens
+            self.oov_tokens += n_oov
+
+            # Published as one snapshot: the new title resolves only together with its row
+            artifacts = {"cb_model": {**cb_model, "tfidf_matrix": matrix, "df": df}, "cb_titles": titles}
+            if cb.neighbours is not None:
+                artifacts["cb_neighbours"] = update_neighbour_table(cb.neighbours, matrix, pos)
+            if cb.ann_index is not None:
+                artifacts["cb_ann_index"] = cb.ann_index.with_row(row, pos)
+            self.models.publish(**artifacts)
+
+            self._log_addition(title, genre, director, year)
+            refit = self._check_drift()
+
+        return {
+            "title": title,
+            "row": pos,
+            "added": is_new,
+            "update_ms": round((time.perf_counter() - start) * 1000, 2),
+            "refit_requested": refit,
+            **self.drift(),
+        }
+
+    def drift(self):
+        return {
+            "oov_rate": self.oov_tokens / self.tokens if self.tokens else 0.0,
+            "added_fraction": self.added / self.base_rows if self.base_rows else 0.0,
+        }
+
+    def _check_drift(self):
+        """Request a full refit once the fitted vocabulary / IDF no longer fit the catalog."""
+        if self.refit_marker.exists():
+            return True
+        drift = self.drift()
+        reasons = []
+        if self.added + self.updated >= self.min_movies and drift["oov_rate"] > self.drift_threshold:
+            reasons.append(f"out-of-vocabulary rate {drift['oov_rate']:.2f} > {self.drift_threshold}")
+        if drift["added_fraction"] > self.max_added_fraction:
+            reasons.append(f"catalog grew by {drift['added_fraction']:.1%} > {self.max_added_fraction:.1%}")
+        if not reasons:
+            return False
+        self.refit_marker.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.refit_marker, "w") as f:
+            json.dump({
+                "requested_at": datetime.now(timezone.utc).isoformat(),
+                "reasons": reasons,
+                "added": self.added,
+                "updated": self.updated,
+                **drift,
+            }, f, indent=2)
+        return True
+
+    def _log_addition(self, title, genre, director, year=None):
+        self.additions_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.additions_path, "a") as f:
+            f.write(json.dumps({"title": title, "year": year, "genre": genre, "director": director}) + "\n")
+
+    def stats(self):
+        return {
+            "added": self.added,
+            "updated": self.updated,
+            "refit_requested": self.refit_marker.exists(),
+            **self.drift(),
+        }
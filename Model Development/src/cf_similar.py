@@ -0,0 +1,64 @@
+# --- src/cf_similar.py
+"""
+Item-item CF similarity ("people who liked X also liked").
+
+get_cf_recommendations_for_title used to reload the SVD model and both CSVs,
+scan the titles, sample a random user who rated the movie highly and rank
+the catalog for that user, so results changed on every call. Similar items
+now come straight from the learned item factors: cosine similarity between
+L2-normalised catalog-aligned qi rows, which is deterministic and cacheable.
+Movies the model never saw have zero factors and are never returned.
+
+train_cf.py precomputes the top-N neighbours of every catalog movie block by
+block (models/cf_item_neighbours_idx.npy int32 / _scores.npy float16), so a
+lookup is one memory-mapped row slice; without the table the similarities
+are computed against the whole catalog.
+"""
+
+import numpy as np
+
+from src.neighbours import build_neighbour_table
+from src.topk import top_k
+
+
+def item_embeddings(scorer):
+    """L2-normalised catalog-aligned item factors, float32 (zero rows for unknown movies)."""
+    emb = np.asarray(scorer.qi_cat, dtype=np.float32)
+    norms = np.linalg.norm(emb, axis=1, keepdims=True)
+    return np.divide(emb, norms, out=np.zeros_like(emb), where=norms > 0)
+
+
+def build_item_neighbours(scorer, top_n=50, block_size=1024):
+    """Top-N neighbour table over the catalog (rows / columns are catalog positions)."""
+    emb = item_embeddings(scorer)
+    known = np.asarray(scorer.known_items)
+
+    def similarity(block, full):
+        return np.where(known[None, :], block @ full.T, -np.inf)
+
+    return build_neighbour_table(emb, top_n=top_n, block_size=block_size, similarity=similarity,
+                                 scores_dtype=np.float16)
+
+
+def similar_items(models, movie_id, n=10):
+    """
+    Catalog positions of the n movies closest to movie_id in factor space and
+    their cosine similarities, best first. Empty for movies unknown to the model.
+    """
+    scorer = models.cf_scorer
+    pos = scorer.catalog_pos.get(movie_id)
+    if pos is None or not scorer.known_items[pos]:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+    table = models.cf_item_neighbours
+    if table is not None and n <= table.width:
+        idx, scores = table.lookup(pos, n)
+        keep = np.isfinite(scores)   # catalogs with fewer known movies than the table width
+        return idx[keep], scores[keep].astype(np.float32)
+
+    emb = models.cf_item_embeddings
+    sims = emb @ emb[pos]
+    exclude = ~scorer.known_items
+    exclude[pos] = True
+    top = top_k(sims, n, exclude=exclude)
+    return top, sims[top]
@@ -0,0 +1,235 @@
+# --- src/crosswalk.py
+"""
+CB <-> CF catalog crosswalk.
+
+The CB model (movies.csv rows) and the CF model (MovieLens movieIds) describe
+the same films under different titles ("The Godfather" vs "Godfather, The
+(1972)"), so merging them by title string silently missed or duplicated
+movies. The join is built once, at preprocessing time, between the CB rows
+(in TF-IDF row order, see cb_incremental.load_cb_movies) and the rows of
+movie_cleaned.csv:
+
+    1. exact:  normalised CB title + "_" + year == preprocess_cf's movie_key
+    2. title:  title_norm match, when it is unambiguous on the MovieLens side
+    3. fuzzy:  difflib ratio >= CROSSWALK_FUZZY_CUTOFF against the unmatched
+               MovieLens titles of the same year
+
+Every MovieLens movie is matched at most once. The result is one int32 array,
+cb_row -> movieId (-1 if unmatched), saved as models/cb_cf_crosswalk.npz
+together with a digest of the CB titles it was built for, so a crosswalk that
+no longer lines up with the loaded CB matrix (e.g. built after API additions
+but before train_cb.py refitted) is detected and rebuilt instead of mapping
+rows to the wrong films:
+
+    python -m src.crosswalk              (also run by python -m src.preprocess_cf)
+
+At serving time the registry turns it into two position arrays
+
+    cb_to_cf[cb_row]        CF catalog position (-1 if unmatched)
+    cf_to_cb[cf_position]   CB row              (-1 if unmatched)
+
+so cross-model lookups are array indexing.
+"""
+
+import argparse
+import difflib
+import hashlib
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.cb_incremental import load_cb_movies
+from src.preprocess_cf import clean_movies, normalize_title
+from src.title_index import parse_year
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+DATA_DIR = BASE_DIR / "data"
+CROSSWALK_PATH = BASE_DIR / "models" / "cb_cf_crosswalk.npz"
+
+CROSSWALK_FUZZY_CUTOFF = float(os.getenv("CROSSWALK_FUZZY_CUTOFF", "0.9"))
+
+
+def movie_key(title_norm, year):
+    """Same key preprocess_cf.clean_movies writes to movie_key."""
+    return f"{title_norm}_{year}" if year is not None else title_norm
+
+
+def titles_digest(titles):
+    """Fingerprint of the CB rows (order matters) a crosswalk was built for."""
+    digest = hashlib.sha1()
+    for title in titles:
+        digest.update(str(title).encode("utf-8"))
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+def match_movie_ids(cb_titles, cb_years, ml_movies, fuzzy_cutoff=CROSSWALK_FUZZY_CUTOFF):
+    """
+    cb_titles / cb_years: CB rows in matrix order (years may be None / blank).
+    ml_movies: movie_cleaned.csv frame (movieId, title_norm, year, movie_key).
+    Returns (int32 movieId per CB row, -1 if unmatched; match counts per stage).
+    """
+    ml_ids = ml_movies["movieId"].to_numpy(dtype=np.int64)
+    ml_norms = ml_movies["title_norm"].fillna("").astype(str).tolist()
+    ml_years = [parse_year(y) for y in ml_movies["year"].tolist()]
+
+    by_key, by_norm, norm_count, by_year = {}, {}, {}, {}
+    for i, (key, norm, year) in enumerate(zip(ml_movies["movie_key"].astype(str).tolist(), ml_norms, ml_years)):
+        by_key.setdefault(key, i)
+        by_norm.setdefault(norm, i)
+        norm_count[norm] = norm_count.get(norm, 0) + 1
+        by_year.setdefault(year, {}).setdefault(norm, i)
+
+    cb_years = cb_years if cb_years is not None else [None] * len(cb_titles)
+    out = np.full(len(cb_titles), -1, dtype=np.int32)
+    taken = np.zeros(len(ml_ids), dtype=bool)
+    counts = {"exact": 0, "title": 0, "fuzzy": 0}
+    pending = []
+
+    def take(row, i, stage):
+        out[row] = ml_ids[i]
+        taken[i] = True
+        counts[stage] += 1
+
+    for row, (title, year) in enumerate(zip(cb_titles, cb_years)):
+        norm, year = normalize_title(title), parse_year(year)
+        i = by_key.get(movie_key(norm, year))
+        if i is not None and not taken[i]:
+            take(row, i, "exact")
+        elif norm_count.get(norm) == 1 and not taken[by_norm[norm]]:
+            take(row, by_norm[norm], "title")
+        elif year is not None and norm:
+            pending.append((row, norm, year))
+
+    # Fuzzy pass, blocked by year so each CB title is compared with a few hundred candidates
+    for row, norm, year in pending:
+        block = by_year.get(year, {})
+        match = difflib.get_close_matches(norm, [n for n, i in block.items() if not taken[i]],
+                                          n=1, cutoff=fuzzy_cutoff)
+        if match:
+            take(row, block[match[0]], "fuzzy")
+    return out, counts
+
+
+class Crosswalk:
+    def __init__(self, cb_to_cf, cf_to_cb):
+        self.cb_to_cf = np.asarray(cb_to_cf, dtype=np.int32)
+        self.cf_to_cb = np.asarray(cf_to_cb, dtype=np.int32)
+
+    @classmethod
+    def from_movie_ids(cls, cb_movie_ids, catalog_ids):
+        """Position arrays from the cb_row -> movieId mapping and the CF catalog (movieIds in position order)."""
+        catalog_ids = np.asarray(catalog_ids, dtype=np.int64)
+        cb_movie_ids = np.asarray(cb_movie_ids, dtype=np.int64)
+        cb_to_cf = np.full(len(cb_movie_ids), -1, dtype=np.int32)
+        cf_to_cb = np.full(len(catalog_ids), -1, dtype=np.int32)
+        if len(catalog_ids):
+            sorter = np.argsort(catalog_ids)
+            pos = sorter[np.minimum(np.searchsorted(catalog_ids, cb_movie_ids, sorter=sorter),
+                                    len(catalog_ids) - 1)]
+            found = (cb_movie_ids >= 0) & (catalog_ids[pos] == cb_movie_ids)
+            cb_to_cf[found] = pos[found]
+            cf_to_cb[pos[found]] = np.flatnonzero(found)
+        return cls(cb_to_cf, cf_to_cb)
+
+    @classmethod
+    def from_models(cls, models):
+        """Join the registry's CB dataframe with its CF movie map (when no crosswalk file was built)."""
+        df = models.cb_model["df"]
+        movie_map = models.movie_map
+        ml_movies = clean_movies(pd.DataFrame({"movieId": list(movie_map.keys()),
+                                               "title": list(movie_map.values())}))
+        years = df["year"].tolist() if "year" in df else None
+        cb_movie_ids, _ = match_movie_ids(df["title"].tolist(), years, ml_movies)
+        return cls.from_movie_ids(cb_movie_ids, models.cf_scorer.catalog_ids)
+
+    def to_cf(self, cb_rows):
+        """CF catalog positions of CB rows (-1 if unmatched or added after the crosswalk was built)."""
+        return _lookup(self.cb_to_cf, cb_rows)
+
+    def to_cb(self, cf_positions):
+        """CB rows of CF catalog positions (-1 if unmatched)."""
+        return _lookup(self.cf_to_cb, cf_positions)
+
+    @property
+    def n_matched(self):
+        return int((self.cb_to_cf >= 0).sum())
+
+    def stats(self):
+        return {"cb_rows": len(self.cb_to_cf), "cf_movies": len(self.cf_to_cb), "matched": self.n_matched}
+
+
+def movielens_id(models, title, year=None):
+    """
+    MovieLens movieId of a title (e.g. a backend movie, pushed by title and
+    release year): the CF title index first, then the CB title through the
+    crosswalk. None when the movie is not in the CF catalog.
+    """
+    if not title:
+        return None
+    pos = models.cf_titles.resolve(title, year)
+    if pos is None:
+        row = models.cb_titles.resolve(title, year)
+        pos = int(models.crosswalk.to_cf([row])[0]) if row is not None else -1
+        if pos < 0:
+            return None
+    return int(models.cf_scorer.catalog_ids[pos])
+
+
+def _lookup(mapping, keys):
+    keys = np.asarray(keys, dtype=np.int64)
+    out = np.full(len(keys), -1, dtype=np.int32)
+    inside = (keys >= 0) & (keys < len(mapping))
+    out[inside] = mapping[keys[inside]]
+    return out
+
+
+def save_movie_ids(path, cb_movie_ids, cb_titles):
+    np.savez(path, cb_movie_ids=np.asarray(cb_movie_ids, dtype=np.int32),
+             cb_titles_digest=np.array(titles_digest(cb_titles)))
+
+
+def load_movie_ids(path, cb_titles):
+    """
+    The saved cb_row -> movieId array, or None when it was built for other CB
+    rows than cb_titles (the CB model's rows, in matrix order).
+    """
+    data = np.load(path)
+    cb_movie_ids = data["cb_movie_ids"]
+    if len(cb_movie_ids) != len(cb_titles):
+        return None
+    if "cb_titles_digest" not in data or str(data["cb_titles_digest"]) != titles_digest(cb_titles):
+        return None
+    return cb_movie_ids
+
+
+def build_crosswalk(cb_path=DATA_DIR / "movies.csv", ml_path=DATA_DIR / "movie_cleaned.csv",
+                    out_path=CROSSWALK_PATH, fuzzy_cutoff=CROSSWALK_FUZZY_CUTOFF):
+    """Join the CB catalog with movie_cleaned.csv and save the cb_row -> movieId array. Returns the match counts."""
+    cb_movies, _ = load_cb_movies(cb_path)
+    ml_movies = pd.read_csv(ml_path)
+    cb_movie_ids, counts = match_movie_ids(cb_movies["title"].tolist(), cb_movies["year"].tolist(),
+                                           ml_movies, fuzzy_cutoff=fuzzy_cutoff)
+    Path(out_path).parent.mkdir(parents=True, exist_ok=True)
+    save_movie_ids(out_path, cb_movie_ids, cb_movies["title"].tolist())
+    return {"cb_rows": len(cb_movie_ids), **counts}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the CB <-> CF catalog crosswalk.")
+    parser.add_argument("--cb-movies", default=DATA_DIR / "movies.csv", type=Path)
+    parser.add_argument("--ml-movies", default=DATA_DIR / "movie_cleaned.csv", type=Path)
+    parser.add_argument("--out", default=CROSSWALK_PATH, type=Path)
+    parser.add_argument("--fuzzy-cutoff", default=CROSSWALK_FUZZY_CUTOFF, type=float)
+    args = parser.parse_args()
+
+    counts = build_crosswalk(args.cb_movies, args.ml_movies, args.out, args.fuzzy_cutoff)
+    matched = counts["exact"] + counts["title"] + counts["fuzzy"]
+    print(f"Matched {matched} of {counts['cb_rows']} CB movies "
+          f"(exact {counts['exact']}, title {counts['title']}, fuzzy {counts['fuzzy']}). Saved to: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# --- src/executor.py
+"""
+Bounded executor for model scoring with admission control.
+
+The recommendation handlers used to be sync defs running on Starlette's
+default threadpool, so a burst of slow scoring requests exhausted it and even
+/ping starved. Scoring now runs on a dedicated thread pool (NumPy/BLAS
+kernels release the GIL and the models are shared in-process), and at most
+max_workers + max_queue requests are admitted at once; anything beyond that
+is rejected immediately (HTTP 503) instead of queueing without bound.
+
+Sizes come from SCORING_WORKERS and SCORING_QUEUE_SIZE.
+"""
+
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+SCORING_WORKERS = int(os.getenv("SCORING_WORKERS", str(min(8, os.cpu_count() or 1))))
+SCORING_QUEUE_SIZE = int(os.getenv("SCORING_QUEUE_SIZE", "64"))
+
+
+class ExecutorFull(Exception):
+    """Raised when the scoring queue is full and a request is rejected."""
+
+
+class BoundedExecutor:
+    def __init__(self, max_workers=SCORING_WORKERS, max_queue=SCORING_QUEUE_SIZE):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="scoring")
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._lock = threading.Lock()
+        self.in_flight = self.completed = self.rejected = 0
+
+    async def run(self, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) on the pool; raise ExecutorFull if no slot is free."""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise ExecutorFull(f"Scoring queue full ({self.max_workers} workers + {self.max_queue} queued)")
+        with self._lock:
+            self.in_flight += 1
+        try:
+            future = self._pool.submit(functools.partial(fn, *args, **kwargs))
+        except BaseException:
+            self._release(None)
+            raise
+        # The slot is freed when the work itself ends, not when the caller stops
+        # waiting: a cancelled request (client gone) keeps its slot until its thread is done
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def _release(self, _future):
+        with self._lock:
+            self.in_flight -= 1
+            self.completed += 1
+        self._slots.release()
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False)
+
+    def stats(self):
+        return {
+            "workers": self.max_workers,
+            "queue_size": self.max_queue,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
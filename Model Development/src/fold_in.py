@@ -0,0 +1,193 @@
+# --- src/fold_in.py
+"""
+Online fold-in of user factors.
+
+A new or changed rating used to show up in recommendations only after a full
+train_cf run. With the item factors (qi, bi) held fixed, a user's (pu, bu) is
+the solution of one small ridge regression over that user's ratings:
+
+    [pu, bu] = argmin sum_i (r_ui - mu - bi - qi.pu - bu)^2 + reg * n_u * |[pu, bu]|^2
+
+(the same objective as one user step of src.mf_trainer), which takes well
+under a millisecond. Results live in a UserFactorOverlay that SVDScorer and
+UserHistoryIndex consult before the trained arrays, so fresh ratings change
+scores and seen-movie masks immediately. The overlay lives until the next
+retrain, when the ratings are part of the model.
+
+UserFactorOverlay is in-process and only correct with a single worker; with
+USER_STATE_BACKEND=redis (src.cache) every worker reads the same entries from
+RedisUserFactorOverlay, so all of them serve the folded-in user. Redis outlives
+the model, so its keys carry the CF model version (model_bundle.cf_version):
+after a retrain the old factors and catalog positions are no longer read.
+"""
+
+import json
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+from src.cache import USER_STATE_BACKEND, redis_client
+
+FOLD_IN_REG = 0.05
+
+OverlayEntry = namedtuple("OverlayEntry", ["pu", "bu", "seen_positions", "revision"])
+
+
+class UserFactorOverlay:
+    """Thread-safe user_id -> folded-in (pu, bu, seen catalog positions)."""
+
+    def __init__(self):
+        self._entries = {}
+        self._revisions = {}
+        self._lock = threading.Lock()
+        self.updates = 0
+
+    def get(self, user_id):
+        return self._entries.get(user_id)
+
+    def set(self, user_id, pu, bu, seen_positions):
+        with self._lock:
+            revision = self._revisions.get(user_id, 0) + 1
+            self._revisions[user_id] = revision
+            self._entries[user_id] = OverlayEntry(pu, float(bu), np.asarray(seen_positions, dtype=np.int64), revision)
+            self.updates += 1
+        return revision
+
+    def discard(self, user_id):
+        """Drop user_id's entry (scoring falls back to the trained factors)."""
+        with self._lock:
+            if self._entries.pop(user_id, None) is not None:
+                self._revisions[user_id] = self._revisions.get(user_id, 0) + 1
+                self.updates += 1
+            return self._revisions.get(user_id, 0)
+
+    def revision(self, user_id):
+        """Bumped on every change for user_id; part of cache keys for per-user results."""
+        return self._revisions.get(user_id, 0)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        return {"users": len(self._entries), "updates": self.updates, "backend": "memory"}
+
+
+class RedisUserFactorOverlay:
+    """
+    UserFactorOverlay shared through Redis: entries are JSON documents, revisions
+    Redis counters, so every worker sees an update as soon as it is written.
+    Keys are scoped to model_version, the CF model the factors were solved against.
+    """
+
+    def __init__(self, model_version, client=None, prefix="cinesuggest:overlay:"):
+        self.client = client if client is not None else redis_client()
+        self.model_version = model_version
+        self.prefix = f"{prefix}{model_version}:"
+
+    def _key(self, kind, user_id):
+        return f"{self.prefix}{kind}:{user_id}"
+
+    def get(self, user_id):
+        raw = self.client.get(self._key("entry", user_id))
+        if raw is None:
+            return None
+        doc = json.loads(raw)
+        return OverlayEntry(np.asarray(doc["pu"]), doc["bu"],
+                            np.asarray(doc["seen_positions"], dtype=np.int64), doc["revision"])
+
+    def set(self, user_id, pu, bu, seen_positions):
+        revision = int(self.client.incr(self._key("revision", user_id)))
+        self.client.set(self._key("entry", user_id), json.dumps({
+            "pu": np.asarray(pu, dtype=np.float64).tolist(),
+            "bu": float(bu),
+            "seen_positions": np.asarray(seen_positions, dtype=np.int64).tolist(),
+            "revision": revision,
+        }))
+        self.client.sadd(f"{self.prefix}users", user_id)
+        self.client.incr(f"{self.prefix}updates")
+        return revision
+
+    def discard(self, user_id):
+        if self.client.delete(self._key("entry", user_id)):
+            self.client.srem(f"{self.prefix}users", user_id)
+            self.client.incr(f"{self.prefix}updates")
+            return int(self.client.incr(self._key("revision", user_id)))
+        return self.revision(user_id)
+
+    def revision(self, user_id):
+        return int(self.client.get(self._key("revision", user_id)) or 0)
+
+    def __len__(self):
+        return int(self.client.scard(f"{self.prefix}users"))
+
+    def stats(self):
+        return {"users": len(self), "updates": int(self.client.get(f"{self.prefix}updates") or 0),
+                "backend": "redis", "model_version": self.model_version}
+
+
+def create_user_overlay(model_version=None, backend=USER_STATE_BACKEND):
+    """Overlay for the CF model model_version (only used to scope the shared redis keys)."""
+    if backend == "redis":
+        return RedisUserFactorOverlay(model_version)
+    if backend == "memory":
+        return UserFactorOverlay()
+    raise ValueError(f"Unknown USER_STATE_BACKEND '{backend}' (expected 'memory' or 'redis')")
+
+
+def rescale_ratings(ratings, from_scale, to_scale):
+    """Map ratings linearly from from_scale (low, high), e.g. the backend's 0.5-10, onto to_scale."""
+    ratings = np.asarray(ratings, dtype=np.float64)
+    (lo, hi), (new_lo, new_hi) = from_scale, to_scale
+    return new_lo + (ratings - lo) * (new_hi - new_lo) / (hi - lo)
+
+
+def fold_in_user(scorer, movie_ids, ratings, reg=FOLD_IN_REG):
+    """
+    Solve (pu, bu) for one user from their ratings against the scorer's fixed
+    catalog-aligned item factors. Movies outside the catalog are ignored.
+    Ratings must be on the model's scale (rescale_ratings); values outside
+    scorer.rating_scale are clipped so they cannot inflate bu.
+    Returns (pu, bu, catalog positions of the rated movies); pu is None when
+    no rating informs the factors (no catalog movie, or only untrained ones in
+    an unbiased model).
+    """
+    pos = np.array([scorer.catalog_pos.get(mid, -1) for mid in movie_ids], dtype=np.int64)
+    keep = pos >= 0
+    pos = pos[keep]
+    r = np.clip(np.asarray(ratings, dtype=np.float64)[keep], *scorer.rating_scale)
+    k = scorer.qi_cat.shape[1]
+
+    if scorer.biased:
+        # Unknown items have zero factors and bias, so they only inform bu
+        x = np.hstack([scorer.qi_cat[pos], np.ones((len(pos), 1))])
+        y = r - scorer.global_mean - scorer.bi_cat[pos]
+    else:
+        known = scorer.known_items[pos]
+        x = scorer.qi_cat[pos[known]]
+        y = r[known]
+
+    if len(y) == 0:
+        return None, 0.0, pos
+
+    a = x.T @ x
+    a += (reg * len(y)) * np.eye(x.shape[1])
+    w = np.linalg.solve(a, x.T @ y)
+    if scorer.biased:
+        return w[:k], float(w[k]), pos
+    return w, 0.0, pos
+
+
+def apply_user_ratings(scorer, overlay, user_id, movie_ids, ratings, reg=FOLD_IN_REG):
+    """
+    Fold in user_id's current ratings and publish them in the overlay. Returns the new revision.
+    When no rating informs the factors there is nothing to fold in: the
+    override is dropped (scoring falls back to the trained factors, if any)
+    rather than publishing all-zero factors.
+    """
+    if len(movie_ids) == 0:
+        return overlay.discard(user_id)
+    pu, bu, pos = fold_in_user(scorer, movie_ids, ratings, reg=reg)
+    if pu is None:
+        return overlay.discard(user_id)
+    return overlay.set(user_id, pu, bu, pos)
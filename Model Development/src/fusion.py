@@ -0,0 +1,66 @@
+# --- src/fusion.py
+"""
+Score-level fusion of hybrid candidates (CB, CF, popularity, ...).
+
+hybrid_recommend used to turn both ranked lists into rank points in dicts
+keyed by title, so a film named differently in the two catalogs was either
+missed or returned twice, and the actual similarity / rating scores were
+thrown away. Candidates are now mapped onto one integer item space through
+the CB <-> CF crosswalk:
+
+    item id = CF catalog position           if the CB row is matched (or CF-only)
+            = n_cf + CB row                 for CB rows with no CF counterpart
+
+Each source's scores are min-max normalised to [FUSION_SCORE_FLOOR, 1] over
+its own candidates (so even its weakest candidate counts) and scattered into a dense (items x sources) feature matrix over
+the union (np.unique); the blend is one matrix-vector product with the source
+weights (e.g. weight_cb * cb + weight_cf * cf). A candidate a source did not
+propose scores 0 there.
+"""
+
+import os
+
+import numpy as np
+
+# Normalised score of a source's weakest candidate (0 is reserved for "not proposed")
+FUSION_SCORE_FLOOR = float(os.getenv("FUSION_SCORE_FLOOR", "0.1"))
+
+
+def minmax(scores, floor=FUSION_SCORE_FLOOR):
+    """Scale scores to [floor, 1]; a constant (non-empty) array maps to ones."""
+    scores = np.asarray(scores, dtype=np.float64)
+    if len(scores) == 0:
+        return scores
+    lo, hi = scores.min(), scores.max()
+    if hi - lo <= 0:
+        return np.ones_like(scores)
+    return floor + (1.0 - floor) * (scores - lo) / (hi - lo)
+
+
+def unified_ids(crosswalk, n_cf, cb_rows):
+    """Item ids of CB rows: their CF position when matched, else n_cf + row."""
+    cb_rows = np.asarray(cb_rows, dtype=np.int64)
+    cf_pos = crosswalk.to_cf(cb_rows).astype(np.int64)
+    return np.where(cf_pos >= 0, cf_pos, n_cf + cb_rows)
+
+
+def fuse(sources, weights):
+    """
+    Blend scored candidate sets given in the unified item space.
+
+    sources: list of (item ids, raw scores), one per candidate generator.
+    weights: one weight per source.
+    Returns (item ids over the union in ascending order, fused scores,
+    features) where features[i, j] is item i's normalised score from source j
+    (0 if source j did not propose it).
+    """
+    ids_per_source = [np.asarray(ids, dtype=np.int64) for ids, _ in sources]
+    all_ids = np.concatenate(ids_per_source) if ids_per_source else np.empty(0, dtype=np.int64)
+    ids, inverse = np.unique(all_ids, return_inverse=True)
+
+    features = np.zeros((len(ids), len(sources)))
+    start = 0
+    for j, (src_ids, (_, scores)) in enumerate(zip(ids_per_source, sources)):
+        features[inverse[start:start + len(src_ids)], j] = minmax(scores)
+        start += len(src_ids)
+    return ids, features @ np.asarray(weights, dtype=np.float64), features
@@ -1,32 +1,163 @@
 # --- hybrid.py ---
-import pickle
-import joblib
-import pandas as pd
+"""
+Staged hybrid recommender.
+
+    1. candidate generation   every generator returns a bounded set of
+                              (item ids, scores) in the crosswalk-aligned item
+                              space (src.fusion):
+                                cb       CB neighbours of the seed movie
+                                cf       the user's top CF movies (MIPS index)
+                                popular  popularity leaderboard
+                                genres   leaderboard of the user's favorite_genres
+    2. reranking              the union (a few hundred items at most) is scored
+                              once with src.fusion.fuse and the top_n are kept
+
+Only the generators look at the catalog, each through a precomputed index, so
+latency stays flat as the catalog grows. Every stage is timed into
+hybrid_stage_latency (reported by /models/stats).
+"""
+
+import os
+import time
+from collections import namedtuple
+
+import numpy as np
 from sklearn.metrics.pairwise import cosine_similarity
-from pathlib import Path
-
-# Directories
-BASE_DIR = Path(__file__).resolve().parents[1]
-MODEL_DIR = BASE_DIR / "models"
-DATA_DIR = BASE_DIR / "data"
-
-# Load saved CB model
-with open(MODEL_DIR / "cb_model.pkl", "rb") as f:
-    cb_model = pickle.load(f)
-
-# Load saved CF model (SVD)
-with open(MODEL_DIR / "cf_svd_model.pkl", "rb") as f:
-    cf_model = pickle.load(f)
+from src.topk import top_k
+from src.candidates import LatencyTracker, cf_candidates, genre_candidates, popular_candidates
+from src.fusion import fuse, unified_ids
+from src.registry import registry as default_registry
+
+# Candidates each generator contributes (at least 2 * top_n)
+HYBRID_SOURCE_K = int(os.getenv("HYBRID_SOURCE_K", "50"))
+
+STAGES = ("cb", "cf", "popular", "genres", "rerank", "total")
+hybrid_stage_latency = {stage: LatencyTracker() for stage in STAGES}
+
+HybridResult = namedtuple("HybridResult", ["titles", "item_ids", "scores", "n_candidates", "timings_ms"])
+
+
+def cb_candidates(cb, idx, k, use_ann=False):
+    """Top-k CB rows most similar to row idx of the CBSnapshot cb, as (rows, cosine scores)."""
+    cb_neighbours = cb.neighbours
+    tfidf_matrix = cb.model["tfidf_matrix"]
+    if cb_neighbours is not None and k <= cb_neighbours.width:
+        rows, scores = cb_neighbours.lookup(idx, k)
+    elif use_ann and cb.ann_index is not None:
+        rows, scores = cb.ann_index.query(tfidf_matrix, idx, k, exclude=[idx])
+    else:
+        cosine_sim = cosine_similarity(tfidf_matrix[idx], tfidf_matrix).ravel()
+        rows = top_k(cosine_sim, k, exclude=[idx])
+        scores = cosine_sim[rows]
+    rows = np.asarray(rows, dtype=np.int64)
+    valid = rows >= 0
+    return rows[valid], np.asarray(scores, dtype=np.float64)[valid]
+
+
+def item_titles(models, item_ids, cb=None):
+    """Titles of unified item ids (CB title when the item has a CB row, else the MovieLens title)."""
+    df = (cb or models.cb).model["df"]
+    cf_scorer = models.cf_scorer
+    n_cf = len(cf_scorer.catalog_ids)
+    item_ids = np.asarray(item_ids, dtype=np.int64)
+    cb_rows = np.where(item_ids >= n_cf, item_ids - n_cf, models.crosswalk.to_cb(item_ids))
+
+    titles = []
+    for item, row in zip(item_ids.tolist(), cb_rows.tolist()):
+        if 0 <= row < len(df):
+            titles.append(df["title"].iat[row])
+        else:
+            titles.append(models.movie_map[int(cf_scorer.catalog_ids[item])])
+    return titles
+
+
+def generate_candidates(models, seed_row, user_id, k, favorite_genres=None, use_ann=False, k_cb=None,
+                        sources=None, cb=None, exact_cf=False):
+    """
+    Run the candidate generators named in sources (default: all) for one request
+    (k candidates each, k_cb for CB if given; seed_row is a row of the CBSnapshot cb;
+    exact_cf asks cf_candidates for a full-catalog scan).
+    Returns ({source: (item ids, scores)}, {source: ms}).
+    """
+    cb = cb or models.cb
+    n_cf = len(models.cf_scorer.catalog_ids)
+    seen_ids = models.cf_scorer.catalog_ids[models.user_history.seen_positions(user_id)]
+    generators = {
+        "cb": lambda: _cb_items(models, cb, seed_row, k_cb or k, use_ann, n_cf),
+        # CF scores the full catalog when no MIPS index was built (or exact_cf, within the p99 budget)
+        "cf": lambda: cf_candidates(models, user_id, k, exact=exact_cf),
+        "popular": lambda: popular_candidates(models, k, exclude_ids=seen_ids),
+        "genres": lambda: genre_candidates(models, favorite_genres, k, exclude_ids=seen_ids),
+    }
+
+    candidates, timings = {}, {}
+    for name, generate in generators.items():
+        if sources is not None and name not in sources:
+            continue
+        start = time.perf_counter()
+        candidates[name] = generate()
+        timings[name] = (time.perf_counter() - start) * 1000
+    return candidates, timings
+
+
+def _cb_items(models, cb, seed_row, k, use_ann, n_cf):
+    rows, scores = cb_candidates(cb, seed_row, k, use_ann=use_ann)
+    return unified_ids(models.crosswalk, n_cf, rows), scores
+
+
+def rerank(sources, weights, top_n, exclude_ids=()):
+    """
+    Blend the candidate sets (src.fusion.fuse) and keep the top_n items not in exclude_ids.
+    Returns (item ids, fused scores, number of candidates), best first.
+    """
+    names = list(sources)
+    ids, scores, _ = fuse([sources[name] for name in names], [weights.get(name, 0.0) for name in names])
+    best = top_k(scores, top_n, exclude=np.isin(ids, exclude_ids))
+    return ids[best], scores[best], len(ids)
 
-# Load movieId → title map
-movie_map = joblib.load(MODEL_DIR / "movieid_to_title.joblib")
 
-# Load ratings (needed for CF predictions)
-ratings = pd.read_parquet(DATA_DIR / "ratings_cleaned.parquet")
+def hybrid_pipeline(movie_title, user_id, top_n=10, weight_cb=0.5, weight_cf=0.5, weight_popular=0.1,
+                    weight_genres=0.2, favorite_genres=None, use_ann=False, models=None, exact_cf=False):
+    """
+    Run the staged pipeline; returns a HybridResult, or None if movie_title is unknown.
+    See hybrid_recommend for the parameters.
+    """
+    start = time.perf_counter()
+    models = models or default_registry
+    cb = models.cb   # one catalog version for the whole request
+    seed_row = cb.titles.resolve(movie_title)
+    if seed_row is None:
+        return None
+
+    k = max(HYBRID_SOURCE_K, top_n * 2)
+    cb_neighbours = cb.neighbours
+    if cb_neighbours is not None and top_n * 2 - 1 <= cb_neighbours.width:
+        # Stay on the precomputed neighbour rows rather than scan the catalog
+        k_cb = min(k, cb_neighbours.width)
+    else:
+        k_cb = top_n * 2 - 1
+    # Sources with weight 0 are not generated at all (e.g. CF for users without ratings)
+    weights = {"cb": weight_cb, "cf": weight_cf, "popular": weight_popular, "genres": weight_genres}
+    active = {name for name, weight in weights.items() if weight > 0}
+    sources, timings = generate_candidates(models, seed_row, user_id, k, favorite_genres, use_ann, k_cb,
+                                           sources=active, cb=cb, exact_cf=exact_cf)
+
+    rerank_start = time.perf_counter()
+    seed = unified_ids(models.crosswalk, len(models.cf_scorer.catalog_ids), [seed_row])
+    item_ids, scores, n_candidates = rerank(sources, weights, top_n, exclude_ids=seed)
+    titles = item_titles(models, item_ids, cb)
+    timings["rerank"] = (time.perf_counter() - rerank_start) * 1000
+    timings["total"] = (time.perf_counter() - start) * 1000
+
+    for stage, ms in timings.items():
+        hybrid_stage_latency[stage].record(ms)
+    return HybridResult(titles, item_ids, scores, n_candidates,
+                        {stage: round(ms, 3) for stage, ms in timings.items()})
 
 
 # --- Hybrid Function ---
-def hybrid_recommend(movie_title, user_id, top_n=10, weight_cb=0.5, weight_cf=0.5):
+def hybrid_recommend(movie_title, user_id, top_n=10, weight_cb=0.5, weight_cf=0.5, use_ann=False, models=None,
+                     favorite_genres=None, weight_popular=0.1, weight_genres=0.2, exact_cf=False):
     """
     Hybrid Recommendations: combines Content-Based and Collaborative Filtering
 
@@ -34,50 +165,17 @@ def hybrid_recommend(movie_title, user_id, top_n=10, weight_cb=0.5, weight_cf=0.
     user_id: int - the user for collaborative filtering
     top_n: int - number of recommendations
     weight_cb: float - weight for content-based score
-    weight_cf: float - weight for collaborative score
+    weight_cf: float - weight for collaborative score (0 skips the CF stage, e.g. for users without ratings)
+    use_ann: bool - use the LSH index for the CB part (if it was built)
+    models: ModelRegistry - loaded artifacts (defaults to the shared registry)
+    favorite_genres: list of str - the user's favourite genres (UserPreference), if known
+    weight_popular: float - weight for the popularity leaderboard score
+    weight_genres: float - weight for popularity within favorite_genres
+    exact_cf: bool - score the full catalog in the CF stage instead of the MIPS index
+              (falls back to the index while the CF stage is over its p99 budget)
     """
-
-    # --- Content-Based Part ---
-    indices = cb_model["indices"]
-    df = cb_model["df"]
-    tfidf_matrix = cb_model["tfidf_matrix"]
-
-    movie_title = movie_title.lower().strip()
-    if movie_title not in indices:
-        return []
-
-    idx = indices[movie_title]
-    cosine_sim = cosine_similarity(tfidf_matrix[idx], tfidf_matrix).flatten()
-    sim_scores = list(enumerate(cosine_sim))
-    sim_scores = sorted(sim_scores, key=lambda x: x[1], reverse=True)
-    sim_scores = sim_scores[1:top_n * 2]
-    cb_candidates = df['title'].iloc[[i[0] for i in sim_scores]].tolist()
-    cb_scores = {movie: (top_n * 2 - rank) for rank, movie in enumerate(cb_candidates)}
-
-    # --- Collaborative Filtering Part ---
-    seen_movies = ratings.loc[ratings["userId"] == user_id, "movieId"].tolist()
-    all_movies = list(movie_map.keys())
-
-    predictions = []
-    for movie_id in all_movies[:5000]:  # 🔹 limit to avoid slowness
-        if movie_id not in seen_movies:
-            pred = cf_model.predict(user_id, movie_id)
-            predictions.append((movie_id, pred.est))
-
-    predictions.sort(key=lambda x: x[1], reverse=True)
-    cf_candidates = [movie_map[mid] for mid, _ in predictions[:top_n * 2]]
-    cf_scores = {movie: (top_n * 2 - rank) for rank, movie in enumerate(cf_candidates)}
-
-    # --- Merge CB + CF ---
-    all_movies = set(cb_scores.keys()) | set(cf_scores.keys())
-    final_scores = {}
-    for movie in all_movies:
-        score_cb = cb_scores.get(movie, 0)
-        score_cf = cf_scores.get(movie, 0)
-        final_score = (score_cb * weight_cb) + (score_cf * weight_cf)
-        final_scores[movie] = final_score
-
-    # Sort final scores
-    sorted_movies = sorted(final_scores.items(), key=lambda x: x[1], reverse=True)
-
-    return [movie for movie, score in sorted_movies][:top_n]
+    result = hybrid_pipeline(movie_title, user_id, top_n=top_n, weight_cb=weight_cb, weight_cf=weight_cf,
+                             weight_popular=weight_popular, weight_genres=weight_genres,
+                             favorite_genres=favorite_genres, use_ann=use_ann, models=models,
+                             exact_cf=exact_cf)
+    return result.titles if result is not None else []
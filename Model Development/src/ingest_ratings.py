@@ -0,0 +1,95 @@
+# --- src/ingest_ratings.py
+"""
+Streaming ratings ingestion.
+
+Converts a MovieLens ratings CSV to Parquet chunk by chunk, so memory stays
+bounded by chunksize no matter how large the file is. Columns are downcast
+while reading (int32 ids, float32 ratings) and every row group carries
+min/max statistics, so readers can skip row groups and read only the columns
+they need.
+
+Training and serving read the result through memory-mapped Arrow
+(read_ratings), which avoids an intermediate copy of the file.
+
+Usage:  python -m src.ingest_ratings data/ratings.csv data/ratings_cleaned.parquet
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+DATA_DIR = Path(__file__).resolve().parents[1] / "data"
+RATINGS_DTYPES = {"userId": "int32", "movieId": "int32", "rating": "float32"}
+RATINGS_SCHEMA = pa.schema([
+    ("userId", pa.int32()),
+    ("movieId", pa.int32()),
+    ("rating", pa.float32()),
+    ("timestamp", pa.timestamp("s")),
+])
+
+
+def _to_timestamp(col):
+    """MovieLens ships timestamps either as epoch seconds or as 'YYYY-MM-DD HH:MM:SS' strings."""
+    if pd.api.types.is_numeric_dtype(col):
+        return pd.to_datetime(col, unit="s")
+    return pd.to_datetime(col)
+
+
+def csv_to_parquet(csv_path, parquet_path, chunksize=1_000_000, row_group_size=1_000_000):
+    """
+    Stream csv_path into parquet_path with compact dtypes.
+    Returns the number of rows written.
+    """
+    header = pd.read_csv(csv_path, nrows=0).columns
+    has_timestamp = "timestamp" in header
+    schema = RATINGS_SCHEMA if has_timestamp else RATINGS_SCHEMA.remove(RATINGS_SCHEMA.get_field_index("timestamp"))
+    usecols = list(schema.names)
+
+    tmp_path = Path(str(parquet_path) + ".tmp")
+    n_rows = 0
+    start = time.perf_counter()
+    with pq.ParquetWriter(tmp_path, schema, compression="snappy", write_statistics=True) as writer:
+        for chunk in pd.read_csv(csv_path, usecols=usecols, dtype=RATINGS_DTYPES, chunksize=chunksize):
+            if has_timestamp:
+                chunk["timestamp"] = _to_timestamp(chunk["timestamp"])
+            table = pa.Table.from_pandas(chunk[usecols], schema=schema, preserve_index=False, safe=False)
+            writer.write_table(table, row_group_size=row_group_size)
+            n_rows += len(chunk)
+            print(f"  {n_rows:,} rows ({n_rows / (time.perf_counter() - start):,.0f} rows/s)")
+    tmp_path.replace(parquet_path)
+    return n_rows
+
+
+def read_ratings(parquet_path, columns=("userId", "movieId", "rating")):
+    """
+    Read only the requested columns through a memory-mapped Arrow file.
+    Returns a DataFrame with the compact on-disk dtypes.
+    """
+    table = pq.read_table(parquet_path, columns=list(columns), memory_map=True)
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+
+def read_ratings_arrays(parquet_path, columns=("userId", "movieId", "rating")):
+    """Same as read_ratings, but as a dict of NumPy arrays (no pandas index)."""
+    table = pq.read_table(parquet_path, columns=list(columns), memory_map=True)
+    return {name: table.column(name).to_numpy() for name in columns}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream a ratings CSV into compact Parquet.")
+    parser.add_argument("csv_path", type=Path, nargs="?", default=DATA_DIR / "ratings.csv")
+    parser.add_argument("parquet_path", type=Path, nargs="?", default=DATA_DIR / "ratings_cleaned.parquet")
+    parser.add_argument("--chunksize", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    print(f"Streaming {args.csv_path} -> {args.parquet_path}")
+    n_rows = csv_to_parquet(args.csv_path, args.parquet_path, chunksize=args.chunksize)
+    print(f"✅ {n_rows:,} ratings saved to {args.parquet_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-from hybrid import hybrid_recommend
+from src.hybrid import hybrid_recommend
 
 if __name__ == "__main__":
     movie_name = "Interstellar"
@@ -9,4 +9,4 @@ if __name__ == "__main__":
 
 
 # To run this script, use the command:
-#python -m src.main  
\ No newline at end of file
+# python -m src.main  (from the Model Development directory)
\ No newline at end of file
@@ -0,0 +1,200 @@
+# --- src/mf_trainer.py
+"""
+In-house matrix factorisation trainer (biased ALS) on compact COO arrays.
+
+Surprise needs the whole rating set as Python objects and fits SVD with a
+single-threaded SGD loop, which is why training used to stop at 3M ratings.
+This trainer works directly on int32 userId / movieId and float32 rating
+arrays (as read from ratings_cleaned.parquet) and alternates closed-form
+ridge solves:
+
+    user step:  [pu, bu] = argmin sum_i (r_ui - mu - bi - qi.pu - bu)^2 + reg * n_u * |[pu, bu]|^2
+    item step:  [qi, bi] = same with the user factors held fixed
+
+(weighted-lambda regularisation, as in ALS-WR). Each row solve is a small
+(n_factors + 1)^2 system and rows are independent: a half-epoch splits the
+rows into contiguous chunks, builds each chunk's normal equations as a
+stacked (rows, k + 1, k + 1) array (batched matmuls over rows of similar
+length, zero-padded in blocks of at most SOLVE_BLOCK_BYTES) and solves them
+with one batched np.linalg.solve. Chunks run on a thread pool (LAPACK and the
+NumPy kernels release the GIL).
+
+The fitted model exposes pu, qi, bu, bi, biased and a trainset with
+global_mean, rating_scale and the raw -> inner id maps, i.e. exactly what
+SVDScorer.from_algo and write_cf_bundle read from a surprise.SVD.
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Memory for one zero-padded block of rating rows while building the normal equations
+SOLVE_BLOCK_BYTES = 32 * 2**20
+
+
+class FactorTrainset:
+    """The subset of surprise.Trainset that the scoring code relies on."""
+
+    def __init__(self, user_ids, item_ids, global_mean, rating_scale):
+        self.global_mean = float(global_mean)
+        self.rating_scale = (float(rating_scale[0]), float(rating_scale[1]))
+        self._raw2inner_id_users = {uid: inner for inner, uid in enumerate(user_ids.tolist())}
+        self._raw2inner_id_items = {iid: inner for inner, iid in enumerate(item_ids.tolist())}
+        self.n_users = len(user_ids)
+        self.n_items = len(item_ids)
+
+
+def _csr(rows, cols, vals, n_rows):
+    """Group COO entries by row: row r owns cols[indptr[r]:indptr[r + 1]]."""
+    order = np.argsort(rows, kind="stable")
+    indptr = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n_rows), out=indptr[1:])
+    return indptr, cols[order], vals[order]
+
+
+def _solve_rows(rows, indptr, cols, target, design, fixed_b, reg, out_f, out_b):
+    """
+    Ridge solve for [factors, bias] of every row in rows (a contiguous range),
+    written in place; rows without ratings get zeros.
+    design is the fixed side's factors with a column of ones appended (for the bias).
+    """
+    if len(rows) == 0:
+        return
+    k1 = design.shape[1]
+    r0, r1 = int(rows[0]), int(rows[-1]) + 1
+    counts = np.diff(indptr[r0:r1 + 1])
+    by_length = np.argsort(counts, kind="stable")
+    sorted_counts = counts[by_length]
+    a = np.empty((r1 - r0, k1, k1))
+    b = np.empty((r1 - r0, k1))
+
+    # Rows of similar length (in by_length order) are zero-padded into one
+    # (rows, length, k + 1) block, so their normal equations are one batched matmul
+    lo = 0
+    while lo < len(by_length):
+        length = max(int(sorted_counts[lo]), 1)
+        hi = min(lo + max(1, SOLVE_BLOCK_BYTES // (8 * k1 * length)), len(by_length))
+        length = max(int(sorted_counts[hi - 1]), 1)
+        hi = min(hi, lo + max(1, SOLVE_BLOCK_BYTES // (8 * k1 * length)))
+
+        offsets = np.arange(length)
+        valid = offsets[None, :] < sorted_counts[lo:hi, None]
+        entries = np.where(valid, indptr[r0 + by_length[lo:hi], None] + offsets[None, :], 0)
+        idx = cols[entries]
+        x = design[idx]
+        x[~valid] = 0.0
+        y = np.where(valid, target[entries] - fixed_b[idx], 0.0)
+        xt = x.transpose(0, 2, 1)
+        np.matmul(xt, x, out=a[lo:hi])
+        b[lo:hi] = (xt @ y[:, :, None])[:, :, 0]
+        lo = hi
+
+    # Ridge term on the diagonal; empty rows get the identity (and a zero right-hand side), i.e. zero factors
+    diag = np.arange(k1)
+    a[:, diag, diag] += np.where(sorted_counts > 0, reg * sorted_counts, 1.0)[:, None]
+    w = np.linalg.solve(a, b[:, :, None])[:, :, 0]
+    out_f[r0 + by_length] = w[:, :k1 - 1]
+    out_b[r0 + by_length] = w[:, k1 - 1]
+
+
+class MatrixFactorization:
+    """
+    Biased matrix factorisation fitted with alternating least squares.
+    Drop-in for surprise.SVD as far as SVDScorer / the model bundle are concerned.
+    """
+
+    biased = True
+
+    def __init__(self, n_factors=50, n_epochs=15, reg=0.05, init_std_dev=0.1,
+                 random_state=42, n_jobs=None, verbose=True):
+        self.n_factors = n_factors
+        self.n_epochs = n_epochs
+        self.reg = reg
+        self.init_std_dev = init_std_dev
+        self.random_state = random_state
+        self.n_jobs = n_jobs or os.cpu_count() or 1
+        self.verbose = verbose
+
+    def fit(self, user_ids, movie_ids, ratings, rating_scale=None):
+        """
+        user_ids, movie_ids, ratings: equal-length arrays (one entry per rating).
+        rating_scale defaults to the (min, max) of ratings.
+        """
+        ratings = np.asarray(ratings, dtype=np.float32)
+        if rating_scale is None:
+            rating_scale = (float(ratings.min()), float(ratings.max()))
+        raw_users, u = np.unique(np.asarray(user_ids), return_inverse=True)
+        raw_items, i = np.unique(np.asarray(movie_ids), return_inverse=True)
+        u = u.astype(np.int32)
+        i = i.astype(np.int32)
+
+        global_mean = float(ratings.mean(dtype=np.float64))
+        self.trainset = FactorTrainset(raw_users, raw_items, global_mean, rating_scale)
+        n_users, n_items = len(raw_users), len(raw_items)
+
+        centered = (ratings - global_mean).astype(np.float64)
+        by_user = _csr(u, i, centered, n_users)
+        by_item = _csr(i, u, centered, n_items)
+
+        rng = np.random.default_rng(self.random_state)
+        self.pu = np.zeros((n_users, self.n_factors), dtype=np.float64)
+        self.bu = np.zeros(n_users, dtype=np.float64)
+        self.qi = rng.normal(0.0, self.init_std_dev, (n_items, self.n_factors))
+        self.bi = np.zeros(n_items, dtype=np.float64)
+
+        with ThreadPoolExecutor(max_workers=self.n_jobs) as pool:
+            for epoch in range(self.n_epochs):
+                start = time.perf_counter()
+                self._half_epoch(pool, by_user, self.qi, self.bi, self.pu, self.bu)
+                self._half_epoch(pool, by_item, self.pu, self.bu, self.qi, self.bi)
+                if self.verbose:
+                    print(f"  epoch {epoch + 1}/{self.n_epochs}: {time.perf_counter() - start:.1f}s")
+
+        self.pu = self.pu.astype(np.float32)
+        self.qi = self.qi.astype(np.float32)
+        self.bu = self.bu.astype(np.float32)
+        self.bi = self.bi.astype(np.float32)
+        return self
+
+    def _half_epoch(self, pool, csr, fixed_f, fixed_b, out_f, out_b):
+        indptr, cols, target = csr
+        n_rows = len(indptr) - 1
+        design = np.hstack([fixed_f, np.ones((len(fixed_f), 1))])
+        chunks = np.array_split(np.arange(n_rows), self.n_jobs * 4)
+        list(pool.map(
+            lambda rows: _solve_rows(rows, indptr, cols, target, design, fixed_b,
+                                     self.reg, out_f, out_b),
+            chunks,
+        ))
+
+    def estimate(self, user_ids, movie_ids):
+        """
+        Vectorised predictions for (user, movie) pairs, with SVD.predict()'s
+        fallbacks for unknown users / items and clipping to the rating scale.
+        """
+        ts = self.trainset
+        u = np.array([ts._raw2inner_id_users.get(x, -1) for x in np.asarray(user_ids).tolist()])
+        i = np.array([ts._raw2inner_id_items.get(x, -1) for x in np.asarray(movie_ids).tolist()])
+        known_u, known_i = u >= 0, i >= 0
+        both = known_u & known_i
+
+        est = np.full(len(u), ts.global_mean, dtype=np.float64)
+        est[known_u] += self.bu[u[known_u]]
+        est[known_i] += self.bi[i[known_i]]
+        est[both] += np.einsum("ij,ij->i", self.pu[u[both]], self.qi[i[both]])
+        return np.clip(est, *ts.rating_scale, out=est)
+
+
+def evaluate(model, user_ids, movie_ids, ratings, batch_size=1_000_000):
+    """RMSE and MAE of model.estimate over a held-out set."""
+    ratings = np.asarray(ratings, dtype=np.float64)
+    sq = ab = 0.0
+    for start in range(0, len(ratings), batch_size):
+        sl = slice(start, start + batch_size)
+        err = model.estimate(user_ids[sl], movie_ids[sl]) - ratings[sl]
+        sq += float(err @ err)
+        ab += float(np.abs(err).sum())
+    n = max(len(ratings), 1)
+    return {"rmse": (sq / n) ** 0.5, "mae": ab / n}
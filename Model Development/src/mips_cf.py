@@ -0,0 +1,141 @@
+# --- src/mips_cf.py
+"""
+Maximum inner product search (MIPS) index over the SVD item factors.
+
+For a known user, ranking movies by est = mu + bu + bi + qi.pu is the same as
+ranking by [qi, bi].[pu, 1], a maximum inner product problem. The item vectors
+are augmented with one more coordinate sqrt(M^2 - |x|^2) so they all have norm
+M, which turns MIPS into cosine search (Bachrach et al., 2014). The augmented
+vectors are clustered with spherical k-means (IVF): a query only scores the
+movies of its n_probe closest clusters exactly, instead of the whole catalog.
+
+Positions are catalog positions of the SVDScorer the index was built from.
+"""
+
+import time
+import numpy as np
+
+from src.topk import top_k
+
+
+def _augment(qi, bi):
+    """Item vectors [qi, bi, sqrt(M^2 - |.|^2)] / M, all of unit norm."""
+    x = np.hstack([qi, bi[:, None]])
+    norms_sq = np.einsum("ij,ij->i", x, x)
+    max_sq = norms_sq.max() if len(norms_sq) else 1.0
+    extra = np.sqrt(np.maximum(max_sq - norms_sq, 0.0))
+    return np.hstack([x, extra[:, None]]) / np.sqrt(max_sq or 1.0)
+
+
+def _spherical_kmeans(x, n_lists, n_iter=10, seed=42, block_size=65536):
+    """Cluster unit vectors by cosine; returns (centroids, assignment)."""
+    rng = np.random.default_rng(seed)
+    centroids = x[rng.choice(len(x), size=n_lists, replace=False)].copy()
+    assign = np.zeros(len(x), dtype=np.int32)
+    for _ in range(n_iter):
+        for start in range(0, len(x), block_size):
+            block = x[start:start + block_size]
+            assign[start:start + block_size] = np.argmax(block @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, x)
+        norms = np.linalg.norm(sums, axis=1)
+        empty = norms == 0
+        sums[empty] = x[rng.choice(len(x), size=int(empty.sum()), replace=False)]
+        norms[empty] = 1.0
+        centroids = sums / norms[:, None]
+    return centroids, assign
+
+
+class MIPSIndex:
+    """
+    centroids: (n_lists, n_factors + 2) unit cluster centres
+    order / offsets: catalog positions of cluster c are order[offsets[c]:offsets[c + 1]]
+    """
+
+    def __init__(self, centroids, order, offsets, n_probe=8):
+        self.centroids = np.asarray(centroids)
+        self.order = np.asarray(order)
+        self.offsets = np.asarray(offsets)
+        self.n_probe = n_probe
+
+    @classmethod
+    def build(cls, scorer, n_lists=None, n_probe=8, n_iter=10, seed=42):
+        """Cluster the catalog-aligned item factors of an SVDScorer."""
+        x = _augment(scorer.qi_cat, scorer.bi_cat if scorer.biased else np.zeros(len(scorer.bi_cat)))
+        n_lists = n_lists or max(1, int(np.sqrt(len(x))))
+        n_lists = min(n_lists, len(x))
+        centroids, assign = _spherical_kmeans(x, n_lists, n_iter=n_iter, seed=seed)
+        order = np.argsort(assign, kind="stable").astype(np.int32)
+        offsets = np.searchsorted(assign[order], np.arange(n_lists + 1)).astype(np.int64)
+        return cls(centroids, order, offsets, n_probe=n_probe)
+
+    def candidates(self, query, n_probe=None):
+        """Catalog positions in the n_probe clusters closest to the query vector."""
+        n_probe = min(n_probe or self.n_probe, len(self.centroids))
+        closest = top_k(self.centroids @ query, n_probe)
+        return np.concatenate([self.order[self.offsets[c]:self.offsets[c + 1]] for c in closest])
+
+    def search(self, scorer, user_id, k, exclude=None, n_probe=None):
+        """
+        Top-k catalog positions for user_id and their (clipped) predicted ratings.
+        Falls back to brute-force scoring for unknown users or when the probed
+        clusters hold fewer than k eligible movies.
+        """
+        factors = scorer.user_factors(user_id)
+        if factors is not None:
+            pu, bu = factors
+            cands = self.candidates(np.append(pu, [1.0 if scorer.biased else 0.0, 0.0]), n_probe)
+            excluded = exclude[cands] if exclude is not None else None
+            n_eligible = len(cands) - (int(excluded.sum()) if excluded is not None else 0)
+            if n_eligible >= k:
+                raw = scorer.qi_cat[cands] @ pu
+                if scorer.biased:
+                    raw = (scorer.global_mean + bu) + scorer.bi_cat[cands] + raw
+                else:
+                    raw = np.where(scorer.known_items[cands], raw, scorer.global_mean)
+                top = top_k(raw, k, exclude=excluded)
+                low, high = scorer.rating_scale
+                return cands[top], np.clip(raw[top], low, high)
+
+        scores = scorer.score_user(user_id)
+        top = top_k(scores, k, exclude=exclude)
+        return top, scores[top]
+
+    def save(self, path):
+        np.savez(path, centroids=self.centroids, order=self.order, offsets=self.offsets,
+                 n_probe=self.n_probe)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        return cls(data["centroids"], data["order"], data["offsets"], n_probe=int(data["n_probe"]))
+
+
+def mips_recall_at_k(index, scorer, user_ids, k=10, n_probe=None):
+    """
+    Compare the MIPS index with brute-force ranking for the given users.
+    Returns mean recall@k and mean per-query timings (ms).
+    """
+    recalls, exact_ms, mips_ms = [], [], []
+    for user_id in user_ids:
+        u = scorer.user_index.get(user_id)
+        if u is None:
+            continue
+        t0 = time.perf_counter()
+        bias = scorer.bi_cat if scorer.biased else 0.0
+        exact = top_k(bias + scorer.qi_cat @ scorer.pu[u], k)
+        t1 = time.perf_counter()
+        approx, _ = index.search(scorer, user_id, k, n_probe=n_probe)
+        t2 = time.perf_counter()
+
+        recalls.append(len(np.intersect1d(exact, approx)) / max(len(exact), 1))
+        exact_ms.append((t1 - t0) * 1000)
+        mips_ms.append((t2 - t1) * 1000)
+
+    return {
+        "k": k,
+        "users": len(recalls),
+        "recall": float(np.mean(recalls)) if recalls else 0.0,
+        "exact_ms": float(np.mean(exact_ms)) if exact_ms else 0.0,
+        "mips_ms": float(np.mean(mips_ms)) if mips_ms else 0.0,
+    }
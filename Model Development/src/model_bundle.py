@@ -0,0 +1,286 @@
+# --- src/model_bundle.py
+"""
+Versioned, pickle-free model bundle.
+
+Instead of pickling the Surprise SVD object and the CB dict (DataFrame +
+vectorizer + sparse matrix), every array is written as a plain .npy file and
+described by a small manifest.json:
+
+    models/bundle/
+        manifest.json
+        cf_pu.npy, cf_bu.npy, cf_user_ids.npy          user factors / biases
+        cf_catalog_ids.npy, cf_catalog_titles.npy      movie_map as two arrays
+        cf_qi.npy, cf_bi.npy                           item factors / biases aligned with the catalog
+        cf_known_items.npy                             catalog movies the model was trained on
+        cb_data.npy, cb_indices.npy, cb_indptr.npy     CSR TF-IDF components
+        cb_titles.npy, cb_genres.npy, cb_years.npy     CB metadata used at serving time (year -1 if unknown)
+        cb_idf.npy, cb_vocabulary.json                 fitted TF-IDF vocabulary
+        cb_title_index.json                            title -> row resolver (src.title_index)
+
+Arrays are loaded with np.load(mmap_mode="r"), so startup does no
+deserialisation and several uvicorn workers share the same pages through the
+OS page cache.
+
+Artifacts derived from the CF model and keyed by catalog position
+(cf_mips_index.npz, cf_item_neighbours_*.npy) live next to the bundle. Each
+one gets a <name>_meta.json stamp with the CF section's version (the mtime
+of cf_svd_model.pkl when serving from pickles) and the catalog size
+(write_stamp), and the registry ignores it when either no longer
+matches the loaded model (stale_reason).
+
+Convert existing pickles with:  python -m src.model_bundle
+"""
+
+import json
+import pickle
+import time
+import joblib
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from scipy.sparse import csr_matrix
+
+from src.svd_scorer import SVDScorer
+from src.title_index import TitleResolver
+
+FORMAT_VERSION = 1
+MODEL_DIR = Path(__file__).resolve().parents[1] / "models"
+BUNDLE_DIR = MODEL_DIR / "bundle"
+MANIFEST = "manifest.json"
+
+
+# ---------------- Manifest ----------------
+def bundle_exists(bundle_dir=BUNDLE_DIR):
+    return (Path(bundle_dir) / MANIFEST).exists()
+
+
+def read_manifest(bundle_dir=BUNDLE_DIR):
+    with open(Path(bundle_dir) / MANIFEST) as f:
+        manifest = json.load(f)
+    if manifest.get("format_version") != FORMAT_VERSION:
+        raise ValueError(
+            f"Unsupported model bundle format {manifest.get('format_version')} "
+            f"(expected {FORMAT_VERSION}); re-export with python -m src.model_bundle"
+        )
+    return manifest
+
+
+def _update_manifest(bundle_dir, section, info):
+    """Write one section (cf / cb) and bump the bundle's model_version."""
+    path = Path(bundle_dir) / MANIFEST
+    manifest = {"format_version": FORMAT_VERSION}
+    if path.exists():
+        with open(path) as f:
+            manifest = json.load(f)
+    manifest["format_version"] = FORMAT_VERSION
+    manifest[section] = info
+    manifest["model_version"] = time.strftime("%Y%m%d%H%M%S")
+    with open(path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def _save(bundle_dir, name, array):
+    np.save(Path(bundle_dir) / f"{name}.npy", np.ascontiguousarray(array))
+
+
+def _load(bundle_dir, name, mmap_mode="r"):
+    return np.load(Path(bundle_dir) / f"{name}.npy", mmap_mode=mmap_mode)
+
+
+# ---------------- Collaborative Filtering ----------------
+def write_cf_bundle(algo, movie_map, bundle_dir=BUNDLE_DIR):
+    """
+    Export a fitted surprise.SVD (or mf_trainer.MatrixFactorization) plus the movieId -> title map.
+    Item factors are stored already aligned with the catalog order.
+    """
+    bundle_dir = Path(bundle_dir)
+    bundle_dir.mkdir(parents=True, exist_ok=True)
+
+    scorer = SVDScorer.from_algo(algo, list(movie_map.keys()))
+    user_ids = np.empty(len(scorer.user_index), dtype=np.int64)
+    for raw, inner in scorer.user_index.items():
+        user_ids[inner] = raw
+
+    _save(bundle_dir, "cf_pu", scorer.pu)
+    _save(bundle_dir, "cf_bu", scorer.bu)
+    _save(bundle_dir, "cf_user_ids", user_ids)
+    _save(bundle_dir, "cf_qi", scorer.qi_cat)
+    _save(bundle_dir, "cf_bi", scorer.bi_cat)
+    _save(bundle_dir, "cf_known_items", scorer.known_items)
+    _save(bundle_dir, "cf_catalog_ids", scorer.catalog_ids.astype(np.int64))
+    _save(bundle_dir, "cf_catalog_titles", np.array([str(t) for t in movie_map.values()]))
+
+    return _update_manifest(bundle_dir, "cf", {
+        "n_users": int(len(user_ids)),
+        "n_items": int(len(scorer.catalog_ids)),
+        "n_factors": int(scorer.pu.shape[1]),
+        "global_mean": scorer.global_mean,
+        "rating_scale": list(scorer.rating_scale),
+        "biased": bool(scorer.biased),
+        "version": time.strftime("%Y%m%d%H%M%S"),
+    })
+
+
+def load_cf_scorer(bundle_dir=BUNDLE_DIR):
+    """SVDScorer backed by memory-mapped factor arrays."""
+    info = read_manifest(bundle_dir)["cf"]
+    user_ids = _load(bundle_dir, "cf_user_ids")
+    catalog_ids = _load(bundle_dir, "cf_catalog_ids")
+    known = _load(bundle_dir, "cf_known_items")
+    qi = _load(bundle_dir, "cf_qi")
+    bi = _load(bundle_dir, "cf_bi")
+
+    # In the bundle, the model's item space is the catalog itself
+    known_pos = np.flatnonzero(known)
+    item_index = dict(zip(catalog_ids[known_pos].tolist(), known_pos.tolist()))
+    user_index = dict(zip(user_ids.tolist(), range(len(user_ids))))
+
+    return SVDScorer(
+        pu=_load(bundle_dir, "cf_pu"),
+        qi=qi,
+        bu=_load(bundle_dir, "cf_bu"),
+        bi=bi,
+        global_mean=info["global_mean"],
+        rating_scale=info["rating_scale"],
+        user_index=user_index,
+        item_index=item_index,
+        catalog_ids=catalog_ids,
+        biased=info["biased"],
+        qi_cat=qi,
+        bi_cat=bi,
+    )
+
+
+def load_movie_map(bundle_dir=BUNDLE_DIR):
+    ids = _load(bundle_dir, "cf_catalog_ids").tolist()
+    titles = _load(bundle_dir, "cf_catalog_titles").tolist()
+    return dict(zip(ids, titles))
+
+
+def cf_version(bundle_dir=BUNDLE_DIR):
+    """
+    Version of the CF model being served: the bundle's CF section version, or,
+    in pickle-only mode (no bundle, or one written before versions existed),
+    the mtime of cf_svd_model.pkl next to the bundle directory. None if neither exists.
+    """
+    if bundle_exists(bundle_dir):
+        version = read_manifest(bundle_dir).get("cf", {}).get("version")
+        if version is not None:
+            return version
+    pkl = Path(bundle_dir).parent / "cf_svd_model.pkl"
+    if pkl.exists():
+        return f"pkl-{pkl.stat().st_mtime_ns}"
+    return None
+
+
+# ---------------- Derived CF artifacts ----------------
+def stamp_path(path):
+    """cf_mips_index.npz -> cf_mips_index_meta.json; cf_item_neighbours -> cf_item_neighbours_meta.json"""
+    path = Path(path)
+    name = path.name[:-len(".npz")] if path.name.endswith(".npz") else path.name
+    return path.with_name(f"{name}_meta.json")
+
+
+def write_stamp(path, n_items, bundle_dir=BUNDLE_DIR):
+    """Record the CF model version and catalog size an artifact was built from."""
+    with open(stamp_path(path), "w") as f:
+        json.dump({"cf_version": cf_version(bundle_dir), "n_items": int(n_items)}, f, indent=2)
+
+
+def stale_reason(path, n_items, catalog_size, bundle_dir=BUNDLE_DIR):
+    """
+    Why an artifact with n_items rows, keyed by catalog position, does not fit
+    the loaded CF model; None if it fits. Unstamped artifacts are only checked
+    for size.
+    """
+    if n_items != catalog_size:
+        return f"built for {n_items} catalog items, the CF model has {catalog_size}"
+    stamp = stamp_path(path)
+    if not stamp.exists():
+        return None
+    with open(stamp) as f:
+        built_from = json.load(f).get("cf_version")
+    current = cf_version(bundle_dir)
+    if built_from is not None and current is not None and built_from != current:
+        return f"built from CF model {built_from}, the served model is {current}"
+    return None
+
+
+# ---------------- Content-Based ----------------
+def write_cb_bundle(cb_model, bundle_dir=BUNDLE_DIR):
+    """Export the dict saved by train_cb.py (tfidf, tfidf_matrix, titles, df)."""
+    bundle_dir = Path(bundle_dir)
+    bundle_dir.mkdir(parents=True, exist_ok=True)
+
+    matrix = csr_matrix(cb_model["tfidf_matrix"])
+    df = cb_model["df"]
+    tfidf = cb_model["tfidf"]
+
+    _save(bundle_dir, "cb_data", matrix.data.astype(np.float64))
+    _save(bundle_dir, "cb_indices", matrix.indices.astype(np.int32))
+    _save(bundle_dir, "cb_indptr", matrix.indptr.astype(np.int64))
+    _save(bundle_dir, "cb_titles", df["title"].astype(str).to_numpy(dtype=str))
+    _save(bundle_dir, "cb_genres", df["genre"].astype(str).to_numpy(dtype=str))
+    if "year" in df:
+        years = pd.to_numeric(df["year"].astype(str).str.extract(r"(\d{4})", expand=False), errors="coerce")
+        _save(bundle_dir, "cb_years", years.fillna(-1).astype(np.int32).to_numpy())
+    _save(bundle_dir, "cb_idf", tfidf.idf_)
+    with open(bundle_dir / "cb_vocabulary.json", "w") as f:
+        json.dump({term: int(col) for term, col in tfidf.vocabulary_.items()}, f)
+    titles = cb_model.get("titles") or TitleResolver.build(
+        df["title"].tolist(), df["year"].tolist() if "year" in df else None)
+    titles.save(bundle_dir / "cb_title_index.json")
+
+    return _update_manifest(bundle_dir, "cb", {
+        "n_movies": int(matrix.shape[0]),
+        "n_features": int(matrix.shape[1]),
+        "nnz": int(matrix.nnz),
+        "stop_words": tfidf.stop_words,
+    })
+
+
+def load_cb_model(bundle_dir=BUNDLE_DIR):
+    """
+    Same keys the serving code reads from cb_model.pkl ('tfidf_matrix',
+    'titles', 'df'); rows of the matrix and of df are positional.
+    """
+    info = read_manifest(bundle_dir)["cb"]
+    matrix = csr_matrix(
+        (_load(bundle_dir, "cb_data"), _load(bundle_dir, "cb_indices"), _load(bundle_dir, "cb_indptr")),
+        shape=(info["n_movies"], info["n_features"]),
+        copy=False,
+    )
+    titles = _load(bundle_dir, "cb_titles")
+    df = pd.DataFrame({"title": titles, "genre": _load(bundle_dir, "cb_genres")})
+    if (Path(bundle_dir) / "cb_years.npy").exists():
+        df["year"] = _load(bundle_dir, "cb_years")
+    resolver_path = Path(bundle_dir) / "cb_title_index.json"
+    resolver = TitleResolver.load(resolver_path) if resolver_path.exists() else TitleResolver.build(titles.tolist())
+    return {"tfidf_matrix": matrix, "titles": resolver, "df": df}
+
+
+def load_cb_vocabulary(bundle_dir=BUNDLE_DIR):
+    """Fitted TF-IDF state: (vocabulary term -> column, idf array, stop_words)."""
+    with open(Path(bundle_dir) / "cb_vocabulary.json") as f:
+        vocabulary = json.load(f)
+    stop_words = read_manifest(bundle_dir)["cb"].get("stop_words")
+    return vocabulary, np.asarray(_load(bundle_dir, "cb_idf")), stop_words
+
+
+# ---------------- Convert existing pickles ----------------
+def main():
+    print("Loading pickled models...")
+    with open(MODEL_DIR / "cf_svd_model.pkl", "rb") as f:
+        cf_model = pickle.load(f)
+    with open(MODEL_DIR / "cb_model.pkl", "rb") as f:
+        cb_model = pickle.load(f)
+    movie_map = joblib.load(MODEL_DIR / "movieid_to_title.joblib")
+
+    write_cf_bundle(cf_model, movie_map)
+    manifest = write_cb_bundle(cb_model)
+    print(f"Saved model bundle v{manifest['model_version']} to: {BUNDLE_DIR}")
+
+
+if __name__ == "__main__":
+    main()
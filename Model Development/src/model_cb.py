@@ -4,6 +4,8 @@ import pandas as pd
 import ast
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
+from src.topk import top_k
+from src.title_index import TitleResolver
 
 # 1. Load data          
 df = pd.read_csv("D:\cinesuggest\Model Development\data\movies.csv")
@@ -56,21 +58,17 @@ tfidf_matrix = tfidf.fit_transform(df['combined_features'])
 
 # print("TF-IDF matrix shape:", tfidf_matrix.shape)  # (num_movies, num_features)
 
-# 2. Build a reverse mapping of movie titles to DataFrame indices
-indices = pd.Series(df.index, index=df['title'].str.lower())
+# 2. Title -> matrix row resolver (normalised titles, duplicates told apart by year)
+titles = TitleResolver.build(df['title'].tolist(), df['year'].tolist())
 
 # 3. Recommendation function
 def recommend(title, num_recommendations=5):
-    title = title.lower().strip()
-    if title not in indices:
+    idx = titles.resolve(title)
+    if idx is None:
         print("Movie not found in the dataset.")
         return []
-    idx = indices[title]
     cosine_sim = cosine_similarity(tfidf_matrix[idx], tfidf_matrix)
-    sim_scores = list(enumerate(cosine_sim.flatten()))
-    sim_scores = sorted(sim_scores, key=lambda x: x[1], reverse=True)
-    sim_scores = sim_scores[1:num_recommendations+1]
-    movie_indices = [i[0] for i in sim_scores]
+    movie_indices = top_k(cosine_sim.flatten(), num_recommendations, exclude=[idx])
     return df['title'].iloc[movie_indices].tolist()
 
 # Example usage:
@@ -0,0 +1,126 @@
+# --- src/neighbours.py
+"""
+Precomputed top-N neighbour tables.
+
+At training time the similarity matrix is computed in row blocks and only the
+best top_n neighbours of every row are kept: an int32 index array and a
+float32 score array, both (n_rows, top_n), saved as plain .npy files. At
+serving time they are opened with np.load(mmap_mode="r"), so a lookup is one
+row slice with no similarity math and memory stays bounded by block_size * N
+during training instead of N * N.
+"""
+
+import numpy as np
+from pathlib import Path
+from sklearn.metrics.pairwise import cosine_similarity
+
+
+class NeighbourTable:
+    """indices[i, :] / scores[i, :] are the neighbours of row i, best first."""
+
+    def __init__(self, indices, scores):
+        self.indices = indices
+        self.scores = scores
+
+    @property
+    def width(self):
+        return self.indices.shape[1]
+
+    def lookup(self, row, n):
+        """Top-n neighbour rows and scores of row (n must not exceed width)."""
+        return np.asarray(self.indices[row, :n]), np.asarray(self.scores[row, :n])
+
+    def save(self, prefix):
+        """Write <prefix>_idx.npy and <prefix>_scores.npy."""
+        np.save(f"{prefix}_idx.npy", np.ascontiguousarray(self.indices))
+        np.save(f"{prefix}_scores.npy", np.ascontiguousarray(self.scores))
+
+    @classmethod
+    def load(cls, prefix, mmap_mode="r"):
+        return cls(
+            np.load(f"{prefix}_idx.npy", mmap_mode=mmap_mode),
+            np.load(f"{prefix}_scores.npy", mmap_mode=mmap_mode),
+        )
+
+    @classmethod
+    def exists(cls, prefix):
+        return Path(f"{prefix}_idx.npy").exists() and Path(f"{prefix}_scores.npy").exists()
+
+
+def block_top_n(sims, top_n, offset=0):
+    """
+    Best top_n columns of every row of a dense similarity block, best first.
+    Row r of the block is item offset + r and never lists itself.
+    """
+    rows = np.arange(sims.shape[0])
+    self_cols = offset + rows
+    inside = self_cols < sims.shape[1]
+    sims[rows[inside], self_cols[inside]] = -np.inf
+
+    part = np.argpartition(-sims, top_n - 1, axis=1)[:, :top_n]
+    part_scores = np.take_along_axis(sims, part, axis=1)
+    order = np.argsort(-part_scores, axis=1, kind="stable")
+    return (np.take_along_axis(part, order, axis=1).astype(np.int32),
+            np.take_along_axis(part_scores, order, axis=1).astype(np.float32))
+
+
+def build_neighbour_table(matrix, top_n=50, block_size=1024, similarity=cosine_similarity,
+                          scores_dtype=np.float32):
+    """
+    Top-N most similar rows for every row of matrix, computed block by block.
+    scores_dtype=np.float16 halves the score table when ranks matter more than exact values.
+    """
+    n_rows = matrix.shape[0]
+    top_n = min(top_n, n_rows - 1)
+    indices = np.empty((n_rows, top_n), dtype=np.int32)
+    scores = np.empty((n_rows, top_n), dtype=scores_dtype)
+
+    for start in range(0, n_rows, block_size):
+        stop = min(start + block_size, n_rows)
+        sims = np.asarray(similarity(matrix[start:stop], matrix), dtype=np.float32)
+        indices[start:stop], scores[start:stop] = block_top_n(sims, top_n, offset=start)
+
+    return NeighbourTable(indices, scores)
+
+
+def update_neighbour_table(table, matrix, row, similarity=cosine_similarity):
+    """
+    Neighbour table after row of matrix was appended (row == len(table)) or
+    replaced, without rebuilding it: the row gets its own top-N, rows that
+    listed the old version are recomputed, and every other row admits the new
+    row wherever it beats its current last neighbour.
+    Returns a new in-memory NeighbourTable; table itself is left untouched.
+    """
+    width = table.width
+    n_rows = matrix.shape[0]
+    indices = np.array(table.indices)
+    scores = np.array(table.scores)
+    if row >= len(indices):
+        indices = np.vstack([indices, np.zeros((1, width), dtype=np.int32)])
+        scores = np.vstack([scores, np.full((1, width), -np.inf, dtype=np.float32)])
+
+    sims = np.asarray(similarity(matrix[row], matrix), dtype=np.float32)
+    row_idx, row_scores = block_top_n(sims.copy(), width, offset=row)
+    indices[row], scores[row] = row_idx[0], row_scores[0]
+    sims = sims.ravel()
+
+    # Rows that listed the previous version of row: its score changed, recompute them
+    stale = np.flatnonzero((indices == row).any(axis=1))
+    stale = stale[stale != row]
+    if len(stale):
+        block = np.asarray(similarity(matrix[stale], matrix), dtype=np.float32)
+        block[np.arange(len(stale)), stale] = -np.inf
+        indices[stale], scores[stale] = block_top_n(block, width, offset=n_rows)
+
+    better = sims > scores[:, -1]
+    better[row] = False
+    better[stale] = False
+    rows = np.flatnonzero(better)
+    if len(rows):
+        cand_idx = np.hstack([indices[rows], np.full((len(rows), 1), row, dtype=np.int32)])
+        cand_scores = np.hstack([scores[rows], sims[rows, None]])
+        order = np.argsort(-cand_scores, axis=1, kind="stable")[:, :width]
+        indices[rows] = np.take_along_axis(cand_idx, order, axis=1)
+        scores[rows] = np.take_along_axis(cand_scores, order, axis=1)
+
+    return NeighbourTable(indices, scores)
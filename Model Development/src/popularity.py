@@ -0,0 +1,124 @@
+# --- src/popularity.py
+"""
+Precomputed popularity leaderboard for cold-start users.
+
+The cold-start branch of get_cf_recommendations_for_user used to group the
+full ratings set by movie on every call and then look each title up with a
+DataFrame scan. The leaderboard is built once at training time (train_cf.py)
+from per-movie rating sums and counts (np.bincount, no groupby), ranked by a
+Bayesian average that shrinks movies with few votes towards the global mean:
+
+    score = (count * mean + prior_votes * global_mean) / (count + prior_votes)
+
+Movies with fewer than min_votes ratings are dropped. Per-genre leaderboards
+are stored as row lists into the global one, so a cold-start request is an
+array slice. Saved as models/cf_popularity.npz.
+"""
+
+import numpy as np
+
+
+class PopularityTable:
+    """Rows are sorted by score, best first; genre_rows[g] lists the rows of genre g in the same order."""
+
+    def __init__(self, movie_ids, scores, means, counts, genre_rows=None):
+        self.movie_ids = np.asarray(movie_ids, dtype=np.int32)
+        self.scores = np.asarray(scores, dtype=np.float32)
+        self.means = np.asarray(means, dtype=np.float32)
+        self.counts = np.asarray(counts, dtype=np.int32)
+        self.genre_rows = genre_rows or {}
+
+    @classmethod
+    def build(cls, movie_ids, ratings, movies=None, min_votes=5, prior_votes=None):
+        """
+        movie_ids / ratings: one entry per rating.
+        movies: optional frame with movieId and a '|'-separated genres column.
+        prior_votes defaults to min_votes.
+        """
+        prior_votes = min_votes if prior_votes is None else prior_votes
+        ratings = np.asarray(ratings, dtype=np.float64)
+        uniq, codes = np.unique(np.asarray(movie_ids), return_inverse=True)
+        counts = np.bincount(codes, minlength=len(uniq))
+        sums = np.bincount(codes, weights=ratings, minlength=len(uniq))
+        global_mean = float(ratings.mean()) if len(ratings) else 0.0
+
+        keep = counts >= min_votes
+        uniq, counts, sums = uniq[keep], counts[keep], sums[keep]
+        means = sums / np.maximum(counts, 1)
+        scores = (sums + prior_votes * global_mean) / (counts + prior_votes)
+
+        order = np.lexsort((uniq, -scores))
+        table = cls(uniq[order], scores[order], means[order], counts[order])
+        if movies is not None and "genres" in movies:
+            table.genre_rows = _genre_rows(table.movie_ids, movies)
+        return table
+
+    def top(self, n, genre=None, exclude=None):
+        """
+        Rows of the n best movies (optionally within genre), skipping movieIds in exclude.
+        Returns an empty array for unknown genres.
+        """
+        rows = self.genre_rows.get(genre, np.empty(0, dtype=np.int32)) if genre else None
+        if exclude is not None and len(exclude):
+            ids = self.movie_ids if rows is None else self.movie_ids[rows]
+            mask = ~np.isin(ids, exclude)
+            rows = np.flatnonzero(mask)[:n] if rows is None else rows[mask][:n]
+            return rows.astype(np.int32)
+        if rows is None:
+            return np.arange(min(n, len(self.movie_ids)), dtype=np.int32)
+        return rows[:n]
+
+    @property
+    def genres(self):
+        return sorted(self.genre_rows)
+
+    def save(self, path):
+        genres = self.genres
+        np.savez(
+            path,
+            movie_ids=self.movie_ids,
+            scores=self.scores,
+            means=self.means,
+            counts=self.counts,
+            genres=np.array(genres, dtype=str),
+            genre_offsets=np.cumsum([0] + [len(self.genre_rows[g]) for g in genres]).astype(np.int64),
+            genre_rows=np.concatenate([self.genre_rows[g] for g in genres]).astype(np.int32)
+            if genres else np.empty(0, dtype=np.int32),
+        )
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        offsets = data["genre_offsets"]
+        genre_rows = {
+            str(g): data["genre_rows"][offsets[i]:offsets[i + 1]]
+            for i, g in enumerate(data["genres"].tolist())
+        }
+        return cls(data["movie_ids"], data["scores"], data["means"], data["counts"], genre_rows)
+
+
+def _genre_rows(ranked_ids, movies):
+    """genre -> leaderboard rows of its movies, in leaderboard order."""
+    genres = movies[["movieId", "genres"]].dropna()
+    genres = genres.assign(genre=genres["genres"].astype(str).str.split("|")).explode("genre")
+    genres = genres[~genres["genre"].isin(["", "(no genres listed)"])]
+    if len(ranked_ids) == 0 or len(genres) == 0:
+        return {}
+
+    ids = genres["movieId"].to_numpy()
+    sorter = np.argsort(ranked_ids)
+    pos = np.minimum(np.searchsorted(ranked_ids, ids, sorter=sorter), len(ranked_ids) - 1)
+    found = ranked_ids[sorter[pos]] == ids
+    rows = sorter[pos][found]
+
+    out = {}
+    for genre, group_rows in zip(*_group(genres["genre"].to_numpy()[found], rows)):
+        out[str(genre)] = np.sort(group_rows).astype(np.int32)
+    return out
+
+
+def _group(keys, values):
+    order = np.argsort(keys, kind="stable")
+    keys, values = keys[order], values[order]
+    uniq, starts = np.unique(keys, return_index=True)
+    return uniq, np.split(values, starts[1:])
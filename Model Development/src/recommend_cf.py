@@ -3,110 +3,113 @@ Collaborative Filtering (CF) Recommendation System
 
 This file contains:
 1. The main CF recommendation function (get_cf_recommendations_for_user) — unchanged prediction logic.
-2. A wrapper function (get_cf_recommendations_for_title) for hybrid systems that only provide movie titles.
+2. A wrapper function (get_cf_recommendations_for_title) for hybrid systems that only provide movie titles
+   (item-item similarity over the SVD item factors, see src.cf_similar).
 """
 
-import joblib
+import numpy as np
 import pandas as pd
 from pathlib import Path
+from src.cf_similar import similar_items
+from src.popularity import PopularityTable
+from src.registry import registry as default_registry
+from src.svd_scorer import SVDScorer
+from src.topk import top_k
 
 # Paths for data & models
 DATA_DIR = Path(__file__).resolve().parents[1] / "data"
 MODEL_DIR = Path(__file__).resolve().parents[1] / "models"
 
 # ------------------- CORE CF RECOMMENDER (UNCHANGED) -------------------
-def get_cf_recommendations_for_user(user_id, algo, ml_movies_df, ratings_df, top_n=10, min_votes=5):
+def get_cf_recommendations_for_user(user_id, algo, ml_movies_df, ratings_df, top_n=10, min_votes=5, history=None,
+                                    popularity=None):
     """
     Recommend movies for a given user using a trained collaborative filtering model.
 
     Parameters:
         user_id (int): The ID of the user to recommend for.
-        algo: The trained CF algorithm (e.g., Surprise SVD).
+        algo: The trained CF algorithm (Surprise SVD) or a prebuilt SVDScorer.
         ml_movies_df (DataFrame): Movie metadata with 'movieId' and 'title'.
         ratings_df (DataFrame): Ratings data with 'userId', 'movieId', 'rating'.
         top_n (int): Number of recommendations to return.
-        min_votes (int): Minimum number of ratings required for cold-start fallback.
+        min_votes (int): Minimum number of ratings for the cold-start leaderboard when it has to be rebuilt
+            (the precomputed one was built with train_cf.py's setting).
+        history (src.user_index.UserHistoryIndex): Optional prebuilt user -> seen-movies index;
+            avoids scanning ratings_df for the user's ratings.
+        popularity (src.popularity.PopularityTable): Cold-start leaderboard; defaults to the registry's
+            precomputed one (models/cf_popularity.npz) and is only rebuilt from ratings_df if that was never saved.
 
     Returns:
         DataFrame: Top-N recommended movies with their predicted ratings.
     """
     all_movie_ids = ml_movies_df['movieId'].unique()
+    titles = ml_movies_df.drop_duplicates('movieId').set_index('movieId')['title']
 
     # Movies the user already rated
-    rated_by_user = set(ratings_df[ratings_df['userId'] == user_id]['movieId'].tolist())
+    if history is not None:
+        rated_by_user = history.seen_items(user_id)
+    else:
+        rated_by_user = ratings_df.loc[ratings_df['userId'] == user_id, 'movieId'].to_numpy()
 
-    # Cold start: user has no ratings
+    # Cold start: user has no ratings -> slice of the popularity leaderboard
     if len(rated_by_user) == 0:
-        agg = ratings_df.groupby('movieId')['rating'].agg(['mean', 'count']).reset_index()
-        agg = agg[agg['count'] >= min_votes].sort_values(by='mean', ascending=False)
-        top = agg.head(top_n)
-        results = []
-        for _, row in top.iterrows():
-            mid = int(row['movieId'])
-            title_row = ml_movies_df[ml_movies_df['movieId'] == mid]
-            title = title_row['title'].values[0] if not title_row.empty else "Unknown"
-            results.append({
-                'movieId': mid,
-                'title': title,
-                'avg_rating': round(row['mean'], 3),
-                'num_votes': int(row['count'])
-            })
-        return pd.DataFrame(results)
-
-    # Predict ratings for movies the user hasn't seen
-    candidates = [mid for mid in all_movie_ids if mid not in rated_by_user]
-    preds = []
-    for mid in candidates:
-        prediction = algo.predict(user_id, mid)
-        preds.append((mid, prediction.est))
+        if popularity is None:
+            popularity = default_registry.cf_popularity
+        if popularity is None:
+            # Fallback: no leaderboard saved by train_cf.py
+            popularity = PopularityTable.build(ratings_df['movieId'].to_numpy(), ratings_df['rating'].to_numpy(),
+                                               min_votes=min_votes)
+        rows = popularity.top(top_n)
+        top_ids = popularity.movie_ids[rows]
+        return pd.DataFrame({
+            'movieId': top_ids.astype(int),
+            'title': titles.reindex(top_ids).fillna("Unknown").to_numpy(),
+            'avg_rating': popularity.means[rows].astype(float).round(3),
+            'num_votes': popularity.counts[rows].astype(int),
+        })
 
-    preds_sorted = sorted(preds, key=lambda x: x[1], reverse=True)[:top_n]
+    # Predict ratings for movies the user hasn't seen (one vectorised pass)
+    if isinstance(algo, SVDScorer):
+        scorer = algo if np.array_equal(algo.catalog_ids, all_movie_ids) else algo.with_catalog(all_movie_ids)
+    else:
+        scorer = SVDScorer.from_algo(algo, all_movie_ids)
+    scores = scorer.score_user(user_id)
+    seen_mask = np.isin(all_movie_ids, rated_by_user)
+    top_idx = top_k(scores, top_n, exclude=seen_mask)
 
-    recs = []
-    for mid, score in preds_sorted:
-        title_row = ml_movies_df[ml_movies_df['movieId'] == mid]
-        title = title_row['title'].values[0] if not title_row.empty else "Unknown"
-        recs.append({
-            'movieId': int(mid),
-            'title': title,
-            'pred_rating': round(score, 3)
-        })
-    return pd.DataFrame(recs)
+    top_ids = all_movie_ids[top_idx]
+    return pd.DataFrame({
+        'movieId': top_ids.astype(int),
+        'title': titles.reindex(top_ids).fillna("Unknown").to_numpy(),
+        'pred_rating': scores[top_idx].round(3),
+    })
 
 
 # ------------------- WRAPPER FOR HYBRID SYSTEM -------------------
-def get_cf_recommendations_for_title(movie_title, top_n=10):
+def get_cf_recommendations_for_title(movie_title, top_n=10, models=None):
     """
     Wrapper for hybrid filtering:
-    - Loads the trained CF model & data automatically.
-    - Finds a sample user who liked this movie (so we can get CF-style similar recommendations).
-    - Calls get_cf_recommendations_for_user() internally.
+    - Uses the resident models of the registry (no per-call loading).
+    - Resolves the title through the CF title index ("Toy Story" or "Toy Story (1995)"),
+      then through the CB titles and the CB <-> CF crosswalk.
+    - Returns the movies closest to it in SVD item-factor space (deterministic, cacheable).
     """
-    # Load trained model and datasets
-    algo = joblib.load(MODEL_DIR / "cf_svd_model.joblib")
-    ml_movies_df = pd.read_csv(DATA_DIR / "movie_cleaned.csv")
-    ratings_df = pd.read_csv(DATA_DIR / "ratings_cleaned.csv")
-
-    # Find the movieId for the given title
-    movie_row = ml_movies_df[ml_movies_df['title_clean'].str.lower() == movie_title.lower()]
-    if movie_row.empty:
+    models = models or default_registry
+    pos = models.cf_titles.resolve(movie_title)
+    if pos is None:
+        cb_row = models.cb_titles.resolve(movie_title)
+        if cb_row is not None:
+            pos = int(models.crosswalk.to_cf([cb_row])[0])
+            pos = pos if pos >= 0 else None
+    if pos is None:
         print(f"Movie '{movie_title}' not found in movie dataset.")
         return []
 
-    movie_id = int(movie_row.iloc[0]['movieId'])
-
-    # Find a user who rated this movie highly (≥ 4.0 stars)
-    high_rater = ratings_df[(ratings_df['movieId'] == movie_id) & (ratings_df['rating'] >= 4.0)]
-    if high_rater.empty:
-        print(f"No high-rating users found for '{movie_title}', using a random user.")
-        user_id = int(ratings_df.sample(1)['userId'].values[0])
-    else:
-        user_id = int(high_rater.sample(1)['userId'].values[0])
-
-    # Get CF recommendations for that user
-    recs_df = get_cf_recommendations_for_user(user_id, algo, ml_movies_df, ratings_df, top_n=top_n)
+    movie_id = models.cf_scorer.catalog_ids[pos].item()
+    positions, _ = similar_items(models, movie_id, top_n)
 
     # Return only movie titles for hybrid system
-    return recs_df['title'].tolist()
+    movie_map = models.movie_map
+    return [movie_map[mid] for mid in models.cf_scorer.catalog_ids[positions].tolist()]
 
-# print(get_cf_recommendations_for_title("Toy Story", top_n=5))
\ No newline at end of file
+# print(get_cf_recommendations_for_title("Toy Story", top_n=5))
@@ -0,0 +1,336 @@
+# --- src/registry.py
+"""
+Single owner of every serving artifact.
+
+fastapi_app and src.hybrid used to load the CB/CF models, the movie map and
+the ratings each on their own at import time, so every worker held two copies.
+The ModelRegistry loads each artifact once, lazily on first use (or all at
+once with warm_up()), and is passed to the CB, CF and hybrid code paths.
+Load timings and memory sizes are available through stats().
+
+The CB artifacts are only valid together (rows of the matrix, the dataframe,
+the title resolver, the neighbour table and the LSH index line up), so readers
+take them as one immutable CBSnapshot (registry.cb) once per request; publish()
+swaps the snapshot, so a request never mixes artifacts of two catalog versions.
+"""
+
+import logging
+import pickle
+import sys
+import threading
+import time
+from collections import namedtuple
+
+import joblib
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from scipy.sparse import issparse
+
+from src import model_bundle
+from src.ann_cb import LSHIndex
+from src.cb_incremental import TfidfTransform
+from src.cf_similar import item_embeddings
+from src.crosswalk import Crosswalk, load_movie_ids
+from src.fold_in import create_user_overlay
+from src.mips_cf import MIPSIndex
+from src.neighbours import NeighbourTable
+from src.popularity import PopularityTable
+from src.svd_scorer import SVDScorer
+from src.title_index import TitleResolver
+from src.user_index import UserHistoryIndex
+
+logger = logging.getLogger(__name__)
+
+CBSnapshot = namedtuple("CBSnapshot", ["model", "titles", "neighbours", "ann_index"])
+CB_ARTIFACTS = ("cb_model", "cb_titles", "cb_neighbours", "cb_ann_index")
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+MODEL_DIR = BASE_DIR / "models"
+DATA_DIR = BASE_DIR / "data"
+
+
+def _nbytes(obj):
+    """Approximate size in bytes of an artifact (memory-mapped arrays count their mapped size)."""
+    if obj is None:
+        return 0
+    if isinstance(obj, np.ndarray):
+        return int(obj.nbytes)
+    if issparse(obj):
+        return int(obj.data.nbytes + obj.indices.nbytes + obj.indptr.nbytes)
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(deep=True).sum())
+    if isinstance(obj, pd.Series):
+        return int(obj.memory_usage(deep=True))
+    if isinstance(obj, dict):
+        if any(isinstance(v, (np.ndarray, pd.DataFrame, pd.Series)) or issparse(v) for v in obj.values()):
+            return sum(_nbytes(v) for v in obj.values())
+        return sys.getsizeof(obj) + sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in obj.items())
+    if hasattr(obj, "__dict__"):
+        return sum(_nbytes(v) for v in vars(obj).values()
+                   if isinstance(v, (np.ndarray, dict)) or issparse(v))
+    return sys.getsizeof(obj)
+
+
+class ModelRegistry:
+    """
+    Lazily loaded serving artifacts:
+    cb_model, cb_titles, cb_vectorizer, cb_neighbours, cb_ann_index, movie_map, cf_titles, cf_scorer,
+    cf_item_embeddings, cf_item_neighbours, cf_mips_index, cf_popularity, user_history, crosswalk.
+    Prefers the memory-mapped bundle (models/bundle) and falls back to the pickles.
+    Loaded artifacts can be swapped at runtime with publish() (incremental updates).
+    """
+
+    ARTIFACTS = ("cb_model", "cb_titles", "cb_vectorizer", "cb_neighbours", "cb_ann_index", "movie_map",
+                 "cf_titles", "cf_scorer", "cf_item_embeddings", "cf_item_neighbours", "cf_mips_index",
+                 "cf_popularity", "user_history", "crosswalk")
+
+    def __init__(self, model_dir=MODEL_DIR, data_dir=DATA_DIR):
+        self.model_dir = Path(model_dir)
+        self.data_dir = Path(data_dir)
+        self.bundle_dir = self.model_dir / "bundle"
+        self._artifacts = {}
+        self._timings = {}
+        self._model_version = None
+        self._revision = 0
+        self._cb_snapshot = None
+        self._lock = threading.RLock()
+        # Users folded in from fresh ratings; shared by cf_scorer and user_history,
+        # scoped to the CF model they are solved against
+        self.user_overlay = create_user_overlay(model_bundle.cf_version(self.bundle_dir))
+
+    # ---------------- Loading ----------------
+    def _bundle_has(self, section):
+        return model_bundle.bundle_exists(self.bundle_dir) and \
+            section in model_bundle.read_manifest(self.bundle_dir)
+
+    def _get(self, name):
+        if name in self._artifacts:
+            return self._artifacts[name]
+        with self._lock:
+            if name not in self._artifacts:
+                start = time.perf_counter()
+                value = getattr(self, f"_load_{name}")()
+                self._timings[name] = time.perf_counter() - start
+                self._artifacts[name] = value
+        return self._artifacts[name]
+
+    def _load_cb_model(self):
+        if self._bundle_has("cb"):
+            return model_bundle.load_cb_model(self.bundle_dir)
+        with open(self.model_dir / "cb_model.pkl", "rb") as f:
+            return pickle.load(f)
+
+    def _load_cb_titles(self):
+        cb_model = self.cb_model
+        if cb_model.get("titles") is not None:
+            return cb_model["titles"]
+        # Pickles from before the resolver existed carry a pandas title index instead
+        df = cb_model["df"]
+        return TitleResolver.build(df["title"].tolist(), df["year"].tolist() if "year" in df else None)
+
+    def _load_cb_vectorizer(self):
+        if self._bundle_has("cb"):
+            return TfidfTransform(*model_bundle.load_cb_vocabulary(self.bundle_dir))
+        return TfidfTransform.from_vectorizer(self.cb_model["tfidf"])
+
+    def _load_cb_neighbours(self):
+        prefix = self.model_dir / "cb_neighbours"
+        return NeighbourTable.load(prefix) if NeighbourTable.exists(prefix) else None
+
+    def _load_cb_ann_index(self):
+        path = self.model_dir / "cb_ann_index.npz"
+        return LSHIndex.load(path) if path.exists() else None
+
+    def _load_movie_map(self):
+        if self._bundle_has("cf"):
+            return model_bundle.load_movie_map(self.bundle_dir)
+        return joblib.load(self.model_dir / "movieid_to_title.joblib")
+
+    def _load_cf_titles(self):
+        # Rows are positions in movie_map order, i.e. cf_scorer catalog positions
+        return TitleResolver.from_movielens(list(self.movie_map.values()))
+
+    def _load_cf_scorer(self):
+        if self._bundle_has("cf"):
+            scorer = model_bundle.load_cf_scorer(self.bundle_dir)
+        else:
+            with open(self.model_dir / "cf_svd_model.pkl", "rb") as f:
+                cf_model = pickle.load(f)
+            scorer = SVDScorer.from_algo(cf_model, list(self.movie_map.keys()))
+        scorer.overlay = self.user_overlay
+        return scorer
+
+    def _load_cf_item_embeddings(self):
+        return item_embeddings(self.cf_scorer)
+
+    def _load_cf_item_neighbours(self):
+        prefix = self.model_dir / "cf_item_neighbours"
+        if not NeighbourTable.exists(prefix):
+            return None
+        table = NeighbourTable.load(prefix)
+        return table if self._fits_cf_catalog(prefix, table.indices.shape[0]) else None
+
+    def _load_cf_mips_index(self):
+        path = self.model_dir / "cf_mips_index.npz"
+        if not path.exists():
+            return None
+        index = MIPSIndex.load(path)
+        return index if self._fits_cf_catalog(path, len(index.order)) else None
+
+    def _fits_cf_catalog(self, path, n_items):
+        """Catalog-position artifacts built for another CF model are ignored (callers fall back to exact scoring)."""
+        reason = model_bundle.stale_reason(path, n_items, len(self.cf_scorer.catalog_ids), self.bundle_dir)
+        if reason is not None:
+            logger.warning("Ignoring %s: %s; re-run train_cf.py to rebuild it", Path(path).name, reason)
+        return reason is None
+
+    def _load_cf_popularity(self):
+        path = self.model_dir / "cf_popularity.npz"
+        return PopularityTable.load(path) if path.exists() else None
+
+    def _load_user_history(self):
+        history = UserHistoryIndex.from_parquet(self.data_dir / "ratings_cleaned.parquet",
+                                                self.cf_scorer.catalog_ids)
+        history.overlay = self.user_overlay
+        return history
+
+    def _load_crosswalk(self):
+        # Built at preprocessing time (src.crosswalk); joined from the loaded models when
+        # missing or built for other CB rows than the loaded matrix
+        path = self.model_dir / "cb_cf_crosswalk.npz"
+        if path.exists():
+            cb_movie_ids = load_movie_ids(path, self.cb_model["df"]["title"].astype(str).tolist())
+            if cb_movie_ids is not None:
+                return Crosswalk.from_movie_ids(cb_movie_ids, self.cf_scorer.catalog_ids)
+            logger.warning("Ignoring %s: built for other CB rows than the loaded CB model; "
+                           "joining in memory (re-run python -m src.crosswalk after train_cb.py)", path.name)
+        return Crosswalk.from_models(self)
+
+    # ---------------- Public accessors ----------------
+    @property
+    def cb_model(self):
+        return self._get("cb_model")
+
+    @property
+    def cb_titles(self):
+        return self._get("cb_titles")
+
+    @property
+    def cb(self):
+        """The CB artifacts as one CBSnapshot; take it once per request and read only from it."""
+        snapshot = self._cb_snapshot
+        if snapshot is None:
+            with self._lock:
+                if self._cb_snapshot is None:
+                    self._cb_snapshot = CBSnapshot(self.cb_model, self.cb_titles, self.cb_neighbours,
+                                                   self.cb_ann_index)
+                snapshot = self._cb_snapshot
+        return snapshot
+
+    @property
+    def cb_vectorizer(self):
+        return self._get("cb_vectorizer")
+
+    @property
+    def cb_neighbours(self):
+        return self._get("cb_neighbours")
+
+    @property
+    def cb_ann_index(self):
+        return self._get("cb_ann_index")
+
+    @property
+    def movie_map(self):
+        return self._get("movie_map")
+
+    @property
+    def cf_scorer(self):
+        return self._get("cf_scorer")
+
+    @property
+    def cf_titles(self):
+        return self._get("cf_titles")
+
+    @property
+    def cf_item_embeddings(self):
+        return self._get("cf_item_embeddings")
+
+    @property
+    def cf_item_neighbours(self):
+        return self._get("cf_item_neighbours")
+
+    @property
+    def cf_mips_index(self):
+        return self._get("cf_mips_index")
+
+    @property
+    def cf_popularity(self):
+        return self._get("cf_popularity")
+
+    @property
+    def user_history(self):
+        return self._get("user_history")
+
+    @property
+    def crosswalk(self):
+        return self._get("crosswalk")
+
+    def publish(self, **artifacts):
+        """
+        Replace loaded artifacts (e.g. after an incremental catalog update).
+        Bumps the revision part of model_version, so cached results are not reused.
+        CB artifacts should be published together: the next registry.cb snapshot
+        is built from them, while requests holding the previous one finish on it.
+        """
+        unknown = set(artifacts) - set(self.ARTIFACTS)
+        if unknown:
+            raise KeyError(f"Unknown artifacts: {sorted(unknown)}")
+        with self._lock:
+            self._artifacts.update(artifacts)
+            if any(name in CB_ARTIFACTS for name in artifacts):
+                self._cb_snapshot = None
+            self._revision += 1
+
+    @property
+    def model_version(self):
+        """
+        Bundle model_version (or the CF pickle's mtime), read once per registry,
+        with a '+<n>' suffix after n runtime updates.
+        """
+        if self._model_version is None:
+            pkl = self.model_dir / "cf_svd_model.pkl"
+            if model_bundle.bundle_exists(self.bundle_dir):
+                self._model_version = model_bundle.read_manifest(self.bundle_dir).get("model_version", "unknown")
+            elif pkl.exists():
+                self._model_version = str(int(pkl.stat().st_mtime))
+            else:
+                self._model_version = "unknown"
+        if self._revision:
+            return f"{self._model_version}+{self._revision}"
+        return self._model_version
+
+    def warm_up(self):
+        """Load every artifact now instead of on the first request."""
+        for name in self.ARTIFACTS:
+            self._get(name)
+        return self.stats()
+
+    def stats(self):
+        """Per-artifact load time (ms) and approximate size (MB) for loaded artifacts."""
+        return {
+            "model_version": self.model_version,
+            "artifacts": {
+                name: {
+                    "loaded": name in self._artifacts,
+                    "load_ms": round(self._timings.get(name, 0.0) * 1000, 2),
+                    "size_mb": round(_nbytes(self._artifacts.get(name)) / 1e6, 2),
+                }
+                for name in self.ARTIFACTS
+            },
+            "user_overlay": self.user_overlay.stats(),
+        }
+
+
+# Shared default instance used by fastapi_app and src.hybrid
+registry = ModelRegistry()
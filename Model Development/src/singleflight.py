@@ -0,0 +1,53 @@
+# --- src/singleflight.py
+"""
+Single-flight request coalescing.
+
+When a title trends, many identical /recommend/cb requests arrive at once and
+each used to recompute the same similarities. SingleFlight lets the first
+request for a key (the leader) do the work while concurrent identical requests
+await the same computation instead of starting their own.
+Everything runs on the event loop, so the in-flight table needs no lock.
+"""
+
+import asyncio
+
+
+def _consume(future):
+    # Mark the exception as retrieved when no follower was waiting for it
+    if not future.cancelled():
+        future.exception()
+
+
+class SingleFlight:
+    def __init__(self):
+        self._inflight = {}
+        self.leaders = self.coalesced = 0
+
+    async def do(self, key, fn):
+        """
+        Await fn() once per key among concurrent callers and share its result.
+        The computation runs in its own task, owned by no caller: a caller that
+        is cancelled (e.g. its client disconnected), the leader included, stops
+        waiting without cancelling it for the others.
+        """
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+            self.leaders += 1
+        return await asyncio.shield(task)
+
+    def _finished(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        _consume(task)
+
+    def stats(self):
+        return {
+            "in_flight": len(self._inflight),
+            "computed": self.leaders,
+            "coalesced": self.coalesced,
+        }
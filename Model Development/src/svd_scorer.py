@@ -0,0 +1,156 @@
+# --- src/svd_scorer.py
+"""
+Vectorised scoring for a trained Surprise SVD model.
+
+Pulls pu, qi, bu, bi and the global mean out of the fitted model once, then
+scores a whole movie catalog for a user with a single matrix-vector product
+instead of one algo.predict() call per movie. Estimates follow the same rules
+as SVD.predict(): unknown users / items fall back to the bias terms (or the
+global mean) and results are clipped to the training rating scale.
+
+An optional overlay (src.fold_in.UserFactorOverlay) holds users whose factors
+were folded in from fresh ratings; it takes precedence over the trained pu / bu.
+"""
+
+import numpy as np
+
+
+class SVDScorer:
+    """
+    Catalog-aligned view of an SVD model.
+
+    catalog_ids: movieIds in the order scores are returned (e.g. movie_map keys).
+    """
+
+    def __init__(self, pu, qi, bu, bi, global_mean, rating_scale, user_index,
+                 item_index, catalog_ids, biased=True, qi_cat=None, bi_cat=None):
+        self.pu = np.asarray(pu, dtype=np.float64)
+        self.qi = np.asarray(qi, dtype=np.float64)
+        self.bu = np.asarray(bu, dtype=np.float64)
+        self.bi = np.asarray(bi, dtype=np.float64)
+        self.global_mean = float(global_mean)
+        self.rating_scale = (float(rating_scale[0]), float(rating_scale[1]))
+        self.biased = biased
+        self.user_index = user_index      # raw userId -> inner row of pu / bu
+        self.item_index = item_index      # raw movieId -> inner row of qi / bi
+        self.overlay = None               # folded-in users, consulted before pu / bu
+        self.set_catalog(catalog_ids, qi_cat, bi_cat)
+
+    @classmethod
+    def from_algo(cls, algo, catalog_ids=None):
+        """
+        Build a scorer from a fitted surprise.SVD.
+        If catalog_ids is None, every item seen in training is used.
+        """
+        trainset = algo.trainset
+        item_index = trainset._raw2inner_id_items
+        if catalog_ids is None:
+            catalog_ids = list(item_index.keys())
+        return cls(
+            pu=algo.pu,
+            qi=algo.qi,
+            bu=algo.bu,
+            bi=algo.bi,
+            global_mean=trainset.global_mean,
+            rating_scale=trainset.rating_scale,
+            user_index=trainset._raw2inner_id_users,
+            item_index=item_index,
+            catalog_ids=catalog_ids,
+            biased=algo.biased,
+        )
+
+    def set_catalog(self, catalog_ids, qi_cat=None, bi_cat=None):
+        """
+        Precompute catalog-aligned factor and bias arrays.
+        Items unknown to the model get zero factors and bias, which makes the
+        vectorised formula collapse to predict()'s fallback for them.
+        qi_cat / bi_cat may be passed in already aligned (e.g. memory-mapped
+        from a model bundle) to skip the copy.
+        """
+        self.catalog_ids = np.asarray(catalog_ids)
+        n = len(self.catalog_ids)
+        inner = np.array([self.item_index.get(mid, -1) for mid in catalog_ids], dtype=np.int64)
+        self.known_items = inner >= 0
+
+        if qi_cat is not None and bi_cat is not None:
+            self.qi_cat = np.asarray(qi_cat, dtype=np.float64)
+            self.bi_cat = np.asarray(bi_cat, dtype=np.float64)
+        else:
+            self.qi_cat = np.zeros((n, self.qi.shape[1]), dtype=np.float64)
+            self.bi_cat = np.zeros(n, dtype=np.float64)
+            self.qi_cat[self.known_items] = self.qi[inner[self.known_items]]
+            self.bi_cat[self.known_items] = self.bi[inner[self.known_items]]
+        self.catalog_pos = {mid: pos for pos, mid in enumerate(catalog_ids)}
+
+    def with_catalog(self, catalog_ids):
+        """Same model, different catalog (factors and overlay are shared, not copied)."""
+        scorer = SVDScorer(self.pu, self.qi, self.bu, self.bi, self.global_mean, self.rating_scale,
+                           self.user_index, self.item_index, catalog_ids, biased=self.biased)
+        scorer.overlay = self.overlay
+        return scorer
+
+    def user_factors(self, user_id):
+        """(pu, bu) for user_id, folded-in overlay first; None for unknown users."""
+        if self.overlay is not None:
+            entry = self.overlay.get(user_id)
+            if entry is not None:
+                return entry.pu, entry.bu
+        u = self.user_index.get(user_id)
+        if u is None:
+            return None
+        return self.pu[u], self.bu[u]
+
+    def knows_user(self, user_id):
+        return self.user_factors(user_id) is not None
+
+    def score_user(self, user_id):
+        """
+        Predicted rating of user_id for every catalog movie, aligned with catalog_ids.
+        Matches algo.predict(user_id, movie_id).est for each movie.
+        """
+        factors = self.user_factors(user_id)
+        n = len(self.catalog_ids)
+
+        if self.biased:
+            if factors is None:
+                est = self.global_mean + self.bi_cat
+            else:
+                pu, bu = factors
+                est = (self.global_mean + bu) + self.bi_cat
+                est += self.qi_cat @ pu
+        else:
+            est = np.full(n, self.global_mean)
+            if factors is not None:
+                est[self.known_items] = self.qi_cat[self.known_items] @ factors[0]
+
+        low, high = self.rating_scale
+        return np.clip(est, low, high, out=est)
+
+    def score_users(self, user_ids):
+        """
+        Predicted ratings for several users at once, shape (len(user_ids), n_catalog).
+        One matrix-matrix product; row r equals score_user(user_ids[r]).
+        """
+        factors = [self.user_factors(u) for u in user_ids]
+        known = np.array([f is not None for f in factors], dtype=bool)
+        found = [f for f in factors if f is not None]
+        pu = np.array([f[0] for f in found], dtype=np.float64).reshape(len(found), self.qi_cat.shape[1])
+        bu = np.array([f[1] for f in found], dtype=np.float64)
+        n = len(self.catalog_ids)
+
+        if self.biased:
+            est = np.empty((len(factors), n), dtype=np.float64)
+            est[~known] = self.global_mean + self.bi_cat
+            known_est = (self.global_mean + bu)[:, None] + self.bi_cat[None, :]
+            known_est += pu @ self.qi_cat.T
+            est[known] = known_est
+        else:
+            est = np.full((len(factors), n), self.global_mean)
+            if len(found):
+                dots = pu @ self.qi_cat[self.known_items].T
+                block = est[known]
+                block[:, self.known_items] = dots
+                est[known] = block
+
+        low, high = self.rating_scale
+        return np.clip(est, low, high, out=est)
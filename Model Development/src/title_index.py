@@ -0,0 +1,105 @@
+# --- src/title_index.py
+"""
+Title -> row resolver for the content-based model.
+
+cb_model.pkl used to carry a pd.Series keyed by lowercase title: every lookup
+went through pandas indexing, a duplicated title returned a Series instead of
+a row, and its values were DataFrame labels rather than matrix rows. The
+TitleResolver is built at training time and is two plain dicts:
+
+    normalize_title(title)          -> row of its first occurrence
+    (normalize_title(title), year)  -> row, for titles shared by several movies
+
+Queries may carry the year the MovieLens way ("Heat (1995)"), which selects
+the matching duplicate. Lookups are O(1) with no pandas on the request path.
+Saved as JSON (cb_title_index.json) next to the other CB artifacts; the CF
+catalog builds one from the movie map (from_movielens).
+"""
+
+import json
+import re
+from pathlib import Path
+
+from src.preprocess_cf import normalize_title, reorder_article, split_title_year
+
+
+def title_key(title):
+    """normalize_title, falling back to the lowercased title when nothing ASCII is left."""
+    return normalize_title(title) or str(title).lower().strip()
+
+
+def parse_year(value):
+    """First 4-digit number in value (1995, 1995.0, "1995", "(1995)"), else None."""
+    match = re.search(r"\d{4}", str(value)) if value is not None else None
+    return int(match.group()) if match else None
+
+
+class TitleResolver:
+    def __init__(self, rows=None, by_year=None):
+        self.rows = rows or {}          # title key -> row
+        self.by_year = by_year or {}    # (title key, year) -> row
+
+    @classmethod
+    def build(cls, titles, years=None):
+        """titles[i] / years[i] belong to row i (years may be None or contain blanks)."""
+        resolver = cls()
+        years = years if years is not None else [None] * len(titles)
+        for row, (title, year) in enumerate(zip(titles, years)):
+            resolver.add(title, year, row)
+        return resolver
+
+    @classmethod
+    def from_movielens(cls, titles):
+        """MovieLens titles ("Godfather, The (1972)"): index the cleaned title, keyed by year."""
+        names, years = [], []
+        for title in titles:
+            name, year = split_title_year(title)
+            names.append(reorder_article(name))
+            years.append(year)
+        return cls.build(names, years)
+
+    def add(self, title, year, row):
+        """Register row; an existing title keeps its first row unless year disambiguates."""
+        key = title_key(title)
+        self.rows.setdefault(key, row)
+        year = parse_year(year)
+        if year is not None:
+            self.by_year.setdefault((key, year), row)
+
+    def with_title(self, title, year, row):
+        """Copy of the resolver with row registered (published resolvers are never changed in place)."""
+        resolver = TitleResolver(dict(self.rows), dict(self.by_year))
+        resolver.add(title, year, row)
+        return resolver
+
+    def resolve(self, title, year=None):
+        """Row of title, or None. A "(yyyy)" suffix in title acts as year."""
+        key = title_key(title)
+        if year is None:
+            name, year = split_title_year(title)
+            if year is not None and key not in self.rows:
+                key = title_key(name)
+        if year is not None:
+            row = self.by_year.get((key, parse_year(year)))
+            if row is not None:
+                return row
+        return self.rows.get(key)
+
+    def __contains__(self, title):
+        return self.resolve(title) is not None
+
+    def __len__(self):
+        return len(self.rows)
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump({
+                "rows": self.rows,
+                "by_year": [[key, year, row] for (key, year), row in self.by_year.items()],
+            }, f)
+
+    @classmethod
+    def load(cls, path):
+        with open(Path(path)) as f:
+            data = json.load(f)
+        return cls(data["rows"], {(key, year): row for key, year, row in data["by_year"]})
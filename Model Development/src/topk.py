@@ -0,0 +1,75 @@
+# --- src/topk.py
+"""
+Shared top-K selection for all recommenders.
+
+Selects the best k entries of a score array with np.argpartition (O(N)) and
+only sorts those k, instead of sorting list(enumerate(scores)) over the whole
+catalog in Python.
+"""
+
+import numpy as np
+
+
+def top_k(scores, k, exclude=None):
+    """
+    Return the positions of the k highest scores, best first.
+
+    scores: 1-D array-like of scores.
+    k: number of positions to return (capped at the number of eligible items).
+    exclude: optional boolean mask (same length as scores) or array of positions
+             that must never be returned (e.g. the seed movie, already-seen movies).
+    """
+    scores = np.asarray(scores, dtype=np.float64).ravel()
+    n = scores.shape[0]
+
+    if exclude is not None:
+        exclude = np.asarray(exclude)
+        if exclude.dtype != bool:
+            mask = np.zeros(n, dtype=bool)
+            mask[exclude.astype(np.int64, copy=False)] = True
+            exclude = mask
+        scores = np.where(exclude, -np.inf, scores)
+        n_valid = n - int(np.count_nonzero(exclude))
+    else:
+        n_valid = n
+
+    k = min(int(k), n_valid)
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+
+    if k < n:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(n)
+
+    # Small sort of the k winners; ties keep catalog order like a stable sort would
+    order = np.lexsort((candidates, -scores[candidates]))
+    return candidates[order]
+
+
+def top_k_rows(scores, k, exclude=None):
+    """
+    Row-wise top_k for a 2-D score matrix (one row per user / seed movie).
+    exclude: optional boolean mask with the same shape as scores.
+    Returns a list of position arrays, one per row, best first; ties keep
+    catalog order exactly like top_k.
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    if exclude is not None:
+        scores = np.where(exclude, -np.inf, scores)
+    n_rows, n = scores.shape
+    k = min(int(k), n)
+    if k <= 0 or n_rows == 0:
+        return [np.empty(0, dtype=np.int64) for _ in range(n_rows)]
+
+    if k < n:
+        part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        part = np.tile(np.arange(n), (n_rows, 1))
+    part = np.sort(part, axis=1)   # catalog order first, so the stable sort breaks ties by position
+    part_scores = np.take_along_axis(scores, part, axis=1)
+    order = np.argsort(-part_scores, axis=1, kind="stable")
+    part = np.take_along_axis(part, order, axis=1)
+    part_scores = np.take_along_axis(part_scores, order, axis=1)
+
+    return [row[valid] for row, valid in zip(part, part_scores > -np.inf)]
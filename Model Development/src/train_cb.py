@@ -1,18 +1,20 @@
 import pandas as pd
 import ast
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 import pickle
-
-# 1. Load data          
-df = pd.read_csv("D:\cinesuggest\Model Development\data\movies.csv")
-
-# 2. Handle missing values
-df = df.dropna(subset=['title', 'genre', 'director', 'stars'])  # Drop rows missing key info
-df = df.fillna('')  # Fill other missing values with empty string
-
-# 3. Remove duplicate entries based on title and year
-df = df.drop_duplicates(subset=['title', 'year'])
+from pathlib import Path
+from src.ann_cb import LSHIndex, recall_at_k
+from src.neighbours import build_neighbour_table
+from src.model_bundle import write_cb_bundle
+from src.cb_incremental import REFIT_MARKER, load_cb_movies
+from src.title_index import TitleResolver
+from src.crosswalk import build_crosswalk
+
+# 1. Load data, 2. drop incomplete rows, 3. remove duplicates (title, year),
+#    then append movies added through the API since the last fit (latest version wins)
+df, n_additions = load_cb_movies("D:\cinesuggest\Model Development\data\movies.csv")
+if n_additions:
+    print(f"Including {n_additions} movies added through the API")
 
 # 4. Extract relevant features
 
@@ -55,11 +57,9 @@ tfidf_matrix = tfidf.fit_transform(df['combined_features'])
 
 # print("TF-IDF matrix shape:", tfidf_matrix.shape)  # (num_movies, num_features)
 
-# 2. Build a reverse mapping of movie titles to DataFrame indices
-indices = pd.Series(df.index, index=df['title'].str.lower())
-
-cosine_sim = cosine_similarity(tfidf_matrix, tfidf_matrix)
-titles = df['title'].tolist()
+# 2. Title -> matrix row resolver (normalised titles, duplicates told apart by year)
+df = df.reset_index(drop=True)
+titles = TitleResolver.build(df['title'].tolist(), df['year'].tolist())
 
 model_path = "D:\cinesuggest\Model Development\models\cb_model.pkl"
 # saving the model
@@ -67,8 +67,38 @@ with open(model_path, "wb") as f:
     pickle.dump({
         "tfidf": tfidf,
         "tfidf_matrix": tfidf_matrix,
-        "indices": indices,
+        "titles": titles,
         "df": df
     }, f)
 
-print("✅ Content-Based model trained & saved as cb_model.pkl")
\ No newline at end of file
+print("✅ Content-Based model trained & saved as cb_model.pkl")
+
+# Pickle-free, memory-mappable bundle used by the API
+write_cb_bundle({"tfidf": tfidf, "tfidf_matrix": tfidf_matrix, "titles": titles, "df": df})
+print("✅ Content-Based model bundle saved")
+
+# The full refit resets vocabulary drift, so any pending refit request is done
+REFIT_MARKER.unlink(missing_ok=True)
+
+# The refit may reorder CB rows, so the crosswalk to the CF catalog is rebuilt against them
+ml_movies_path = Path(model_path).parents[1] / "data" / "movie_cleaned.csv"
+if ml_movies_path.exists():
+    counts = build_crosswalk(cb_path="D:\cinesuggest\Model Development\data\movies.csv", ml_path=ml_movies_path)
+    print("✅ CB <-> CF crosswalk rebuilt:", counts)
+
+# Top-50 neighbours of every movie, computed in row blocks (no dense N x N matrix)
+neighbours_prefix = Path(model_path).with_name("cb_neighbours")
+neighbours = build_neighbour_table(tfidf_matrix, top_n=50, block_size=1024)
+neighbours.save(neighbours_prefix)
+print("✅ Neighbour table saved as cb_neighbours_idx.npy / cb_neighbours_scores.npy")
+
+# Approximate nearest-neighbour (LSH) index for the optional ANN mode
+ann_path = Path(model_path).with_name("cb_ann_index.npz")
+ann_index = LSHIndex.build(tfidf_matrix, n_tables=8, n_bits=12)
+ann_index.save(ann_path)
+print("✅ LSH index saved as", ann_path.name)
+
+report = recall_at_k(ann_index, tfidf_matrix, k=10)
+print(f"ANN recall@{report['k']}: {report['recall']:.3f} over {report['queries']} queries "
+      f"(avg {report['mean_candidates']:.0f} candidates, "
+      f"{report['ann_ms']:.2f} ms vs {report['exact_ms']:.2f} ms exact)")
\ No newline at end of file
@@ -1,44 +1,104 @@
 # ---src/train_cf.py
 """
-Train an SVD collaborative filtering model using Surprise.
+Train the SVD collaborative filtering model.
 Saves the trained model to models/cf_svd_model.joblib
+
+Two trainers share the same 80/20 split and metrics:
+  --trainer surprise  surprise.SVD, as before (default)
+  --trainer als       in-house biased ALS on int32/float32 arrays (src/mf_trainer.py)
+--compare fits both and prints RMSE / MAE, wall-clock time and peak traced memory.
+surprise stays the default until the ALS trainer matches its held-out RMSE.
 """
 
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
 import pandas as pd
-from surprise import Dataset, Reader, SVD
-from surprise.model_selection import train_test_split
-from surprise import accuracy
 import joblib
 from pathlib import Path
+from src.model_bundle import write_cf_bundle, write_stamp
+from src.ingest_ratings import read_ratings
+from src.mf_trainer import MatrixFactorization, evaluate
+from src.cf_similar import build_item_neighbours
+from src.mips_cf import MIPSIndex, mips_recall_at_k
+from src.popularity import PopularityTable
+from src.svd_scorer import SVDScorer
 
 DATA_DIR = Path(__file__).resolve().parents[1] / "data"
 MODEL_DIR = Path(__file__).resolve().parents[1] / "models"
 MODEL_DIR.mkdir(parents=True, exist_ok=True)
 
+
+def _measure(fn, *args):
+    """Run fn(*args); return its result, wall-clock seconds and peak traced memory in MB."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        result = fn(*args)
+    finally:
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return result, elapsed, peak / 2**20
+
+
+def train_als(train, test, rating_scale):
+    algo = MatrixFactorization(n_factors=50, n_epochs=15, random_state=42)
+    algo.fit(train['userId'].to_numpy(), train['movieId'].to_numpy(), train['rating'].to_numpy(),
+             rating_scale=rating_scale)
+    metrics = evaluate(algo, test['userId'].to_numpy(), test['movieId'].to_numpy(), test['rating'].to_numpy())
+    return algo, metrics
+
+
+def train_surprise(train, test, rating_scale):
+    from surprise import Dataset, Reader, SVD, accuracy
+
+    # Surprise expects a DataFrame with columns: userId, itemId, rating
+    reader = Reader(rating_scale=rating_scale)
+    trainset = Dataset.load_from_df(train[['userId', 'movieId', 'rating']], reader).build_full_trainset()
+    algo = SVD(n_factors=50, n_epochs=25, random_state=42)  # you can tune these
+    algo.fit(trainset)
+    predictions = algo.test(list(test[['userId', 'movieId', 'rating']].itertuples(index=False, name=None)))
+    metrics = {"rmse": accuracy.rmse(predictions, verbose=False), "mae": accuracy.mae(predictions, verbose=False)}
+    return algo, metrics
+
+
+TRAINERS = {"als": train_als, "surprise": train_surprise}
+
+
 def main():
-    ratings_path = DATA_DIR / "ratings_cleaned.csv"  # produced by preprocess_cf.py
+    parser = argparse.ArgumentParser(description="Train the CF model.")
+    parser.add_argument("--trainer", choices=sorted(TRAINERS), default="surprise")
+    parser.add_argument("--compare", action="store_true", help="also fit the other trainer and compare")
+    args = parser.parse_args()
+
+    ratings_path = DATA_DIR / "ratings_cleaned.parquet"  # produced by preprocess_cf.py
     ml_movies_path = DATA_DIR / "movie_cleaned.csv"
 
     print("Loading cleaned data...")
-    ratings = pd.read_csv(ratings_path, nrows=3000000)
+    # Full rating set, only the needed columns, via memory-mapped Arrow (no more 3M-row prefix)
+    ratings = read_ratings(ratings_path, columns=['userId', 'movieId', 'rating'])
     ml_movies = pd.read_csv(ml_movies_path)
 
-    # Surprise expects a DataFrame with columns: userId, itemId, rating
     # Use rating_scale based on your data (MovieLens commonly 0.5-5.0)
-    reader = Reader(rating_scale=(float(ratings['rating'].min()), float(ratings['rating'].max())))
-    data = Dataset.load_from_df(ratings[['userId', 'movieId', 'rating']], reader)
+    rating_scale = (float(ratings['rating'].min()), float(ratings['rating'].max()))
 
-    # Train-test split
-    trainset, testset = train_test_split(data, test_size=0.2, random_state=42)
-    print("Training SVD model...")
-    algo = SVD(n_factors=50, n_epochs=25, random_state=42)  # you can tune these
-    algo.fit(trainset)
+    # Train-test split (shared by both trainers so the numbers are comparable)
+    is_test = np.random.default_rng(42).random(len(ratings)) < 0.2
+    train, test = ratings[~is_test], ratings[is_test]
+    print(f"Train: {len(train):,} ratings, test: {len(test):,}")
 
-    print("Evaluating on test set...")
-    predictions = algo.test(testset)
-    rmse = accuracy.rmse(predictions, verbose=True)
-    mae = accuracy.mae(predictions, verbose=True)
-    print(f"RMSE: {rmse}, MAE: {mae}")
+    runs = [args.trainer] + ([t for t in TRAINERS if t != args.trainer] if args.compare else [])
+    results = {}
+    for name in runs:
+        print(f"Training with {name}...")
+        (model, metrics), seconds, peak_mb = _measure(TRAINERS[name], train, test, rating_scale)
+        results[name] = (model, metrics)
+        print(f"[{name}] RMSE: {metrics['rmse']:.4f}, MAE: {metrics['mae']:.4f}, "
+              f"time: {seconds:.1f}s, peak memory: {peak_mb:.0f} MB")
+    algo = results[args.trainer][0]
 
     # Save model to disk
     model_file = MODEL_DIR / "cf_svd_model.joblib"
@@ -58,6 +118,39 @@ def main():
     joblib.dump(movie_map, mapping_file)
     print("Saved movie mapping to:", mapping_file)
 
+    # Pickle-free, memory-mappable bundle used by the API
+    manifest = write_cf_bundle(algo, movie_map)
+    print("Saved CF model bundle, version:", manifest["model_version"])
+
+    # Cold-start leaderboard (Bayesian average over all ratings, overall and per genre)
+    popularity = PopularityTable.build(ratings['movieId'].to_numpy(), ratings['rating'].to_numpy(),
+                                       movies=ml_movies, min_votes=5)
+    popularity_file = MODEL_DIR / "cf_popularity.npz"
+    popularity.save(popularity_file)
+    print(f"Saved popularity leaderboard ({len(popularity.movie_ids)} movies, "
+          f"{len(popularity.genres)} genres) to:", popularity_file)
+
+    # MIPS index over the item factors for sub-linear top-N at serving time
+    scorer = SVDScorer.from_algo(algo, list(movie_map.keys()))
+    mips_index = MIPSIndex.build(scorer)
+    mips_file = MODEL_DIR / "cf_mips_index.npz"
+    mips_index.save(mips_file)
+    write_stamp(mips_file, len(scorer.catalog_ids))
+    print("Saved MIPS index to:", mips_file)
+
+    # Item-item neighbours over the normalised item factors ("people who liked X also liked")
+    item_neighbours = build_item_neighbours(scorer, top_n=50, block_size=1024)
+    item_neighbours.save(MODEL_DIR / "cf_item_neighbours")
+    write_stamp(MODEL_DIR / "cf_item_neighbours", len(scorer.catalog_ids))
+    print("Saved CF item neighbour table as cf_item_neighbours_idx.npy / cf_item_neighbours_scores.npy")
+
+    sample_users = ratings['userId'].drop_duplicates().sample(
+        n=min(200, ratings['userId'].nunique()), random_state=42
+    ).tolist()
+    report = mips_recall_at_k(mips_index, scorer, sample_users, k=10)
+    print(f"MIPS recall@{report['k']}: {report['recall']:.3f} over {report['users']} users "
+          f"({report['mips_ms']:.2f} ms vs {report['exact_ms']:.2f} ms brute force)")
+
 if __name__ == "__main__":
     main()
 
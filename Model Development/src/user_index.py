@@ -0,0 +1,97 @@
+# --- src/user_index.py
+"""
+CSR-style user -> seen-movies index.
+
+Built once from the ratings frame (or ratings_cleaned.parquet): ratings are
+sorted by userId, so each user's history is one contiguous slice of a movieId
+array, found through a sorted array of user ids plus offsets. Lookups cost
+O(log users + history length) instead of a full scan of the ratings column.
+Movies rated since the index was built come from an optional fold-in overlay.
+"""
+
+import numpy as np
+
+from src.ingest_ratings import read_ratings_arrays
+
+
+class UserHistoryIndex:
+    """
+    users:   sorted unique userIds
+    offsets: history of users[i] is movie_ids[offsets[i]:offsets[i + 1]]
+    movie_ids / positions: seen movieIds and their position in the catalog (-1 if absent)
+    """
+
+    def __init__(self, user_ids, movie_ids, catalog_ids=None):
+        user_ids = np.asarray(user_ids)
+        movie_ids = np.asarray(movie_ids)
+
+        order = np.argsort(user_ids, kind="stable")
+        sorted_users = user_ids[order]
+        self.users, starts = np.unique(sorted_users, return_index=True)
+        self.offsets = np.append(starts, len(sorted_users)).astype(np.int64)
+        self.movie_ids = movie_ids[order].astype(np.int32)
+        self.positions = None
+        self.overlay = None    # src.fold_in.UserFactorOverlay with fresh ratings
+        if catalog_ids is not None:
+            self.set_catalog(catalog_ids)
+
+    @classmethod
+    def from_ratings(cls, ratings, catalog_ids=None):
+        return cls(ratings["userId"].to_numpy(), ratings["movieId"].to_numpy(), catalog_ids)
+
+    @classmethod
+    def from_parquet(cls, path, catalog_ids=None):
+        cols = read_ratings_arrays(path, columns=("userId", "movieId"))
+        return cls(cols["userId"], cols["movieId"], catalog_ids)
+
+    def set_catalog(self, catalog_ids):
+        """Map every seen movieId to its position in catalog_ids (vectorised)."""
+        catalog = np.asarray(catalog_ids)
+        self.n_catalog = len(catalog)
+        if self.n_catalog == 0:
+            self.positions = np.full(len(self.movie_ids), -1, dtype=np.int32)
+            return
+        sorter = np.argsort(catalog, kind="stable")
+        pos = np.searchsorted(catalog, self.movie_ids, sorter=sorter)
+        pos = np.minimum(pos, self.n_catalog - 1)
+        found = catalog[sorter[pos]] == self.movie_ids
+        self.positions = np.where(found, sorter[pos], -1).astype(np.int32)
+
+    def _slice(self, user_id):
+        i = np.searchsorted(self.users, user_id)
+        if i < len(self.users) and self.users[i] == user_id:
+            return slice(self.offsets[i], self.offsets[i + 1])
+        return slice(0, 0)
+
+    def has_history(self, user_id):
+        sl = self._slice(user_id)
+        if sl.stop > sl.start:
+            return True
+        entry = self.overlay.get(user_id) if self.overlay is not None else None
+        return entry is not None and len(entry.seen_positions) > 0
+
+    def seen_items(self, user_id):
+        """movieIds rated by user_id (empty array for unknown users)."""
+        return self.movie_ids[self._slice(user_id)]
+
+    def seen_set(self, user_id):
+        return set(self.seen_items(user_id).tolist())
+
+    def seen_positions(self, user_id):
+        """Catalog positions of the movies rated by user_id."""
+        pos = self.positions[self._slice(user_id)]
+        pos = pos[pos >= 0]
+        entry = self.overlay.get(user_id) if self.overlay is not None else None
+        if entry is not None:
+            pos = np.union1d(pos, entry.seen_positions)
+        return pos
+
+    def seen_mask(self, user_id):
+        """Boolean mask over the catalog, True for movies user_id already rated."""
+        mask = np.zeros(self.n_catalog, dtype=bool)
+        mask[self.seen_positions(user_id)] = True
+        return mask
+
+    @property
+    def n_users(self):
+        return len(self.users)
@@ -0,0 +1,58 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("sklearn")
+
+from scipy.sparse import csr_matrix
+from sklearn.metrics.pairwise import cosine_similarity
+
+from src.ann_cb import LSHIndex, recall_at_k
+
+
+@pytest.fixture(scope="module")
+def matrix():
+    # 600 "movies" over 400 terms, each built from one of 20 topics' vocabularies plus noise
+    rng = np.random.default_rng(0)
+    topics = [rng.choice(400, size=15, replace=False) for _ in range(20)]
+    dense = np.zeros((600, 400))
+    for row in range(600):
+        dense[row, rng.choice(topics[rng.integers(20)], size=8, replace=False)] = rng.uniform(0.5, 1.0, 8)
+        dense[row, rng.integers(0, 400, 3)] = rng.uniform(0.1, 0.3, 3)
+    return csr_matrix(dense)
+
+
+def test_recall_floor(matrix):
+    index = LSHIndex.build(matrix, n_tables=16, n_bits=6)
+    stats = recall_at_k(index, matrix, k=10, n_queries=100)
+    assert stats["recall"] >= 0.8
+    assert stats["mean_candidates"] < matrix.shape[0] / 2     # and it actually prunes
+
+def test_query_scores_are_exact_cosines(matrix):
+    index = LSHIndex.build(matrix, n_tables=8, n_bits=6)
+    top, scores = index.query(matrix, 5, 10, exclude=[5])
+    assert 5 not in top
+    assert np.all(np.diff(scores) <= 0)
+    np.testing.assert_allclose(scores, cosine_similarity(matrix[5], matrix[top]).ravel())
+
+def test_falls_back_to_exact_scan_when_buckets_are_small(matrix):
+    index = LSHIndex.build(matrix, n_tables=1, n_bits=16)
+    top, scores = index.query(matrix, 0, 50)
+    exact = np.sort(cosine_similarity(matrix[0], matrix).ravel())[::-1][:50]
+    np.testing.assert_allclose(scores, exact)
+
+def test_with_row_matches_a_rebuild(matrix):
+    index = LSHIndex.build(matrix[:-1], n_tables=4, n_bits=6)
+    appended = index.with_row(matrix[-1], matrix.shape[0] - 1)
+    np.testing.assert_array_equal(appended.codes, LSHIndex.build(matrix, n_tables=4, n_bits=6).codes)
+
+    replaced = appended.with_row(matrix[0], 3)
+    assert index.codes.shape[1] == matrix.shape[0] - 1        # the original is left untouched
+    np.testing.assert_array_equal(replaced.codes[:, 3], replaced.codes[:, 0])
+    assert set(replaced.candidates(0)) >= {0, 3}
+
+def test_save_load_roundtrip(matrix, tmp_path):
+    index = LSHIndex.build(matrix, n_tables=4, n_bits=6)
+    index.save(tmp_path / "cb_ann_index.npz")
+    loaded = LSHIndex.load(tmp_path / "cb_ann_index.npz")
+    np.testing.assert_array_equal(loaded.codes, index.codes)
+    np.testing.assert_array_equal(loaded.query(matrix, 7, 10)[0], index.query(matrix, 7, 10)[0])
@@ -0,0 +1,85 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+pytest.importorskip("pyarrow")
+
+from src import bulk_recommend_cf
+from src.registry import ModelRegistry
+from src.svd_scorer import SVDScorer
+from src.user_index import UserHistoryIndex
+
+N_USERS, N_ITEMS = 10, 30
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    rng = np.random.default_rng(0)
+    catalog = np.arange(1, N_ITEMS + 1)
+    user_ids = np.arange(100, 100 + N_USERS)
+    scorer = SVDScorer(pu=rng.normal(0, 0.3, size=(N_USERS, 4)), qi=rng.normal(0, 0.3, size=(N_ITEMS, 4)),
+                       bu=np.zeros(N_USERS), bi=rng.normal(0, 0.1, N_ITEMS), global_mean=3.0,
+                       rating_scale=(0.5, 5.0), user_index={u: i for i, u in enumerate(user_ids)},
+                       item_index={mid: i for i, mid in enumerate(catalog)}, catalog_ids=catalog)
+    # every user has rated movies 1-3, user 100 also movie 4
+    history = UserHistoryIndex(np.append(np.repeat(user_ids, 3), 100),
+                               np.append(np.tile([1, 2, 3], N_USERS), 4), catalog)
+    registry = ModelRegistry(model_dir=tmp_path, data_dir=tmp_path)
+    registry.publish(cf_scorer=scorer, user_history=history)
+    # the worker processes are forked and see the patched module attribute
+    monkeypatch.setattr(bulk_recommend_cf, "registry", registry)
+    return registry
+
+
+def _read(out_dir):
+    parts = sorted(out_dir.glob("part-*.parquet"))
+    return pd.concat([pd.read_parquet(p) for p in parts], ignore_index=True)
+
+
+def test_writes_top_n_unseen_movies_per_user(registry, tmp_path):
+    out_dir = tmp_path / "recs"
+    bulk_recommend_cf.run(top_n=5, chunk_size=4, workers=2, out_dir=out_dir)
+
+    assert len(list(out_dir.glob("part-*.parquet"))) == 3
+    recs = _read(out_dir)
+    assert len(recs) == N_USERS * 5
+    assert not recs["movieId"].isin([1, 2, 3]).any()
+    assert 4 not in recs.loc[recs["userId"] == 100, "movieId"].tolist()
+
+    user = recs[recs["userId"] == 105].sort_values("rank")
+    scores = registry.cf_scorer.score_user(105)
+    assert user["rank"].tolist() == [1, 2, 3, 4, 5]
+    np.testing.assert_allclose(user["score"], scores[user["movieId"] - 1], rtol=1e-6)
+    assert user["score"].is_monotonic_decreasing
+
+def test_resume_only_scores_missing_chunks(registry, tmp_path):
+    out_dir = tmp_path / "recs"
+    bulk_recommend_cf.run(top_n=5, chunk_size=4, workers=1, out_dir=out_dir)
+    expected = _read(out_dir)
+
+    # an interrupted run: part 1 was never written
+    bulk_recommend_cf._part_path(out_dir, 1).unlink()
+    kept = bulk_recommend_cf._part_path(out_dir, 0)
+    mtime = kept.stat().st_mtime_ns
+
+    bulk_recommend_cf.run(top_n=5, chunk_size=4, workers=1, out_dir=out_dir, resume=True)
+    assert kept.stat().st_mtime_ns == mtime
+    pd.testing.assert_frame_equal(_read(out_dir), expected)
+
+def test_resume_with_other_settings_is_refused(registry, tmp_path):
+    out_dir = tmp_path / "recs"
+    bulk_recommend_cf.run(top_n=5, chunk_size=4, workers=1, out_dir=out_dir)
+    with pytest.raises(ValueError):
+        bulk_recommend_cf.run(top_n=5, chunk_size=5, workers=1, out_dir=out_dir, resume=True)
+
+    # so is resuming after the model changed (model_version moved on)
+    registry.publish(cf_scorer=registry.cf_scorer)
+    with pytest.raises(ValueError):
+        bulk_recommend_cf.run(top_n=5, chunk_size=4, workers=1, out_dir=out_dir, resume=True)
+
+def test_fresh_run_clears_old_parts(registry, tmp_path):
+    out_dir = tmp_path / "recs"
+    bulk_recommend_cf.run(top_n=5, chunk_size=2, workers=1, out_dir=out_dir)
+    assert len(list(out_dir.glob("part-*.parquet"))) == 5
+    bulk_recommend_cf.run(top_n=5, chunk_size=4, workers=1, out_dir=out_dir)
+    assert len(list(out_dir.glob("part-*.parquet"))) == 3
@@ -0,0 +1,94 @@
+import pytest
+
+from src import cache
+from src.cache import LRUTTLCache, RedisCache, create_cache, make_key
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class _FakeRedis:
+    """The redis-py calls RedisCache makes, on a plain dict (expiry is not simulated)."""
+
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def setex(self, key, ttl, value):
+        self.values[key] = value
+
+    def scan_iter(self, pattern):
+        return [k for k in list(self.values) if k.startswith(pattern.rstrip("*"))]
+
+    def delete(self, key):
+        self.values.pop(key, None)
+
+
+def test_lru_evicts_least_recently_used():
+    c = LRUTTLCache(maxsize=2, ttl=60)
+    c.set("a", 1)
+    c.set("b", 2)
+    assert c.get("a") == 1          # "b" is now the least recently used
+    c.set("c", 3)
+    assert c.get("b") is None
+    assert (c.get("a"), c.get("c")) == (1, 3)
+    assert c.stats()["evictions"] == 1
+    assert c.stats()["size"] == 2
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(cache.time, "monotonic", clock)
+    c = LRUTTLCache(maxsize=10, ttl=5)
+    c.set("a", 1)
+    clock.now += 4
+    assert c.get("a") == 1
+    clock.now += 2
+    assert c.get("a", "gone") == "gone"
+    stats = c.stats()
+    assert (stats["hits"], stats["misses"], stats["expirations"], stats["size"]) == (1, 1, 1, 0)
+
+
+def test_set_refreshes_ttl(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(cache.time, "monotonic", clock)
+    c = LRUTTLCache(maxsize=10, ttl=5)
+    c.set("a", 1)
+    clock.now += 4
+    c.set("a", 2)
+    clock.now += 4
+    assert c.get("a") == 2
+
+
+def test_make_key_is_order_independent_and_versioned():
+    assert make_key("hybrid", 3, title="Heat", top_n=10) == make_key("hybrid", 3, top_n=10, title="Heat")
+    assert make_key("hybrid", 3, top_n=10) != make_key("hybrid", 4, top_n=10)
+    assert make_key("cb", "1+2", title="Heat") == "cb|1+2|title=Heat"
+
+
+def test_redis_cache_roundtrip_and_clear():
+    client = _FakeRedis()
+    client.values["other:key"] = "untouched"
+    c = RedisCache(client=client, ttl=60)
+    c.set("k", [{"title": "Heat", "score": 0.5}])
+    assert c.get("k") == [{"title": "Heat", "score": 0.5}]
+    assert c.get("missing") is None
+    assert (c.stats()["hits"], c.stats()["misses"]) == (1, 1)
+    c.clear()
+    assert c.get("k") is None
+    assert client.values == {"other:key": "untouched"}
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        create_cache("memcached")
+    with pytest.raises(ValueError):
+        cache.create_store("favourites", backend="memcached")
+    assert isinstance(create_cache("memory"), LRUTTLCache)
@@ -0,0 +1,71 @@
+from types import SimpleNamespace
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from src import candidates
+from src.candidates import LatencyTracker, cf_candidates
+from src.mips_cf import MIPSIndex
+from src.svd_scorer import SVDScorer
+from src.user_index import UserHistoryIndex
+
+
+class _CountingIndex:
+    def __init__(self, index):
+        self.index = index
+        self.searches = 0
+
+    def search(self, *args, **kwargs):
+        self.searches += 1
+        return self.index.search(*args, **kwargs)
+
+
+@pytest.fixture
+def models():
+    rng = np.random.default_rng(0)
+    qi = rng.normal(0, 0.3, size=(200, 4))   # small enough that no score clips (no ties)
+    catalog = np.arange(1, 201)
+    scorer = SVDScorer(pu=rng.normal(0, 0.5, size=(3, 4)), qi=qi, bu=np.zeros(3), bi=rng.normal(0, 0.1, 200),
+                       global_mean=3.5, rating_scale=(0.5, 5.0), user_index={1: 0, 2: 1, 3: 2},
+                       item_index={mid: i for i, mid in enumerate(catalog)}, catalog_ids=catalog)
+    history = UserHistoryIndex([1, 1], [5, 6], catalog)
+    return SimpleNamespace(cf_scorer=scorer, user_history=history,
+                           cf_mips_index=_CountingIndex(MIPSIndex.build(scorer)))
+
+
+@pytest.fixture
+def tracker(monkeypatch):
+    tracker = LatencyTracker(budget_ms=50)
+    monkeypatch.setattr(candidates, "cf_stage_latency", tracker)
+    return tracker
+
+
+def test_latency_tracker_budget():
+    tracker = LatencyTracker(budget_ms=10, window=100)
+    for ms in [1.0] * 98 + [50.0, 50.0]:
+        tracker.record(ms)
+    assert not tracker.within_budget()
+    summary = tracker.summary()
+    assert summary["count"] == 100 and summary["within_budget"] is False
+    assert LatencyTracker().within_budget()
+
+def test_exact_request_scans_the_catalog_within_budget(models, tracker):
+    positions, _ = cf_candidates(models, 1, 10, exact=True)
+    assert models.cf_mips_index.searches == 0
+    expected = np.argsort(-models.cf_scorer.score_user(1), kind="stable")
+    expected = [p for p in expected if p not in (4, 5)][:10]
+    assert positions.tolist() == expected
+    assert len(tracker.samples) == 1
+
+def test_exact_request_uses_the_index_over_budget(models, tracker, monkeypatch):
+    monkeypatch.setattr(tracker, "within_budget", lambda samples=None: False)
+    positions, _ = cf_candidates(models, 1, 10, exact=True)
+    assert models.cf_mips_index.searches == 1
+    assert not {4, 5} & set(positions.tolist())   # seen movies stay excluded
+
+def test_without_index_the_budget_is_monitor_only(models, tracker, monkeypatch):
+    models.cf_mips_index = None
+    monkeypatch.setattr(tracker, "within_budget", lambda samples=None: False)
+    positions, _ = cf_candidates(models, 2, 5, exact=True)
+    assert positions.tolist() == np.argsort(-models.cf_scorer.score_user(2), kind="stable")[:5].tolist()
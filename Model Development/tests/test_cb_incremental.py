@@ -0,0 +1,102 @@
+import json
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+pytest.importorskip("sklearn")
+
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from src.ann_cb import LSHIndex
+from src.cb_incremental import CBIndexUpdater, TfidfTransform, combine_features, load_cb_movies
+from src.neighbours import build_neighbour_table
+from src.registry import ModelRegistry
+from src.title_index import TitleResolver
+
+MOVIES = [
+    ("Heat", 1995, "Crime, Thriller", "Michael Mann"),
+    ("Toy Story", 1995, "Animation, Comedy", "John Lasseter"),
+    ("The Godfather", 1972, "Crime, Drama", "Francis Ford Coppola"),
+    ("Cars", 2006, "Animation, Comedy", "John Lasseter"),
+    ("Collateral", 2004, "Crime, Thriller", "Michael Mann"),
+]
+
+
+@pytest.fixture
+def registry(tmp_path):
+    df = pd.DataFrame(MOVIES, columns=["title", "year", "genre", "director"])
+    tfidf = TfidfVectorizer(stop_words="english")
+    matrix = tfidf.fit_transform([combine_features(t, g, d) for t, _, g, d in MOVIES])
+    registry = ModelRegistry(model_dir=tmp_path, data_dir=tmp_path)
+    registry.publish(
+        cb_model={"tfidf_matrix": matrix, "df": df},
+        cb_titles=TitleResolver.build(df["title"].tolist(), df["year"].tolist()),
+        cb_vectorizer=TfidfTransform.from_vectorizer(tfidf),
+        cb_neighbours=build_neighbour_table(matrix, top_n=2),
+        cb_ann_index=LSHIndex.build(matrix, n_tables=2, n_bits=4),
+    )
+    return registry
+
+
+@pytest.fixture
+def updater(registry, tmp_path):
+    return CBIndexUpdater(registry, max_added_fraction=1.0, additions_path=tmp_path / "additions.jsonl",
+                          refit_marker=tmp_path / "refit.json")
+
+
+def test_upsert_adds_a_row_and_publishes_a_new_snapshot(registry, updater):
+    before = registry.cb
+    version = registry.model_version
+    result = updater.upsert("Ford v Ferrari", "Drama, Action", "James Mangold", year=2019)
+    assert result["added"] and result["row"] == 5
+
+    cb = registry.cb
+    assert cb is not before and registry.model_version != version
+    assert cb.model["tfidf_matrix"].shape[0] == len(cb.model["df"]) == 6
+    assert cb.titles.resolve("Ford v Ferrari") == 5
+    assert cb.neighbours.indices.shape[0] == 6 and cb.ann_index.codes.shape[1] == 6
+    # requests holding the previous snapshot keep a consistent catalog
+    assert before.titles.resolve("Ford v Ferrari") is None
+    assert before.model["tfidf_matrix"].shape[0] == len(before.model["df"]) == 5
+
+def test_upsert_same_title_and_year_refreshes_the_row(registry, updater):
+    result = updater.upsert("Heat", "Crime, Drama", "Michael Mann", year=1995)
+    assert not result["added"] and result["row"] == 0
+    assert registry.cb.model["tfidf_matrix"].shape[0] == 5
+    assert registry.cb.model["df"]["genre"].iat[0] == "Crime, Drama"
+
+def test_upsert_same_title_other_year_adds_a_movie(registry, updater):
+    result = updater.upsert("Heat", "Drama", "Someone Else", year=2024)
+    assert result["added"] and result["row"] == 5
+    titles = registry.cb.titles
+    assert titles.resolve("Heat (1995)") == 0 and titles.resolve("Heat (2024)") == 5
+    assert registry.cb.model["df"]["genre"].iat[0] == "Crime, Thriller"
+
+def test_upsert_logs_the_addition_with_its_year(updater):
+    updater.upsert("Heat", "Drama", "Someone Else", year=2024)
+    with open(updater.additions_path) as f:
+        logged = [json.loads(line) for line in f]
+    assert logged == [{"title": "Heat", "year": 2024, "genre": "Drama", "director": "Someone Else"}]
+
+def test_catalog_growth_requests_a_refit(registry, tmp_path):
+    updater = CBIndexUpdater(registry, max_added_fraction=0.1, additions_path=tmp_path / "additions.jsonl",
+                             refit_marker=tmp_path / "refit.json")
+    assert updater.upsert("Ford v Ferrari", "Drama", year=2019)["refit_requested"]
+    assert (tmp_path / "refit.json").exists()
+
+def test_additions_replace_base_rows_of_the_same_movie_only(tmp_path):
+    base = tmp_path / "movies.csv"
+    pd.DataFrame({
+        "title": ["Heat", "Toy Story"], "year": ["1995", "1995"], "genre": ["Crime", "Animation"],
+        "director": ["['Michael Mann']", "['John Lasseter']"], "stars": ["[]", "[]"],
+    }).to_csv(base, index=False)
+    additions = tmp_path / "additions.jsonl"
+    with open(additions, "w") as f:
+        f.write(json.dumps({"title": "Heat", "year": 2024, "genre": "Drama", "director": ""}) + "\n")
+        f.write(json.dumps({"title": "Toy Story", "year": 1995, "genre": "Family", "director": ""}) + "\n")
+
+    df, n_additions = load_cb_movies(base, additions)
+    assert n_additions == 2
+    rows = sorted(zip(df["title"], df["year"].astype(str), df["genre"]))
+    assert rows == [("Heat", "1995", "Crime"), ("Heat", "2024", "Drama"), ("Toy Story", "1995", "Family")]
@@ -0,0 +1,49 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+pytest.importorskip("sklearn")
+
+from src.crosswalk import Crosswalk, load_movie_ids, match_movie_ids, save_movie_ids
+from src.preprocess_cf import clean_movies
+
+
+@pytest.fixture
+def ml_movies():
+    return clean_movies(pd.DataFrame({
+        "movieId": [10, 20, 30],
+        "title": ["Godfather, The (1972)", "Heat (1995)", "Toy Story (1995)"],
+    }))
+
+
+def test_match_stages(ml_movies):
+    cb_titles = ["The Godfather", "Heat", "Toy Storyy", "Unknown Film"]
+    cb_years = [1972, None, 1995, 2001]
+    movie_ids, counts = match_movie_ids(cb_titles, cb_years, ml_movies, fuzzy_cutoff=0.9)
+    assert movie_ids.tolist() == [10, 20, 30, -1]
+    assert counts == {"exact": 1, "title": 1, "fuzzy": 1}
+
+def test_movielens_movie_matched_once(ml_movies):
+    movie_ids, counts = match_movie_ids(["Heat", "Heat"], None, ml_movies)
+    assert movie_ids.tolist() == [20, -1]
+    assert counts["title"] == 1
+
+def test_fuzzy_match_is_blocked_by_year(ml_movies):
+    movie_ids, _ = match_movie_ids(["Toy Storyy"], [1999], ml_movies, fuzzy_cutoff=0.9)
+    assert movie_ids.tolist() == [-1]
+
+def test_from_movie_ids():
+    crosswalk = Crosswalk.from_movie_ids([30, -1, 10, 99], catalog_ids=[10, 20, 30])
+    assert crosswalk.cb_to_cf.tolist() == [2, -1, 0, -1]
+    assert crosswalk.cf_to_cb.tolist() == [2, -1, 0]
+    # rows added after the crosswalk was built are unmatched
+    assert crosswalk.to_cf([0, 4, -1]).tolist() == [2, -1, -1]
+    assert crosswalk.to_cb([0, 1]).tolist() == [2, -1]
+    assert crosswalk.stats() == {"cb_rows": 4, "cf_movies": 3, "matched": 2}
+
+def test_saved_crosswalk_rejected_for_other_cb_rows(tmp_path):
+    path = tmp_path / "crosswalk.npz"
+    save_movie_ids(path, [10, -1], ["The Godfather", "Heat"])
+    assert load_movie_ids(path, ["The Godfather", "Heat"]).tolist() == [10, -1]
+    assert load_movie_ids(path, ["Heat", "The Godfather"]) is None
+    assert load_movie_ids(path, ["The Godfather", "Heat", "Jaws"]) is None
@@ -0,0 +1,66 @@
+import asyncio
+import threading
+
+import pytest
+
+from src.executor import BoundedExecutor, ExecutorFull
+
+
+def test_rejects_when_workers_and_queue_are_full():
+    async def scenario():
+        executor = BoundedExecutor(max_workers=1, max_queue=1)
+        gate = threading.Event()
+        busy = [asyncio.ensure_future(executor.run(gate.wait)) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(ExecutorFull):
+            await executor.run(lambda: None)
+        gate.set()
+        await asyncio.gather(*busy)
+        executor.shutdown()
+        return executor.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["rejected"] == 1
+    assert stats["completed"] == 2
+    assert stats["in_flight"] == 0
+
+
+def test_slots_are_released_after_completion():
+    async def scenario():
+        executor = BoundedExecutor(max_workers=1, max_queue=0)
+        results = [await executor.run(lambda x: x * 2, i) for i in range(3)]
+        executor.shutdown()
+        return results, executor.stats()
+
+    results, stats = asyncio.run(scenario())
+    assert results == [0, 2, 4]
+    assert stats["rejected"] == 0
+    assert stats["in_flight"] == 0
+
+
+def test_exception_in_work_frees_its_slot():
+    def boom():
+        raise RuntimeError("scoring failed")
+
+    async def scenario():
+        executor = BoundedExecutor(max_workers=1, max_queue=0)
+        with pytest.raises(RuntimeError):
+            await executor.run(boom)
+        result = await executor.run(lambda: "ok")
+        executor.shutdown()
+        return result
+
+    assert asyncio.run(scenario()) == "ok"
+
+
+def test_failed_submit_frees_its_slot():
+    async def scenario():
+        executor = BoundedExecutor(max_workers=1, max_queue=0)
+        executor.shutdown()
+        with pytest.raises(RuntimeError):
+            await executor.run(lambda: None)
+        return executor.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["in_flight"] == 0
+    assert stats["rejected"] == 0
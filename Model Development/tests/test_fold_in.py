@@ -0,0 +1,137 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from src.fold_in import (RedisUserFactorOverlay, UserFactorOverlay, apply_user_ratings, fold_in_user,
+                          rescale_ratings)
+from src.svd_scorer import SVDScorer
+
+QI = np.array([[1.0, 0.0], [0.0, 1.0], [1.0, 1.0], [0.5, -1.0], [-1.0, 0.5]])
+BI = np.array([0.2, -0.1, 0.0, 0.3, -0.2])
+
+
+def make_scorer(biased=True):
+    # movieIds 10..14 are trained items; 99 is in the catalog but was never rated
+    item_index = {10 + i: i for i in range(len(QI))}
+    return SVDScorer(pu=np.zeros((1, 2)), qi=QI, bu=np.zeros(1), bi=BI, global_mean=3.0,
+                     rating_scale=(0.5, 5.0), user_index={1: 0}, item_index=item_index,
+                     catalog_ids=[10, 11, 12, 13, 14, 99], biased=biased)
+
+
+def test_fold_in_recovers_factors():
+    scorer = make_scorer()
+    pu, bu = np.array([0.4, -0.3]), 0.25
+    movie_ids = [10, 11, 12, 13, 14]
+    ratings = 3.0 + BI + bu + QI @ pu
+    got_pu, got_bu, pos = fold_in_user(scorer, movie_ids, ratings, reg=1e-9)
+    np.testing.assert_allclose(got_pu, pu, atol=1e-6)
+    assert got_bu == pytest.approx(bu, abs=1e-6)
+    assert pos.tolist() == [0, 1, 2, 3, 4]
+
+def test_fold_in_ignores_movies_outside_catalog():
+    _, _, pos = fold_in_user(make_scorer(), [10, 12345, 12], [4.0, 1.0, 3.5])
+    assert pos.tolist() == [0, 2]
+
+def test_folded_in_user_is_scored_and_seen():
+    scorer = make_scorer()
+    overlay = UserFactorOverlay()
+    scorer.overlay = overlay
+    before = scorer.score_user(2)
+    revision = apply_user_ratings(scorer, overlay, 2, [10, 12], [5.0, 4.5])
+    assert revision == 1
+    assert overlay.get(2).seen_positions.tolist() == [0, 2]
+    assert not np.allclose(scorer.score_user(2), before)
+
+def test_no_catalog_movie_drops_the_override():
+    scorer = make_scorer()
+    overlay = UserFactorOverlay()
+    apply_user_ratings(scorer, overlay, 2, [10], [4.0])
+    pu, _, _ = fold_in_user(scorer, [12345], [4.0])
+    assert pu is None
+    revision = apply_user_ratings(scorer, overlay, 2, [12345], [4.0])
+    assert overlay.get(2) is None
+    assert revision == overlay.revision(2) == 2
+
+def test_empty_ratings_drop_the_override():
+    scorer = make_scorer()
+    overlay = UserFactorOverlay()
+    apply_user_ratings(scorer, overlay, 2, [10], [4.0])
+    apply_user_ratings(scorer, overlay, 2, [], [])
+    assert overlay.get(2) is None and len(overlay) == 0
+
+def test_unbiased_model_with_only_untrained_movies():
+    scorer = make_scorer(biased=False)
+    pu, bu, pos = fold_in_user(scorer, [99], [4.0])
+    assert pu is None and bu == 0.0
+    assert pos.tolist() == [5]
+    overlay = UserFactorOverlay()
+    apply_user_ratings(scorer, overlay, 2, [99], [4.0])
+    assert overlay.get(2) is None
+
+def test_rescale_ratings():
+    np.testing.assert_allclose(rescale_ratings([0.5, 10.0, 5.25], (0.5, 10.0), (0.5, 5.0)), [0.5, 5.0, 2.75])
+
+def test_ten_point_ratings_are_folded_in_on_the_model_scale():
+    scorer = make_scorer()
+    overlay = UserFactorOverlay()
+    scorer.overlay = overlay
+    ratings = rescale_ratings([10.0, 9.0, 8.0, 2.0], (0.5, 10.0), scorer.rating_scale)
+    apply_user_ratings(scorer, overlay, 2, [10, 11, 12, 13], ratings)
+    scores = scorer.score_user(2)
+    # raw 10-point ratings push bu so high that every prediction clips to 5.0
+    assert scores.max() <= 5.0
+    assert len(np.unique(scores)) > 1
+
+def test_out_of_scale_ratings_are_clipped():
+    scorer = make_scorer()
+    clipped = fold_in_user(scorer, [10, 11, 12], [5.0, 5.0, 5.0])
+    raw = fold_in_user(scorer, [10, 11, 12], [10.0, 9.0, 8.0])
+    np.testing.assert_allclose(raw[0], clipped[0])
+    assert raw[1] == pytest.approx(clipped[1])
+
+
+class _FakeRedis:
+    """The few redis-py calls RedisUserFactorOverlay makes, on plain dicts."""
+
+    def __init__(self):
+        self.values, self.sets = {}, {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value):
+        self.values[key] = value
+
+    def incr(self, key):
+        self.values[key] = int(self.values.get(key, 0)) + 1
+        return self.values[key]
+
+    def delete(self, key):
+        return int(self.values.pop(key, None) is not None)
+
+    def sadd(self, key, member):
+        self.sets.setdefault(key, set()).add(member)
+
+    def srem(self, key, member):
+        self.sets.get(key, set()).discard(member)
+
+    def scard(self, key):
+        return len(self.sets.get(key, ()))
+
+
+def test_redis_overlay_roundtrip():
+    overlay = RedisUserFactorOverlay("v1", client=_FakeRedis())
+    assert overlay.set(2, np.array([0.5, -0.5]), 0.1, [0, 3]) == 1
+    entry = overlay.get(2)
+    np.testing.assert_allclose(entry.pu, [0.5, -0.5])
+    assert entry.seen_positions.tolist() == [0, 3] and entry.revision == 1
+    assert len(overlay) == 1
+    assert overlay.discard(2) == 2
+    assert overlay.get(2) is None and len(overlay) == 0
+
+def test_redis_overlay_ignores_entries_of_another_model():
+    client = _FakeRedis()
+    RedisUserFactorOverlay("v1", client=client).set(2, np.array([0.5, -0.5]), 0.1, [0, 3])
+    retrained = RedisUserFactorOverlay("v2", client=client)
+    assert retrained.get(2) is None
+    assert retrained.revision(2) == 0 and len(retrained) == 0
@@ -0,0 +1,39 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from src.fusion import fuse, minmax, unified_ids
+
+
+class _Crosswalk:
+    def __init__(self, cb_to_cf):
+        self.cb_to_cf = np.asarray(cb_to_cf)
+
+    def to_cf(self, cb_rows):
+        return self.cb_to_cf[np.asarray(cb_rows)]
+
+
+def test_minmax_keeps_weakest_candidate_above_zero():
+    np.testing.assert_allclose(minmax([1.0, 2.0, 3.0], floor=0.1), [0.1, 0.55, 1.0])
+
+def test_minmax_constant_and_empty():
+    np.testing.assert_allclose(minmax([4.0, 4.0], floor=0.1), [1.0, 1.0])
+    assert len(minmax([])) == 0
+
+def test_fuse_blends_over_the_union():
+    cb = ([3, 1], [10.0, 0.0])
+    cf = ([1, 2], [5.0, 5.0])
+    ids, scores, features = fuse([cb, cf], [1.0, 0.5])
+    assert ids.tolist() == [1, 2, 3]
+    # a source that did not propose an item scores 0 there
+    np.testing.assert_allclose(features, [[0.1, 1.0], [0.0, 1.0], [1.0, 0.0]])
+    np.testing.assert_allclose(scores, [0.6, 0.5, 1.0])
+
+def test_fuse_without_sources():
+    ids, scores, features = fuse([], [])
+    assert len(ids) == 0 and len(scores) == 0
+
+def test_unified_ids():
+    # CB rows 0 and 2 are matched to CF positions 5 and 1; row 1 has no CF counterpart
+    crosswalk = _Crosswalk([5, -1, 1])
+    assert unified_ids(crosswalk, 10, [0, 1, 2]).tolist() == [5, 11, 1]
@@ -0,0 +1,58 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from src import mf_trainer
+from src.mf_trainer import MatrixFactorization, _csr, _solve_rows, evaluate
+from src.svd_scorer import SVDScorer
+
+
+def _ratings(n_users=60, n_items=40, k=3, density=0.5, seed=0):
+    rng = np.random.default_rng(seed)
+    pu, qi = rng.normal(0, 0.6, (n_users, k)), rng.normal(0, 0.6, (n_items, k))
+    u, i = np.nonzero(rng.random((n_users, n_items)) < density)
+    r = np.clip(3.5 + np.einsum("ij,ij->i", pu[u], qi[i]), 0.5, 5.0)
+    return u + 100, i + 1000, r
+
+
+def test_batched_solve_matches_row_by_row(monkeypatch):
+    rng = np.random.default_rng(1)
+    n_rows, n_fixed, k = 30, 20, 4
+    rows = rng.integers(0, n_rows, 200)
+    rows[rows == 7] = 8      # row 7 has no ratings
+    cols = rng.integers(0, n_fixed, 200)
+    indptr, cols, target = _csr(rows, cols, rng.normal(size=200), n_rows)
+    design = np.hstack([rng.normal(size=(n_fixed, k)), np.ones((n_fixed, 1))])
+    fixed_b = rng.normal(size=n_fixed)
+
+    # Tiny blocks, so rows are split across several accumulation blocks
+    monkeypatch.setattr(mf_trainer, "SOLVE_BLOCK_BYTES", 8 * (k + 1) ** 2 * 7)
+    out_f, out_b = np.full((n_rows, k), np.nan), np.full(n_rows, np.nan)
+    _solve_rows(np.arange(n_rows), indptr, cols, target, design, fixed_b, 0.05, out_f, out_b)
+
+    for r in range(n_rows):
+        start, end = indptr[r], indptr[r + 1]
+        if start == end:
+            assert not out_f[r].any() and out_b[r] == 0.0
+            continue
+        x = design[cols[start:end]]
+        y = target[start:end] - fixed_b[cols[start:end]]
+        w = np.linalg.solve(x.T @ x + 0.05 * (end - start) * np.eye(k + 1), x.T @ y)
+        np.testing.assert_allclose(out_f[r], w[:k], atol=1e-8)
+        assert out_b[r] == pytest.approx(w[k], abs=1e-8)
+
+def test_fit_learns_low_rank_ratings():
+    u, i, r = _ratings()
+    model = MatrixFactorization(n_factors=3, n_epochs=10, reg=0.01, n_jobs=2, verbose=False)
+    model.fit(u, i, r, rating_scale=(0.5, 5.0))
+    # well below the spread of the ratings, i.e. far better than predicting the mean
+    assert evaluate(model, u, i, r)["rmse"] < 0.5 * r.std()
+
+def test_estimate_matches_the_scorer():
+    u, i, r = _ratings()
+    model = MatrixFactorization(n_factors=3, n_epochs=3, n_jobs=1, verbose=False).fit(u, i, r)
+    catalog = np.unique(i).tolist() + [99999]       # one movie the model never saw
+    scorer = SVDScorer.from_algo(model, catalog)
+    for user_id in [100, 130, 424242]:              # 424242 is unknown
+        expected = model.estimate(np.full(len(catalog), user_id), np.array(catalog))
+        np.testing.assert_allclose(scorer.score_user(user_id), expected, rtol=1e-5)
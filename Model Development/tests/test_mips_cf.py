@@ -0,0 +1,54 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from src.mips_cf import MIPSIndex, mips_recall_at_k
+from src.svd_scorer import SVDScorer
+
+
+@pytest.fixture(scope="module")
+def scorer():
+    rng = np.random.default_rng(0)
+    n_users, n_items, k = 50, 2000, 8
+    # items drawn around a few taste directions, as trained factors are
+    centres = rng.normal(0, 1, size=(16, k))
+    qi = 0.15 * (centres[rng.integers(0, 16, n_items)] + rng.normal(0, 0.4, size=(n_items, k)))
+    catalog = np.arange(1, n_items + 1)
+    return SVDScorer(pu=rng.normal(0, 0.5, size=(n_users, k)), qi=qi, bu=np.zeros(n_users),
+                     bi=rng.normal(0, 0.05, n_items), global_mean=3.0, rating_scale=(0.5, 5.0),
+                     user_index={u: u for u in range(n_users)},
+                     item_index={mid: i for i, mid in enumerate(catalog)}, catalog_ids=catalog)
+
+
+def test_recall_floor(scorer):
+    index = MIPSIndex.build(scorer, n_lists=32, n_probe=8)
+    stats = mips_recall_at_k(index, scorer, range(50), k=10)
+    assert stats["users"] == 50
+    assert stats["recall"] >= 0.9
+
+def test_probing_every_list_is_exact(scorer):
+    index = MIPSIndex.build(scorer, n_lists=32)
+    assert mips_recall_at_k(index, scorer, range(50), k=10, n_probe=32)["recall"] == 1.0
+
+def test_search_respects_exclusions(scorer):
+    index = MIPSIndex.build(scorer, n_lists=32, n_probe=32)
+    top, _ = index.search(scorer, 3, 10)
+    exclude = np.zeros(len(scorer.catalog_ids), dtype=bool)
+    exclude[top[:5]] = True
+    filtered, scores = index.search(scorer, 3, 10, exclude=exclude)
+    assert not exclude[filtered].any()
+    np.testing.assert_array_equal(filtered[:5], top[5:])
+    np.testing.assert_allclose(scores, scorer.score_user(3)[filtered])
+
+def test_unknown_user_falls_back_to_brute_force(scorer):
+    index = MIPSIndex.build(scorer, n_lists=32)
+    top, scores = index.search(scorer, 424242, 5)
+    np.testing.assert_allclose(scores, np.sort(scorer.score_user(424242))[::-1][:5])
+
+def test_save_load_roundtrip(scorer, tmp_path):
+    index = MIPSIndex.build(scorer, n_lists=32, n_probe=4)
+    index.save(tmp_path / "cf_mips_index.npz")
+    loaded = MIPSIndex.load(tmp_path / "cf_mips_index.npz")
+    assert loaded.n_probe == 4
+    for user_id in range(5):
+        np.testing.assert_array_equal(loaded.search(scorer, user_id, 10)[0], index.search(scorer, user_id, 10)[0])
@@ -0,0 +1,89 @@
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("pandas")
+pytest.importorskip("scipy")
+
+from src import model_bundle
+
+
+def test_stamp_path():
+    assert model_bundle.stamp_path("models/cf_mips_index.npz").name == "cf_mips_index_meta.json"
+    assert model_bundle.stamp_path("models/cf_item_neighbours").name == "cf_item_neighbours_meta.json"
+
+def test_size_mismatch_is_stale(tmp_path):
+    bundle_dir = tmp_path / "bundle"
+    assert model_bundle.stale_reason(tmp_path / "cf_mips_index.npz", 10, 12, bundle_dir) is not None
+    # unstamped artifacts are only checked for size
+    assert model_bundle.stale_reason(tmp_path / "cf_mips_index.npz", 12, 12, bundle_dir) is None
+
+def test_stamp_goes_stale_when_the_bundle_is_retrained(tmp_path):
+    bundle_dir = tmp_path / "bundle"
+    bundle_dir.mkdir()
+    artifact = tmp_path / "cf_mips_index.npz"
+    model_bundle._update_manifest(bundle_dir, "cf", {"version": "20240101000000"})
+    model_bundle.write_stamp(artifact, 12, bundle_dir)
+    assert model_bundle.stale_reason(artifact, 12, 12, bundle_dir) is None
+
+    model_bundle._update_manifest(bundle_dir, "cf", {"version": "20240202000000"})
+    assert "20240101000000" in model_bundle.stale_reason(artifact, 12, 12, bundle_dir)
+
+def test_stamp_goes_stale_when_the_pickle_is_retrained(tmp_path):
+    bundle_dir = tmp_path / "bundle"      # pickle-only mode: no bundle
+    pkl = tmp_path / "cf_svd_model.pkl"
+    pkl.write_bytes(b"model")
+    os.utime(pkl, ns=(1_000_000_000, 1_000_000_000))
+    artifact = tmp_path / "cf_item_neighbours"
+    model_bundle.write_stamp(artifact, 12, bundle_dir)
+    assert model_bundle.stale_reason(artifact, 12, 12, bundle_dir) is None
+
+    # same catalog size, new model
+    os.utime(pkl, ns=(2_000_000_000, 2_000_000_000))
+    assert model_bundle.stale_reason(artifact, 12, 12, bundle_dir) is not None
+
+def test_cf_bundle_roundtrip(tmp_path):
+    from src.mf_trainer import MatrixFactorization
+    from src.svd_scorer import SVDScorer
+
+    rng = np.random.default_rng(0)
+    u, i = np.nonzero(rng.random((30, 20)) < 0.5)
+    r = rng.uniform(0.5, 5.0, len(u))
+    model = MatrixFactorization(n_factors=3, n_epochs=2, n_jobs=1, verbose=False).fit(u + 1, i + 100, r)
+    movie_map = {movie_id: f"Movie {movie_id}" for movie_id in range(100, 125)}   # 5 never rated
+
+    model_bundle.write_cf_bundle(model, movie_map, tmp_path)
+    scorer = model_bundle.load_cf_scorer(tmp_path)
+    expected = SVDScorer.from_algo(model, list(movie_map))
+
+    assert model_bundle.load_movie_map(tmp_path) == movie_map
+    assert model_bundle.cf_version(tmp_path) == model_bundle.read_manifest(tmp_path)["cf"]["version"]
+    assert isinstance(scorer.pu, np.ndarray)
+    for user_id in [1, 17, 999]:          # 999 is unknown
+        np.testing.assert_allclose(scorer.score_user(user_id), expected.score_user(user_id))
+
+def test_cb_bundle_roundtrip(tmp_path):
+    pd = pytest.importorskip("pandas")
+    TfidfVectorizer = pytest.importorskip("sklearn.feature_extraction.text").TfidfVectorizer
+
+    df = pd.DataFrame({
+        "title": ["Heat", "Heat", "Alien"],
+        "genre": ["Crime", "Crime", "Sci-Fi"],
+        "year": ["1995", "1986", "1979"],
+        "text": ["crime heist mann", "crime thriller", "space horror scott"],
+    })
+    tfidf = TfidfVectorizer(stop_words="english")
+    matrix = tfidf.fit_transform(df["text"])
+    model_bundle.write_cb_bundle({"tfidf": tfidf, "tfidf_matrix": matrix, "df": df}, tmp_path)
+
+    cb = model_bundle.load_cb_model(tmp_path)
+    np.testing.assert_allclose(cb["tfidf_matrix"].toarray(), matrix.toarray())
+    assert cb["df"]["title"].tolist() == ["Heat", "Heat", "Alien"]
+    assert cb["df"]["year"].tolist() == [1995, 1986, 1979]
+    assert cb["titles"].resolve("Heat", 1986) == 1
+
+    vocabulary, idf, stop_words = model_bundle.load_cb_vocabulary(tmp_path)
+    assert vocabulary == {term: int(col) for term, col in tfidf.vocabulary_.items()}
+    np.testing.assert_allclose(idf, tfidf.idf_)
+    assert stop_words == "english"
@@ -0,0 +1,62 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("sklearn")
+
+from scipy.sparse import csr_matrix
+from sklearn.metrics.pairwise import cosine_similarity
+
+from src.neighbours import NeighbourTable, build_neighbour_table, update_neighbour_table
+
+
+def _brute_force(matrix, top_n):
+    sims = cosine_similarity(matrix)
+    np.fill_diagonal(sims, -np.inf)
+    indices = np.argsort(-sims, axis=1, kind="stable")[:, :top_n]
+    return indices, np.take_along_axis(sims, indices, axis=1)
+
+
+@pytest.fixture
+def matrix():
+    return np.random.default_rng(0).normal(size=(57, 6))
+
+
+def test_blocked_build_matches_brute_force(matrix):
+    table = build_neighbour_table(matrix, top_n=5, block_size=10)
+    indices, scores = _brute_force(matrix, 5)
+    np.testing.assert_array_equal(table.indices, indices)
+    np.testing.assert_allclose(table.scores, scores, rtol=1e-5)
+    assert not (table.indices == np.arange(len(matrix))[:, None]).any()    # never its own neighbour
+
+def test_top_n_is_capped_by_the_catalog(matrix):
+    table = build_neighbour_table(matrix[:4], top_n=10)
+    assert table.width == 3
+
+def test_lookup_and_save_load(matrix, tmp_path):
+    table = build_neighbour_table(matrix, top_n=5, scores_dtype=np.float16)
+    assert table.scores.dtype == np.float16
+    table.save(tmp_path / "cb_neighbours")
+    assert NeighbourTable.exists(tmp_path / "cb_neighbours")
+    loaded = NeighbourTable.load(tmp_path / "cb_neighbours")
+    rows, scores = loaded.lookup(3, 2)
+    np.testing.assert_array_equal(rows, table.indices[3, :2])
+    np.testing.assert_array_equal(scores, table.scores[3, :2])
+
+def test_update_after_append_matches_a_rebuild(matrix):
+    matrix = csr_matrix(matrix)         # rows of the TF-IDF matrix, as in cb_incremental
+    table = build_neighbour_table(matrix[:-1], top_n=5)
+    updated = update_neighbour_table(table, matrix, matrix.shape[0] - 1)
+    rebuilt = build_neighbour_table(matrix, top_n=5)
+    np.testing.assert_array_equal(updated.indices, rebuilt.indices)
+    np.testing.assert_allclose(updated.scores, rebuilt.scores, rtol=1e-5)
+    assert table.indices.shape[0] == matrix.shape[0] - 1        # the input table is left untouched
+
+def test_update_after_replace_matches_a_rebuild(matrix):
+    table = build_neighbour_table(matrix, top_n=5)
+    changed = matrix.copy()
+    changed[10] = matrix[20] + 0.01       # row 10 now sits next to row 20
+    updated = update_neighbour_table(table, csr_matrix(changed), 10)
+    rebuilt = build_neighbour_table(changed, top_n=5)
+    np.testing.assert_array_equal(updated.indices, rebuilt.indices)
+    np.testing.assert_allclose(updated.scores, rebuilt.scores, rtol=1e-5)
+    assert updated.indices[10, 0] == 20
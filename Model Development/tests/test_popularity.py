@@ -0,0 +1,54 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+
+from src.popularity import PopularityTable
+
+
+@pytest.fixture
+def table():
+    ratings = {
+        1: [5.0] * 10,            # many perfect votes
+        2: [5.0] * 5,             # as good, fewer votes: shrunk further towards the mean
+        3: [2.0] * 20,
+        4: [4.0] * 8,
+        5: [5.0] * 2,             # below min_votes
+    }
+    movie_ids = np.concatenate([[m] * len(r) for m, r in ratings.items()])
+    values = np.concatenate(list(ratings.values()))
+    movies = pd.DataFrame({
+        "movieId": [1, 2, 3, 4, 5],
+        "genres": ["Drama|Crime", "Comedy", "Drama", "Crime", "(no genres listed)"],
+    })
+    return PopularityTable.build(movie_ids, values, movies, min_votes=5)
+
+
+def test_ranked_by_bayesian_average(table):
+    assert table.movie_ids.tolist() == [1, 2, 4, 3]
+    global_mean = (50 + 25 + 40 + 32 + 10) / 45
+    assert table.scores[1] == pytest.approx((25 + 5 * global_mean) / 10)
+    assert table.counts.tolist() == [10, 5, 8, 20]
+    assert table.means.tolist() == [5.0, 5.0, 4.0, 2.0]
+
+def test_top_by_genre_and_exclusions(table):
+    assert table.genres == ["Comedy", "Crime", "Drama"]
+    assert table.movie_ids[table.top(2)].tolist() == [1, 2]
+    assert table.movie_ids[table.top(5, genre="Drama")].tolist() == [1, 3]
+    assert table.movie_ids[table.top(5, genre="Crime", exclude=[1])].tolist() == [4]
+    assert table.movie_ids[table.top(2, exclude=[1, 2])].tolist() == [4, 3]
+    assert len(table.top(5, genre="Western")) == 0
+
+def test_save_load_roundtrip(table, tmp_path):
+    table.save(tmp_path / "cf_popularity.npz")
+    loaded = PopularityTable.load(tmp_path / "cf_popularity.npz")
+    np.testing.assert_array_equal(loaded.movie_ids, table.movie_ids)
+    np.testing.assert_array_equal(loaded.scores, table.scores)
+    assert loaded.genres == table.genres
+    assert loaded.top(5, genre="Crime").tolist() == table.top(5, genre="Crime").tolist()
+
+def test_without_genres(tmp_path):
+    table = PopularityTable.build([1, 1, 2], [4.0, 5.0, 3.0], min_votes=1)
+    assert table.genres == []
+    table.save(tmp_path / "cf_popularity.npz")
+    assert PopularityTable.load(tmp_path / "cf_popularity.npz").movie_ids.tolist() == [1, 2]
@@ -0,0 +1,76 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("pandas")
+pytest.importorskip("sklearn")
+
+from src import model_bundle
+from src.mf_trainer import MatrixFactorization
+from src.mips_cf import MIPSIndex
+from src.registry import ModelRegistry
+
+
+@pytest.fixture
+def model_dir(tmp_path):
+    rng = np.random.default_rng(0)
+    u, i = np.nonzero(rng.random((20, 15)) < 0.5)
+    model = MatrixFactorization(n_factors=3, n_epochs=2, n_jobs=1, verbose=False)
+    model.fit(u + 1, i + 100, rng.uniform(0.5, 5.0, len(u)))
+    model_bundle.write_cf_bundle(model, {m: f"Movie {m}" for m in range(100, 115)}, tmp_path / "bundle")
+    return tmp_path
+
+
+def test_artifacts_load_lazily_and_once(model_dir):
+    registry = ModelRegistry(model_dir=model_dir, data_dir=model_dir)
+    assert not registry.stats()["artifacts"]["cf_scorer"]["loaded"]
+
+    scorer = registry.cf_scorer
+    assert registry.cf_scorer is scorer
+    assert scorer.overlay is registry.user_overlay
+    assert len(scorer.catalog_ids) == 15
+    assert registry.movie_map[100] == "Movie 100"
+    stats = registry.stats()
+    assert stats["artifacts"]["cf_scorer"]["loaded"]
+    assert stats["artifacts"]["cf_scorer"]["size_mb"] > 0
+    assert stats["model_version"] == model_bundle.read_manifest(model_dir / "bundle")["model_version"]
+
+def test_optional_artifacts_are_none_when_missing(model_dir):
+    registry = ModelRegistry(model_dir=model_dir, data_dir=model_dir)
+    assert registry.cf_mips_index is None
+    assert registry.cf_popularity is None
+    assert registry.cf_item_neighbours is None
+
+def test_index_built_for_another_model_is_ignored(model_dir):
+    registry = ModelRegistry(model_dir=model_dir, data_dir=model_dir)
+    path = model_dir / "cf_mips_index.npz"
+    MIPSIndex.build(registry.cf_scorer, n_lists=3).save(path)
+    model_bundle.write_stamp(path, 15, model_dir / "bundle")
+    assert ModelRegistry(model_dir=model_dir, data_dir=model_dir).cf_mips_index is not None
+
+    # the CF model is retrained, the index is not
+    model_bundle._update_manifest(model_dir / "bundle", "cf", dict(
+        model_bundle.read_manifest(model_dir / "bundle")["cf"], version="29990101000000"))
+    assert ModelRegistry(model_dir=model_dir, data_dir=model_dir).cf_mips_index is None
+
+def test_publish_bumps_the_version(model_dir):
+    registry = ModelRegistry(model_dir=model_dir, data_dir=model_dir)
+    base = registry.model_version
+    registry.publish(cf_popularity="leaderboard")
+    assert registry.cf_popularity == "leaderboard"
+    assert registry.model_version == f"{base}+1"
+    with pytest.raises(KeyError):
+        registry.publish(cf_model="typo")
+    assert registry.model_version == f"{base}+1"
+
+def test_cb_snapshot_is_swapped_by_publish(model_dir):
+    registry = ModelRegistry(model_dir=model_dir, data_dir=model_dir)
+    registry.publish(cb_model="model v1", cb_titles="titles v1", cb_neighbours=None, cb_ann_index=None)
+    held = registry.cb
+    assert registry.cb is held
+
+    registry.publish(cf_popularity=None)             # not a CB artifact: same snapshot
+    assert registry.cb is held
+
+    registry.publish(cb_model="model v2", cb_titles="titles v2")
+    assert (held.model, held.titles) == ("model v1", "titles v1")
+    assert (registry.cb.model, registry.cb.titles) == ("model v2", "titles v2")
@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+from src.singleflight import SingleFlight
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_concurrent_calls_share_one_computation():
+    async def scenario():
+        flight, calls = SingleFlight(), []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "result"
+
+        results = await asyncio.gather(*[flight.do("key", compute) for _ in range(5)])
+        return flight, calls, results
+
+    flight, calls, results = run(scenario())
+    assert results == ["result"] * 5
+    assert len(calls) == 1
+    assert flight.stats() == {"in_flight": 0, "computed": 1, "coalesced": 4}
+
+def test_sequential_calls_recompute():
+    async def scenario():
+        flight = SingleFlight()
+        first = await flight.do("key", lambda: asyncio.sleep(0, result=1))
+        second = await flight.do("key", lambda: asyncio.sleep(0, result=2))
+        return first, second
+
+    assert run(scenario()) == (1, 2)
+
+def test_cancelled_leader_does_not_fail_followers():
+    async def scenario():
+        flight = SingleFlight()
+        started = asyncio.Event()
+
+        async def compute():
+            started.set()
+            await asyncio.sleep(0.02)
+            return "result"
+
+        leader = asyncio.ensure_future(flight.do("key", compute))
+        await started.wait()
+        follower = asyncio.ensure_future(flight.do("key", compute))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert run(scenario()) == "result"
+
+def test_errors_reach_every_caller():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def compute():
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        return await asyncio.gather(flight.do("key", compute), flight.do("key", compute),
+                                    return_exceptions=True), flight
+
+    results, flight = run(scenario())
+    assert all(isinstance(r, ValueError) for r in results)
+    assert flight.stats()["in_flight"] == 0
@@ -0,0 +1,39 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+surprise = pytest.importorskip("surprise")
+
+from src.svd_scorer import SVDScorer
+
+
+@pytest.fixture(scope="module")
+def trainset():
+    rng = np.random.default_rng(0)
+    ratings = pd.DataFrame({
+        "userId": rng.integers(1, 30, size=400),
+        "movieId": rng.integers(1, 40, size=400),
+        "rating": rng.integers(1, 11, size=400) / 2,
+    }).drop_duplicates(subset=["userId", "movieId"])
+    data = surprise.Dataset.load_from_df(ratings, surprise.Reader(rating_scale=(0.5, 5.0)))
+    return data.build_full_trainset()
+
+
+@pytest.mark.parametrize("biased", [True, False])
+def test_score_user_matches_predict(trainset, biased):
+    algo = surprise.SVD(n_factors=8, n_epochs=10, biased=biased, random_state=0).fit(trainset)
+    # 999 was never rated, so it takes predict()'s unknown-item fallback
+    catalog = sorted(trainset._raw2inner_id_items) + [999]
+    scorer = SVDScorer.from_algo(algo, catalog)
+
+    for user_id in [1, 5, 12, 1000]:   # 1000 is an unknown user
+        expected = [algo.predict(user_id, movie_id).est for movie_id in catalog]
+        np.testing.assert_allclose(scorer.score_user(user_id), expected, rtol=1e-9, atol=1e-9)
+
+def test_score_users_matches_score_user(trainset):
+    algo = surprise.SVD(n_factors=8, n_epochs=10, random_state=0).fit(trainset)
+    scorer = SVDScorer.from_algo(algo)
+    users = [3, 1000, 7]
+    block = scorer.score_users(users)
+    for row, user_id in zip(block, users):
+        np.testing.assert_allclose(row, scorer.score_user(user_id))
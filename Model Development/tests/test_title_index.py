@@ -0,0 +1,43 @@
+import pytest
+
+pytest.importorskip("pandas")
+
+from src.title_index import TitleResolver, parse_year
+
+
+def test_parse_year():
+    assert parse_year(1995) == 1995
+    assert parse_year(1995.0) == 1995
+    assert parse_year("(1995)") == 1995
+    assert parse_year(None) is None
+    assert parse_year("") is None
+
+def test_duplicates_keep_first_row_unless_year_given():
+    titles = TitleResolver.build(["Heat", "Heat", "Toy Story"], [1995, 1986, None])
+    assert titles.resolve("Heat") == 0
+    assert titles.resolve("heat", 1986) == 1
+    assert titles.resolve("Heat (1986)") == 1
+    # unknown year falls back to the first row
+    assert titles.resolve("Heat (2020)") == 0
+    assert titles.resolve("Toy Story") == 2
+    assert titles.resolve("Jaws") is None
+
+def test_from_movielens_reorders_articles():
+    titles = TitleResolver.from_movielens(["Godfather, The (1972)", "Heat (1995)"])
+    assert titles.resolve("The Godfather") == 0
+    assert titles.resolve("The Godfather (1972)") == 0
+    assert titles.resolve("Heat", 1995) == 1
+    assert titles.resolve("Godfather") is None
+
+def test_with_title_leaves_the_published_resolver_unchanged():
+    titles = TitleResolver.build(["Heat"])
+    updated = titles.with_title("Jaws", 1975, 1)
+    assert updated.resolve("Jaws") == 1
+    assert titles.resolve("Jaws") is None
+
+def test_save_load_roundtrip(tmp_path):
+    titles = TitleResolver.build(["Heat", "Heat"], [1995, 1986])
+    titles.save(tmp_path / "titles.json")
+    loaded = TitleResolver.load(tmp_path / "titles.json")
+    assert loaded.resolve("Heat (1986)") == 1
+    assert loaded.resolve("Heat") == 0
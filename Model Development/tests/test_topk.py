@@ -0,0 +1,35 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from src.topk import top_k, top_k_rows
+
+
+def test_top_k_best_first():
+    assert top_k([0.1, 0.9, 0.5, 0.7], 3).tolist() == [1, 3, 2]
+
+def test_top_k_ties_keep_catalog_order():
+    scores = [1.0, 3.0, 3.0, 2.0, 3.0]
+    assert top_k(scores, 3).tolist() == [1, 2, 4]
+    assert top_k(scores, 5).tolist() == [1, 2, 4, 3, 0]
+
+def test_top_k_exclude_positions_and_mask():
+    scores = [1.0, 3.0, 3.0, 2.0, 3.0]
+    assert top_k(scores, 3, exclude=[2]).tolist() == [1, 4, 3]
+    mask = np.array([False, True, False, False, True])
+    assert top_k(scores, 3, exclude=mask).tolist() == [2, 3, 0]
+
+def test_top_k_caps_k_at_eligible_items():
+    assert top_k([1.0, 2.0, 3.0], 10, exclude=[0]).tolist() == [2, 1]
+    assert len(top_k([1.0, 2.0], 0)) == 0
+    assert len(top_k([1.0, 2.0], 2, exclude=[0, 1])) == 0
+
+def test_top_k_rows_matches_top_k():
+    scores = np.array([[1.0, 3.0, 3.0, 2.0, 3.0],
+                       [0.5, 0.1, 0.9, 0.9, 0.2]])
+    exclude = np.zeros(scores.shape, dtype=bool)
+    exclude[0, 2] = exclude[1, 0] = True
+    rows = top_k_rows(scores, 3, exclude=exclude)
+    for row, expected, mask in zip(rows, scores, exclude):
+        assert row.tolist() == top_k(expected, 3, exclude=mask).tolist()
+    assert rows[1].tolist() == [2, 3, 4]
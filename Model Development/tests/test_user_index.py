@@ -0,0 +1,36 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from src.user_index import UserHistoryIndex
+
+
+@pytest.fixture
+def index():
+    # unsorted input, movie 99 is not in the catalog
+    return UserHistoryIndex([3, 1, 3, 2, 1, 3], [30, 10, 31, 20, 11, 99], catalog_ids=[31, 30, 20, 11, 10, 40])
+
+
+def test_seen_items_per_user(index):
+    assert index.n_users == 3
+    assert index.seen_set(1) == {10, 11}
+    assert index.seen_set(3) == {30, 31, 99}
+    assert index.has_history(2)
+
+def test_unknown_user_has_no_history(index):
+    assert not index.has_history(7)
+    assert len(index.seen_items(7)) == 0
+    assert len(index.seen_positions(0)) == 0
+    assert not index.seen_mask(42).any()
+
+def test_positions_follow_the_catalog(index):
+    # movies outside the catalog are dropped
+    np.testing.assert_array_equal(np.sort(index.seen_positions(3)), [0, 1])
+    np.testing.assert_array_equal(index.seen_mask(1), [False, False, False, True, True, False])
+
+def test_set_catalog_remaps(index):
+    index.set_catalog([10, 99])
+    np.testing.assert_array_equal(np.sort(index.seen_positions(3)), [1])
+    np.testing.assert_array_equal(index.seen_mask(1), [True, False])
+    index.set_catalog([])
+    assert len(index.seen_positions(1)) == 0
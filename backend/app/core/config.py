@@ -9,3 +9,9 @@ ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "60")
 
 if not SECRET_KEY:
     raise ValueError("SECRET_KEY missing in .env")
+
+# Recommendation service (Model Development/fastapi_app.py); unset disables live updates
+RECOMMENDER_URL = os.getenv("RECOMMENDER_URL")
+RECOMMENDER_TIMEOUT_SECONDS = float(os.getenv("RECOMMENDER_TIMEOUT_SECONDS", "2"))
+# Backend users live in their own id range on the recommender (MovieLens users own the low ids)
+RECOMMENDER_USER_ID_OFFSET = int(os.getenv("RECOMMENDER_USER_ID_OFFSET", "10000000"))
@@ -0,0 +1,94 @@
+# app/core/recommender.py
+"""
+Client for the recommendation service.
+
+Keeps the recommender in step with the database without a retrain:
+- after a rating changes, the user's full current rating list is pushed to
+  PUT {RECOMMENDER_URL}/users/{user_id}/ratings (CF user factors are folded in);
+- after a movie is added, it is pushed to PUT {RECOMMENDER_URL}/catalog/movies
+  (the content-based index is updated with the fitted vocabulary);
+- after a user's preferences change, their favorite_genres are pushed to
+  PUT {RECOMMENDER_URL}/users/{user_id}/preferences (hybrid genre candidates).
+All run as background tasks after the response is sent; failures are logged
+and never affect the request.
+
+Ids are translated at this boundary. Movies are sent by title and release
+year, not by movies.id: the backend's autoincrement ids have nothing to do with
+MovieLens movieIds, so the recommender resolves them against its own catalog.
+Ratings are sent with the backend's RATING_SCALE (0.5 - 10) and rescaled by the
+recommender to the scale its model was trained on (MovieLens 0.5 - 5).
+Users are sent as RECOMMENDER_USER_ID_OFFSET + users.id (recommender_user_id),
+so they never overwrite a MovieLens user the model was trained on. Clients
+asking the recommender for a backend user's recommendations must use the same
+id.
+"""
+import json
+import logging
+import urllib.error
+import urllib.request
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from app.core.config import RECOMMENDER_URL, RECOMMENDER_TIMEOUT_SECONDS, RECOMMENDER_USER_ID_OFFSET
+from app.db import SessionLocal
+from app.models.movie import Movie
+from app.models.rating import Rating
+from app.schemas.rating import RATING_SCALE
+
+logger = logging.getLogger(__name__)
+
+
+def recommender_user_id(user_id: int) -> int:
+    """The id of a backend user on the recommendation service."""
+    return RECOMMENDER_USER_ID_OFFSET + user_id
+
+
+def _user_ratings(db: Session, user_id: int):
+    rows = (
+        db.query(Movie.title, Movie.release_year, Rating.rating)
+        .join(Movie, Movie.id == Rating.movie_id)
+        .filter(Rating.user_id == user_id)
+        .all()
+    )
+    return [{"title": title, "year": year, "rating": rating} for title, year, rating in rows]
+
+
+def _put(path: str, body: dict):
+    request = urllib.request.Request(
+        f"{RECOMMENDER_URL.rstrip('/')}{path}",
+        data=json.dumps(body).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="PUT",
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=RECOMMENDER_TIMEOUT_SECONDS) as response:
+            response.read()
+    except (urllib.error.URLError, OSError) as e:
+        logger.warning("Could not reach the recommender (PUT %s): %s", path, e)
+
+
+def push_user_ratings(user_id: int):
+    """Send user_id's current ratings to the recommendation service (no-op if not configured)."""
+    if not RECOMMENDER_URL:
+        return
+    db = SessionLocal()
+    try:
+        ratings = _user_ratings(db, user_id)
+    finally:
+        db.close()
+    _put(f"/users/{recommender_user_id(user_id)}/ratings", {"ratings": ratings, "rating_scale": list(RATING_SCALE)})
+
+
+def push_movie(title: str, genre: Optional[str], release_year: Optional[int] = None):
+    """Add a new movie to the recommender's content-based index (no-op if not configured)."""
+    if not RECOMMENDER_URL:
+        return
+    _put("/catalog/movies", {"title": title, "year": release_year, "genre": genre or ""})
+
+
+def push_user_preferences(user_id: int, favorite_genres: Optional[str]):
+    """Send user_id's favourite genres to the recommendation service (no-op if not configured)."""
+    if not RECOMMENDER_URL:
+        return
+    _put(f"/users/{recommender_user_id(user_id)}/preferences", {"favorite_genres": favorite_genres or ""})
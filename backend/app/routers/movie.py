@@ -1,5 +1,5 @@
 # routers/movies.py
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
 from sqlalchemy.orm import Session
 
 from app.db import get_db
@@ -7,6 +7,7 @@ from app.models.movie import Movie
 from app.schemas.movie import MovieCreate, MovieOut
 from app.core.deps import get_current_user, require_admin
 from app.models.user import User  # for typing of current_user
+from app.core.recommender import push_movie
 
 router = APIRouter(
     prefix="/movies",
@@ -15,7 +16,7 @@ router = APIRouter(
 
 # --- POST: Add a new movie (protected) ---
 @router.post("/", response_model=MovieOut)
-def create_movie(movie: MovieCreate, db: Session = Depends(get_db), current_user: User = Depends(require_admin)):
+def create_movie(movie: MovieCreate, background_tasks: BackgroundTasks, db: Session = Depends(get_db), current_user: User = Depends(require_admin)):
     # Check if movie already exists
     db_movie = db.query(Movie).filter(Movie.title == movie.title).first()
     if db_movie:
@@ -31,6 +32,8 @@ def create_movie(movie: MovieCreate, db: Session = Depends(get_db), current_user
     db.add(new_movie)
     db.commit()
     db.refresh(new_movie)
+    # Make it recommendable right away (content-based index update in the recommender)
+    background_tasks.add_task(push_movie, new_movie.title, new_movie.genre, new_movie.release_year)
     return new_movie
 
 
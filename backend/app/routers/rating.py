@@ -1,5 +1,5 @@
 # app/routers/ratings.py
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 
@@ -9,6 +9,7 @@ from app.models.movie import Movie
 from app.schemas.rating import RatingCreate, RatingOut
 from app.core.deps import get_current_user
 from app.models.user import User
+from app.core.recommender import push_user_ratings
 
 router = APIRouter(
     prefix="/ratings",
@@ -17,10 +18,11 @@ router = APIRouter(
 
 
 @router.post("/", response_model=RatingOut)
-def upsert_rating(payload: RatingCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def upsert_rating(payload: RatingCreate, background_tasks: BackgroundTasks, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     """
     Create or update the current user's rating for a movie (upsert).
     Body: { "movie_id": int, "rating": float }
+    The recommender is updated with the user's ratings in the background.
     """
     # check movie exists
     movie = db.get(Movie, payload.movie_id)
@@ -39,6 +41,7 @@ def upsert_rating(payload: RatingCreate, db: Session = Depends(get_db), current_
         db.add(existing)
         db.commit()
         db.refresh(existing)
+        background_tasks.add_task(push_user_ratings, current_user.id)
         return existing
 
     new_rating = Rating(
@@ -54,6 +57,7 @@ def upsert_rating(payload: RatingCreate, db: Session = Depends(get_db), current_
         # If UNIQUE constraint violation happens unexpectedly, return conflict
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Could not save rating")
     db.refresh(new_rating)
+    background_tasks.add_task(push_user_ratings, current_user.id)
     return new_rating
 
 
@@ -65,13 +69,14 @@ def my_ratings(db: Session = Depends(get_db), current_user: User = Depends(get_c
 
 
 @router.delete("/movie/{movie_id}", status_code=status.HTTP_200_OK)
-def delete_my_rating(movie_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def delete_my_rating(movie_id: int, background_tasks: BackgroundTasks, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     """Delete current user's rating for the movie."""
     rating = db.query(Rating).filter(Rating.user_id == current_user.id, Rating.movie_id == movie_id).first()
     if not rating:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Rating not found")
     db.delete(rating)
     db.commit()
+    background_tasks.add_task(push_user_ratings, current_user.id)
     return {"detail": "Rating deleted"}
 
 
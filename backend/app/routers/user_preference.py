@@ -1,16 +1,18 @@
-from fastapi import FastAPI, Depends, HTTPException, APIRouter
+from fastapi import FastAPI, BackgroundTasks, Depends, HTTPException, APIRouter
 from sqlalchemy.orm import Session
 from app.db import get_db
 from app.models.user_preference import UserPreference
 from app.schemas.user_preference import UserPreferenceCreate, UserPreferenceOut
 from app.core.deps import get_current_user
 from app.models.user import User
+from app.core.recommender import push_user_preferences
 
 router = APIRouter(prefix="/preference", tags=["User Preferences"])
 
 @router.post("/", response_model=UserPreferenceOut)
 def create_or_update_preference(
     preference_in: UserPreferenceCreate,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -34,6 +36,8 @@ def create_or_update_preference(
 
     db.commit()
     db.refresh(preference)
+    # Favourite genres feed the recommender's hybrid candidates
+    background_tasks.add_task(push_user_preferences, current_user.id, preference.favorite_genres)
     return preference
 
 # Get Current User Preference
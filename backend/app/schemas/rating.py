@@ -3,7 +3,8 @@ from typing import Optional
 from datetime import datetime
 
 # rating validated to 0.5 - 10.0 (you can adjust range)
-RatingValue = confloat(ge=0.5, le=10.0)  
+RATING_SCALE = (0.5, 10.0)
+RatingValue = confloat(ge=RATING_SCALE[0], le=RATING_SCALE[1])
 class RatingCreate(BaseModel):
     movie_id: int
     rating: RatingValue 